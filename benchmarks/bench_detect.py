@@ -0,0 +1,100 @@
+"""Benchmark prompt detection on a mix of ordinary output and prompts.
+
+Usage::
+
+    python benchmarks/bench_detect.py [--cli all] [--rounds 5]
+
+Prints the mean cost of one ``detect_tail`` call with the pattern-set
+optimiser on and off, focused on one profile as a shell session does while
+that CLI is in the foreground, and of re-checking an unchanged idle screen
+with and without the result memo.  Run from the repository root (``src``
+is put on the import path automatically).
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from auto_yes._ansi import tail_bytes  # noqa: E402
+from auto_yes.detector import PromptDetector  # noqa: E402
+from auto_yes.patterns import AI_CLI_NAMES, resolve_profile  # noqa: E402
+
+# ordinary output dominates real sessions; prompts are the rare case
+_OUTPUT = [
+    b"Collecting requests>=2.31\r\n  Downloading requests-2.31.0-py3-none-any.whl (62 kB)\r\n",
+    b"\x1b[32m+\x1b[0m src/auto_yes/detector.py | 12 ++++++++----\r\n",
+    b"Compiling serde v1.0.197\r\n   Compiling tokio v1.36.0\r\n",
+    b"\x1b[1m\xe2\x97\x8f\x1b[0m Reading file src/auto_yes/runner.py\r\n",
+    b"test_detector.py::TestGenericPatterns::test_bracket_yn PASSED  [ 42%]\r\n",
+    b"\xe2\x94\x82 Running: npm install --save-dev typescript          \xe2\x94\x82\r\n",
+]
+_PROMPTS = [
+    b"Do you want to continue? [Y/n] ",
+    b"\x1b[1m> 1. Yes\x1b[0m\r\n  2. No\r\n",
+    b"\xe2\x94\x82 \xe2\x97\x8f 1. Allow once\r\n\xe2\x94\x82   2. Allow for this session\r\n",
+]
+
+
+def _categories(cli):
+    if cli == "all":
+        return ["generic", *AI_CLI_NAMES]
+    return ["generic", resolve_profile(cli)]
+
+
+def _corpus():
+    corpus = []
+    for i in range(50):
+        corpus.append(_OUTPUT[i % len(_OUTPUT)] * 4)
+    corpus.extend(_PROMPTS)
+    return corpus
+
+
+def _bench(detector, tails, rounds):
+    def run():
+        for tail in tails:
+            detector.detect_tail(tail)
+
+    number = 200
+    best = min(timeit.repeat(run, number=number, repeat=rounds))
+    return best / (number * len(tails)) * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cli", default="all", help="profile name or 'all' (default)")
+    parser.add_argument("--rounds", type=int, default=5, help="timing repetitions")
+    args = parser.parse_args(argv)
+
+    categories = _categories(args.cli)
+    for label, optimize in (("as written", False), ("optimized", True)):
+        detector = PromptDetector(categories=categories, optimize=optimize, cache_size=0)
+        tails = [tail_bytes(buf, detector.window) for buf in _corpus()]
+        per_call = _bench(detector, tails, args.rounds)
+        print(
+            f"{label:>10}: {len(detector.pattern_strings):3d} patterns, "
+            f"{per_call:7.2f} us/detect"
+        )
+
+    # a shell session with every profile loaded while claude is in front
+    detector = PromptDetector(categories=categories, cache_size=0)
+    detector.focus(["claude", "generic"])
+    tails = [tail_bytes(buf, detector.window) for buf in _corpus()]
+    per_call = _bench(detector, tails, args.rounds)
+    print(
+        f"{'focused':>10}: {len(detector.active_pattern_strings):3d} patterns, "
+        f"{per_call:7.2f} us/detect"
+    )
+
+    # an idle child: the same non-prompt tail is re-checked every 50 ms
+    idle = [tail_bytes(_OUTPUT[3] * 4, 1)]
+    for label, cache_size in (("no memo", 0), ("memo", 64)):
+        detector = PromptDetector(categories=categories, cache_size=cache_size)
+        per_call = _bench(detector, idle, args.rounds)
+        print(f"{label:>10}: idle re-check {per_call:7.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Measure keystroke round-trip latency while the child floods the terminal.
+
+Usage::
+
+    python benchmarks/bench_echo_latency.py [--keys 50] [--pattern REGEX]
+
+The child prints long lines as fast as it can from one thread and answers
+every key it reads with a marker from another.  The benchmark types keys
+into an outer PTY, so they pass through ``Runner``'s I/O loop exactly like
+a user's, and times how long each marker takes to come back.  Each case is
+run with detection on the I/O loop and on the detection worker
+(``detect_thread``); ``--pattern`` adds a user pattern, e.g. a slow one.
+"""
+
+import argparse
+import os
+import pty
+import select
+import statistics
+import sys
+import tempfile
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+_CHILD = r"""
+import os, sys, threading, tty
+
+tty.setraw(0)
+pad = b"=" * 900
+
+def flood():
+    n = 0
+    while True:
+        os.write(1, b"building module %05d %s\r\n" % (n, pad))
+        n += 1
+
+threading.Thread(target=flood, daemon=True).start()
+os.write(1, b"READY\r\n")
+while True:
+    key = os.read(0, 1)
+    if key == b"q":
+        os._exit(0)
+    os.write(1, b"<<KEY>>")
+"""
+
+_DRIVER = r"""
+import sys, warnings
+sys.path.insert(0, {src!r})
+warnings.simplefilter("ignore")
+from auto_yes.patterns import REGISTRY
+from auto_yes.runner import Runner
+runner = Runner(
+    categories=list(REGISTRY),
+    extra_patterns={patterns!r},
+    detect_thread={thread},
+)
+runner.run_command([sys.executable, {child!r}])
+"""
+
+
+def _read_until(fd, marker, buf, timeout=10.0):
+    deadline = time.time() + timeout
+    while marker not in buf:
+        if time.time() > deadline:
+            raise TimeoutError(marker)
+        ready, _, _ = select.select([fd], [], [], 0.5)
+        if ready:
+            buf = buf[-len(marker):] + os.read(fd, 65536)
+    return buf[buf.index(marker) + len(marker):]
+
+
+def _run(child, patterns, thread, keys):
+    driver = _DRIVER.format(src=SRC, patterns=patterns, thread=thread, child=child)
+    pid, fd = pty.fork()
+    if pid == 0:
+        os.execv(sys.executable, [sys.executable, "-c", driver])
+
+    latencies = []
+    try:
+        buf = _read_until(fd, b"READY", b"")
+        for _ in range(keys):
+            start = time.perf_counter()
+            os.write(fd, b"k")
+            buf = _read_until(fd, b"<<KEY>>", buf)
+            latencies.append((time.perf_counter() - start) * 1000)
+            time.sleep(0.02)
+        os.write(fd, b"q")
+    finally:
+        # drain until the child is gone so the driver can exit
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            try:
+                ready, _, _ = select.select([fd], [], [], 0.2)
+                if ready and not os.read(fd, 65536):
+                    break
+            except OSError:
+                break
+        os.waitpid(pid, 0)
+        os.close(fd)
+    return latencies
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keys", type=int, default=50, help="keys typed per case")
+    parser.add_argument("--pattern", action="append", default=[], help="extra user pattern")
+    args = parser.parse_args(argv)
+
+    with tempfile.NamedTemporaryFile("w", suffix=".py", delete=False) as fh:
+        fh.write(_CHILD)
+    try:
+        for label, thread in (("I/O loop", False), ("worker", True)):
+            latencies = sorted(_run(fh.name, args.pattern, thread, args.keys))
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            print(
+                f"{label:>8}: median {statistics.median(latencies):6.2f} ms, "
+                f"p95 {p95:6.2f} ms, max {latencies[-1]:6.2f} ms"
+            )
+    finally:
+        os.unlink(fh.name)
+
+
+if __name__ == "__main__":
+    main()
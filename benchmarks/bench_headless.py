@@ -0,0 +1,79 @@
+"""Compare the headless and interactive Unix loops with stdout going to a file.
+
+Usage::
+
+    python benchmarks/bench_headless.py [--lines 200000] [--width 100]
+
+The child prints ``--lines`` lines as fast as it can; ``Runner`` proxies
+them into a temporary file, once with ``headless=False`` (the interactive
+loop: up to 16 KiB per wakeup, one write call each) and once with
+``headless=True`` (up to 64 KiB per wakeup, writes batched over 50 ms).
+Prints the wall time and how many write calls reached the file.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+_CHILD = r"""
+import sys
+line = "x" * {width} + "\n"
+out = sys.stdout
+for i in range({lines}):
+    out.write("%08d " % i + line)
+"""
+
+_DRIVER = r"""
+import json, sys, time
+sys.path.insert(0, {src!r})
+from auto_yes.runner import Runner
+
+runner = Runner(categories=["generic"], headless={headless})
+start = time.perf_counter()
+runner.run_command([sys.executable, "-c", {child!r}])
+elapsed = time.perf_counter() - start
+sys.stderr.write(json.dumps({{"elapsed": elapsed, "writes": runner.metrics.writes}}))
+"""
+
+
+def _run(headless, child):
+    driver = _DRIVER.format(src=SRC, headless=headless, child=child)
+    with tempfile.TemporaryFile() as out:
+        proc = subprocess.run(
+            [sys.executable, "-c", driver],
+            stdin=subprocess.DEVNULL,
+            stdout=out,
+            stderr=subprocess.PIPE,
+            check=True,
+        )
+        size = out.tell()
+    result = json.loads(proc.stderr)
+    result["bytes"] = size
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=200000, help="lines the child prints")
+    parser.add_argument("--width", type=int, default=100, help="characters per line")
+    args = parser.parse_args(argv)
+
+    child = _CHILD.format(lines=args.lines, width=args.width)
+    for label, headless in (("interactive", False), ("headless", True)):
+        start = time.perf_counter()
+        result = _run(headless, child)
+        wall = time.perf_counter() - start
+        print(
+            f"{label:>11}: {result['elapsed']:6.2f} s in the loop ({wall:6.2f} s total), "
+            f"{result['writes']:6d} writes, {result['bytes'] / 1e6:6.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
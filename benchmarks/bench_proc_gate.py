@@ -0,0 +1,78 @@
+"""Count the detection calls the ``/proc`` gate avoids (Linux only).
+
+Usage::
+
+    python benchmarks/bench_proc_gate.py
+
+Each transcript is a real command that prints for a while and then asks a
+question.  It runs under ``Runner`` with and without ``proc_gate`` and the
+script reports how often the detector ran, how many checks the gate
+skipped, and whether the prompt was still answered.
+"""
+
+import ast
+import os
+import subprocess
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+_ASK = "read -r -p 'Continue? [y/n] ' a; echo \"answer=$a\""
+
+TRANSCRIPTS = {
+    "find /usr": f"find /usr -maxdepth 4 2>/dev/null; {_ASK}",
+    "python -v import": f"python3 -v -c 'import json, email, http.client' 2>&1; {_ASK}",
+    "slow build log": (
+        "for i in $(seq 300); do echo \"[$i/300] compiling unit_$i.c\"; sleep 0.005; done; "
+        + _ASK
+    ),
+    "progress bar": (
+        "for i in $(seq 0 2 100); do printf '\\rdownloading %3d%%' $i; sleep 0.01; done; "
+        f"echo; {_ASK}"
+    ),
+}
+
+_DRIVER = r"""
+import sys
+sys.path.insert(0, {src!r})
+from auto_yes.runner import Runner
+runner = Runner(categories=["generic"], proc_gate={gate})
+runner.run_command(["bash", "-c", {script!r}])
+print("STATS", runner.stats())
+"""
+
+
+def _run(script, gate):
+    driver = _DRIVER.format(src=SRC, gate=gate, script=script)
+    out = subprocess.run(
+        [sys.executable, "-c", driver],
+        stdin=subprocess.DEVNULL,
+        capture_output=True,
+        timeout=60,
+    ).stdout.decode(errors="replace")
+    stats = {}
+    answered = False
+    for line in out.splitlines():
+        if line.startswith("STATS "):
+            stats = ast.literal_eval(line[len("STATS ") :])
+        answered = answered or "answer=y" in line
+    return stats, answered
+
+
+def main():
+    if not sys.platform.startswith("linux"):
+        sys.exit("the /proc gate is Linux only")
+
+    print(f"{'transcript':<18} {'gate':<4} {'detect calls':>12} {'skipped':>8}  answered")
+    for name, script in TRANSCRIPTS.items():
+        for label, gate in (("off", False), ("on", True)):
+            stats, answered = _run(script, gate)
+            calls = stats.get("cache_hits", 0) + stats.get("cache_misses", 0)
+            print(
+                f"{name:<18} {label:<4} {calls:>12d} "
+                f"{stats.get('gated', 0):>8d}  {answered}"
+            )
+
+
+if __name__ == "__main__":
+    main()
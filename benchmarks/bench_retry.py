@@ -0,0 +1,100 @@
+"""Measure time-to-recovery when a child drops the first injected answer.
+
+Usage::
+
+    python benchmarks/bench_retry.py [--runs 5]
+
+The child turns echo off, shows a prompt, waits for input and flushes it
+unread (like a TUI switching to raw mode with ``TCSAFLUSH``), then waits for
+the answer again.  It reports how long after the prompt the answer it kept
+arrived.  Each case runs under ``Runner`` with retries enabled and disabled;
+without retries the child is killed after ``--timeout`` seconds.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+_CHILD = r"""
+import os, select, sys, termios, time
+
+fd = sys.stdin.fileno()
+attrs = termios.tcgetattr(fd)
+attrs[3] &= ~(termios.ECHO | termios.ICANON)
+termios.tcsetattr(fd, termios.TCSANOW, attrs)
+
+start = time.time()
+sys.stdout.write("Continue? [y/n] ")
+sys.stdout.flush()
+
+# drop the first answer unread
+select.select([fd], [], [])
+time.sleep(0.01)
+termios.tcflush(fd, termios.TCIFLUSH)
+if sys.argv[1] == "redraw":
+    sys.stdout.write("\r\x1b[2KContinue? [y/n] ")
+    sys.stdout.flush()
+
+os.read(fd, 16)
+print(f"\nRECOVERED {time.time() - start:.3f}")
+"""
+
+_DRIVER = r"""
+import sys
+sys.path.insert(0, {src!r})
+import auto_yes.runner as runner_mod
+if not {retry}:
+    runner_mod._RETRY_LIMIT = 0
+runner = runner_mod.Runner(categories=["generic"])
+code = runner.run_command([sys.executable, {child!r}, {mode!r}])
+print("STATS", runner.stats())
+sys.exit(code)
+"""
+
+
+def _run(child, mode, retry, timeout):
+    driver = _DRIVER.format(src=SRC, retry=retry, child=child, mode=mode)
+    try:
+        out = subprocess.run(
+            [sys.executable, "-c", driver],
+            stdin=subprocess.DEVNULL,
+            capture_output=True,
+            timeout=timeout,
+        ).stdout.decode(errors="replace")
+    except subprocess.TimeoutExpired:
+        return None
+    for line in out.splitlines():
+        if line.startswith("RECOVERED"):
+            return float(line.split()[1])
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="runs per case")
+    parser.add_argument("--timeout", type=float, default=5.0, help="seconds before giving up")
+    args = parser.parse_args(argv)
+
+    with tempfile.NamedTemporaryFile("w", suffix=".py", delete=False) as fh:
+        fh.write(_CHILD)
+        child = fh.name
+    try:
+        for mode in ("silent", "redraw"):
+            for label, retry in (("no retry", False), ("retry", True)):
+                times = [_run(child, mode, retry, args.timeout) for _ in range(args.runs)]
+                done = [t for t in times if t is not None]
+                if done:
+                    summary = f"median {sorted(done)[len(done) // 2]:.3f} s"
+                else:
+                    summary = f"hung (killed after {args.timeout:.0f} s)"
+                print(f"{mode:>7} / {label:<8}: {len(done)}/{len(times)} recovered, {summary}")
+    finally:
+        os.unlink(child)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Measure per-session startup with and without the auto-yes daemon.
+
+Usage::
+
+    python benchmarks/bench_spawn.py [--sessions 20] [--cli all]
+
+Runs ``auto-yes run --cli CLI -- true`` back to back, first as separate
+processes that compile their patterns themselves, then with
+``AUTO_YES_DAEMON=1`` against a daemon started in a private runtime
+directory, and prints the mean and median wall time per session.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+
+def _auto_yes(args, env):
+    return subprocess.run(
+        [sys.executable, "-m", "auto_yes", *args],
+        env=env,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        check=True,
+    )
+
+
+def _time_sessions(env, cli, sessions):
+    args = ["run", "--cli", cli, "--", "true"]
+    # the first session pays for cold caches (and, with the daemon, for
+    # compiling a pattern set it was not warmed with)
+    _auto_yes(args, env)
+    timings = []
+    for _ in range(sessions):
+        start = time.perf_counter()
+        _auto_yes(args, env)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20, help="sessions per case")
+    parser.add_argument("--cli", default="all", help="profile name or 'all' (default)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as runtime:
+        env = dict(os.environ, PYTHONPATH=SRC, XDG_RUNTIME_DIR=runtime)
+        env.pop("AUTO_YES_DAEMON", None)
+        daemon_env = dict(env, AUTO_YES_DAEMON="1")
+
+        cases = [("in-process", env), ("daemon", daemon_env)]
+        _auto_yes(["daemon", "start"], env)
+        try:
+            for label, case_env in cases:
+                timings = _time_sessions(case_env, args.cli, args.sessions)
+                print(
+                    f"{label:>10}: mean {statistics.mean(timings):6.1f} ms, "
+                    f"median {statistics.median(timings):6.1f} ms per session"
+                )
+        finally:
+            _auto_yes(["daemon", "stop"], env)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Count stdout write calls of the Unix loop under bursty TUI-style output.
+
+Usage::
+
+    python benchmarks/bench_writev.py [--frames 300] [--pieces 40] [--prompts 20]
+
+The child redraws a screen ``--frames`` times, each frame flushed as
+``--pieces`` small writes (cursor moves and cells, like a TUI library),
+and asks ``--prompts`` y/n questions in between.  ``Runner`` proxies it
+with ``--verbose`` on and stdout going to a file.
+
+Before output staging the loop issued one ``write`` per PTY read plus
+one per notice; the script prints that count next to the ``writev``
+calls the staged loop actually made (``Metrics.writes``).
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+_CHILD = r"""
+import sys, time
+out = sys.stdout
+for frame in range({frames}):
+    for piece in range({pieces}):
+        out.write("\x1b[%d;%dH\x1b[7m%4d\x1b[0m" % (piece % 24 + 1, piece * 2 + 1, frame))
+        out.flush()
+    if frame % max(1, {frames} // max(1, {prompts})) == 0 and {prompts}:
+        out.write("\r\nApply change %d? [y/n] " % frame)
+        out.flush()
+        sys.stdin.readline()
+    if frame % 10 == 9:
+        time.sleep(0.002)
+"""
+
+_DRIVER = r"""
+import json, sys
+sys.path.insert(0, {src!r})
+from auto_yes.runner import Runner
+
+runner = Runner(categories=["generic"], verbose=True, headless=False, cooldown=0)
+runner.run_command([sys.executable, "-c", {child!r}])
+metrics = runner.metrics
+sys.stderr.write(json.dumps({{
+    "reads": metrics.reads,
+    "wakeups": metrics.wakeups,
+    "writes": metrics.writes,
+    "responses": metrics.responses,
+}}))
+"""
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=300, help="screen redraws")
+    parser.add_argument("--pieces", type=int, default=40, help="writes per redraw")
+    parser.add_argument("--prompts", type=int, default=20, help="questions asked")
+    args = parser.parse_args(argv)
+
+    child = _CHILD.format(frames=args.frames, pieces=args.pieces, prompts=args.prompts)
+    driver = _DRIVER.format(src=SRC, child=child)
+    with tempfile.TemporaryFile() as out:
+        proc = subprocess.run(
+            [sys.executable, "-c", driver],
+            stdin=subprocess.DEVNULL,
+            stdout=out,
+            stderr=subprocess.PIPE,
+            check=True,
+        )
+    result = json.loads(proc.stderr)
+    unstaged = result["reads"] + result["responses"]
+    print(
+        f"{result['reads']} reads, {result['wakeups']} wakeups, "
+        f"{result['responses']} answers with notices"
+    )
+    print(f"per-read writes: {unstaged:6d}")
+    ratio = unstaged / max(1, result["writes"])
+    print(f"staged writev:   {result['writes']:6d} ({ratio:.1f}x fewer)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,13 @@
 """auto-yes: automatically respond 'yes' to interactive CLI prompts."""
 
 __version__ = "0.9.1"
+
+
+def __getattr__(name):
+    # ``auto_yes.spawn`` / ``auto_yes.Session`` without importing the runner
+    # (and compiling patterns) for every ``import auto_yes``
+    if name in ("spawn", "Session"):
+        from auto_yes import session
+
+        return getattr(session, name)
+    raise AttributeError(f"module 'auto_yes' has no attribute {name!r}")
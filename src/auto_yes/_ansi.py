@@ -1,7 +1,9 @@
 """ANSI escape code handling utilities.
 
 Provides helpers to strip ANSI/VT escape sequences and control characters
-so that prompt-pattern matching operates on the *visible* text only.
+so that prompt-pattern matching operates on the *visible* text only, plus a
+tail extractor that pulls the last visible lines straight out of the raw
+output buffer without decoding or cleaning the rest of it.
 """
 
 import re
@@ -18,6 +20,10 @@ _ANSI_RE = re.compile(
 
 _CONTROL_RE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
 
+# byte twins used to look at raw buffer segments without decoding them
+_ANSI_BYTES_RE = re.compile(_ANSI_RE.pattern.encode())
+_CONTROL_BYTES_RE = re.compile(_CONTROL_RE.pattern.encode())
+
 
 def strip_ansi(text):
     """Remove ANSI / VT escape sequences from *text*."""
@@ -33,14 +39,247 @@ def clean_text(text):
     """Strip escapes, resolve carriage-returns and produce clean visible text.
 
     For each line the last carriage-return segment wins (simulates terminal
-    overwrite behaviour).
+    overwrite behaviour).  A trailing carriage-return (the ``\r`` of a PTY's
+    ``\r\n`` line ending) only moves the cursor and does not blank the line.
     """
     text = strip_ansi(text)
     text = strip_control(text)
 
     cleaned_lines = []
     for line in text.split("\n"):
-        segments = line.split("\r")
+        segments = line.rstrip("\r").split("\r")
         cleaned_lines.append(segments[-1])
 
     return "\n".join(cleaned_lines)
+
+
+# ------------------------------------------------------------------
+# tail extraction on raw bytes
+# ------------------------------------------------------------------
+
+
+def _invisible(segment):
+    """Return ``True`` if *segment* (bytes) has no visible characters."""
+    segment = _ANSI_BYTES_RE.sub(b"", segment)
+    return not _CONTROL_BYTES_RE.sub(b"", segment)
+
+
+def _complete_end(buf, end):
+    """Move *end* back before a UTF-8 sequence that is cut off at the end."""
+    lead = end - 1
+    while lead >= 0 and end - lead < 4 and 0x80 <= buf[lead] < 0xC0:
+        lead -= 1
+    if lead < 0 or buf[lead] < 0xC0:
+        return end
+
+    if buf[lead] >= 0xF0:
+        size = 4
+    elif buf[lead] >= 0xE0:
+        size = 3
+    else:
+        size = 2
+    if end - lead < size:
+        return lead
+    return end
+
+
+def _visible_start(buf, start, end):
+    """Return where the part of ``buf[start:end]`` a terminal still shows begins.
+
+    Skips everything up to the last carriage-return that is followed by
+    visible output, so overwritten segments are never decoded or cleaned.
+    """
+    seg_end = end
+    while True:
+        cr = buf.rfind(b"\r", start, seg_end)
+        if cr == -1:
+            break
+        if not _invisible(buf[cr + 1 : seg_end]):
+            start = cr + 1
+            break
+        # only escapes after this CR: it is a trailing one, keep looking
+        seg_end = cr
+
+    # the slice may begin in the middle of a multi-byte character when the
+    # rolling buffer was trimmed; skip the orphaned continuation bytes
+    while start < end and 0x80 <= buf[start] < 0xC0:
+        start += 1
+    return start
+
+
+def _clean_bytes_line(line):
+    """Byte version of ``clean_text`` for a single line without ``\n``."""
+    line = _CONTROL_BYTES_RE.sub(b"", _ANSI_BYTES_RE.sub(b"", line))
+    return line.rstrip(b"\r").rsplit(b"\r", 1)[-1]
+
+
+def _tail(buf, lines, clean):
+    """Collect the last *lines* visible lines of *buf* using *clean*."""
+    end = _complete_end(buf, len(buf))
+    collected = []
+    while len(collected) < lines:
+        start = buf.rfind(b"\n", 0, end) + 1
+        visible = _visible_start(buf, start, end)
+        line = clean(bytes(buf[visible:end]))
+        if collected:
+            collected.append(line)
+        elif line.strip():
+            collected.append(line.rstrip())
+        if start == 0:
+            break
+        end = start - 1
+
+    collected.reverse()
+    return collected
+
+
+def _clean_text_line(line):
+    """Decode and clean a single raw line."""
+    return clean_text(line.decode("utf-8", errors="replace"))
+
+
+def tail_text(buf, lines=1):
+    """Return the last *lines* visible lines of the raw byte buffer *buf*.
+
+    Equivalent to cleaning the whole decoded buffer, stripping trailing
+    whitespace and keeping the last *lines* lines, but scans backwards from
+    the end so the work is bounded by the length of those lines rather than
+    by the size of *buf*.  Blank trailing lines are skipped, CR-overwritten
+    segments are never decoded, and a UTF-8 character cut off at either end
+    of the buffer is dropped instead of turning into U+FFFD.
+    """
+    return "\n".join(_tail(buf, lines, _clean_text_line))
+
+
+def tail_bytes(buf, lines=1):
+    """Like ``tail_text`` but return the cleaned lines as UTF-8 bytes.
+
+    Nothing is decoded, so byte patterns can run on the result directly.
+    Blank lines and trailing whitespace are judged on ASCII whitespace only.
+    """
+    return b"\n".join(_tail(buf, lines, _clean_bytes_line))
+
+
+# ------------------------------------------------------------------
+# carriage-return compaction of the rolling buffer
+# ------------------------------------------------------------------
+
+
+def _overwritten_end(buf, start, end, closed):
+    """Return where the still-needed part of line ``buf[start:end]`` begins.
+
+    Everything before the last carriage-return that starts a *complete*
+    visible segment is overwritten.  The segment after the last CR of an
+    open line is not complete yet (more bytes may follow), so the visible
+    segment before it is kept as a fallback, exactly as ``_visible_start``
+    would fall back to it.
+    """
+    seg_end = end
+    if not closed:
+        seg_end = buf.rfind(b"\r", start, end)
+        if seg_end == -1:
+            return start
+    while True:
+        cr = buf.rfind(b"\r", start, seg_end)
+        if cr == -1:
+            return start
+        if not _invisible(buf[cr + 1 : seg_end]):
+            return cr + 1
+        seg_end = cr
+
+
+def compact_cr(buf, start=0):
+    """Drop CR-overwritten segments from the lines of *buf* at or after *start*.
+
+    Progress bars redraw one line with ``\\r`` thousands of times; only the
+    latest complete segment of each line is visible.  Call this with the
+    length of the buffer before new bytes were appended so that only the
+    current line and the new bytes are scanned.  The visible text (as seen
+    by ``clean_text``, ``tail_text`` and ``tail_bytes``) is unchanged.
+
+    Returns ``(buf, overwrites)`` where *overwrites* counts the visible
+    segments that were dropped, i.e. real redraws.  *buf* is returned as is
+    when nothing was dropped, otherwise as a new object of the same type.
+    """
+    line_start = buf.rfind(b"\n", 0, start) + 1
+    pieces = [buf[:line_start]]
+    overwrites = 0
+    changed = False
+    while True:
+        nl = buf.find(b"\n", line_start)
+        closed = nl != -1
+        line_end = nl
+        if not closed:
+            line_end = len(buf)
+
+        cut = _overwritten_end(buf, line_start, line_end, closed)
+        if cut > line_start:
+            changed = True
+            for segment in buf[line_start : cut - 1].split(b"\r"):
+                if not _invisible(segment):
+                    overwrites += 1
+        if not closed:
+            pieces.append(buf[cut:])
+            break
+        pieces.append(buf[cut : nl + 1])
+        line_start = nl + 1
+
+    if not changed:
+        return buf, 0
+    return type(buf)(b"".join(pieces)), overwrites
+
+
+# ------------------------------------------------------------------
+# cursor row tracking
+# ------------------------------------------------------------------
+
+# newlines and the CSI sequences that move the cursor vertically
+_ROW_MOVE_RE = re.compile(rb"\n|\x1b\[([0-9;]*)([ABEFHfd])")
+
+
+class CursorTracker:
+    """Follow the cursor's row through a stream of terminal output.
+
+    Parameters
+    ----------
+    rows : int
+        Height of the terminal (default 24).  A newline on the bottom row
+        scrolls instead of moving the cursor.
+
+    ``position`` is the row plus the number of lines scrolled off the top,
+    i.e. an absolute line in the output.  A prompt re-drawn in place (the
+    cursor moved back up) keeps its position; the same prompt printed again
+    after more output gets a new one.  Only newlines and the CSI cursor
+    movements ``A B E F H f d`` are interpreted, which is all a full-screen
+    redraw needs.
+    """
+
+    def __init__(self, rows=24):
+        self.rows = rows
+        self.row = 1
+        self.scrolled = 0
+
+    def feed(self, data):
+        """Update the row from a chunk of raw output bytes."""
+        for match in _ROW_MOVE_RE.finditer(data):
+            final = match.group(2)
+            if final is None:
+                if self.row < self.rows:
+                    self.row += 1
+                else:
+                    self.scrolled += 1
+                continue
+
+            params = match.group(1).split(b";")
+            count = int(params[0] or 1)
+            if final in (b"A", b"F"):
+                self.row = max(1, self.row - count)
+            elif final in (b"B", b"E"):
+                self.row = min(self.rows, self.row + count)
+            else:
+                # H / f / d: absolute row (1-based)
+                self.row = min(self.rows, max(1, count))
+
+    @property
+    def position(self):
+        return self.scrolled + self.row
@@ -0,0 +1,145 @@
+"""Circuit breaker against answer storms.
+
+A child that asks the same question in a loop, or a pattern that matches
+the child's echo of our own ``y``, would otherwise be answered once per
+cooldown for as long as the session lasts.  ``Breaker`` keeps the answers
+of the last *window* seconds and trips when one prompt was answered
+*max_repeats* times within it, or when all answers reach *max_responses*.
+Both limits are opt-in: a prompt is keyed by its last line, which agent
+CLIs repeat for every approval (``> 1. Yes``), and distinct prompts in a
+row are what a batch job looks like.
+
+A tripped breaker pauses answers for *window* seconds: to the repeated
+prompt only (``action="pause"``; a rate trip always pauses the session),
+to the whole session (``"pause-all"``), or pauses the session and asks
+the runner to terminate the child (``"kill"``).  The runner reads new
+trips with ``take_trips`` on its own thread, so ``record`` can be called
+from the detection worker.
+"""
+
+import time
+from collections import deque, namedtuple
+
+ACTIONS = ("pause", "pause-all", "kill")
+
+# default limits: answers per window and answers to one prompt per window
+# (both off: legitimate sessions answer many prompts, often with the same
+# last line), and the window (and pause) length in seconds
+MAX_RESPONSES = 0
+MAX_REPEATS = 0
+WINDOW = 60.0
+
+# what a trip reports: *reason* (text), whether it paused the whole
+# session and whether the child should be terminated
+Trip = namedtuple("Trip", ["reason", "session", "kill"])
+
+
+class Breaker:
+    """Answer-rate and repeated-prompt limits over a sliding window.
+
+    Parameters
+    ----------
+    max_responses : int
+        Answers allowed within *window* seconds (``0``: no limit).
+    max_repeats : int
+        Answers to one prompt allowed within *window* (``0``: no limit).
+    window : float
+        Length of the sliding window and of a pause, in seconds.
+    action : str
+        ``"pause"``, ``"pause-all"`` or ``"kill"`` (see the module docs).
+    """
+
+    def __init__(
+        self, max_responses=MAX_RESPONSES, max_repeats=MAX_REPEATS, window=WINDOW, action="pause"
+    ):
+        if action not in ACTIONS:
+            choices = ", ".join(ACTIONS)
+            raise ValueError(f"unknown storm action {action!r} (choose from {choices})")
+        self.max_responses = max_responses
+        self.max_repeats = max_repeats
+        self.window = window
+        self.action = action
+        self.trips = 0
+        self._answers = deque()
+        self._counts = {}
+        # prompt key (None: the whole session) -> paused until
+        self._paused = {}
+        self._new_trips = deque()
+
+    def allows(self, key=None, now=None):
+        """Return ``False`` while answers to *key* (or all answers) are paused."""
+        if not self._paused:
+            return True
+        if now is None:
+            now = time.time()
+        for paused in (None, key):
+            until = self._paused.get(paused)
+            if until is None:
+                continue
+            if now < until:
+                return False
+            self._paused.pop(paused, None)
+        return True
+
+    def record(self, key, now=None):
+        """Count an answer to the prompt *key*; trips the breaker if that
+        reaches a limit.
+        """
+        if now is None:
+            now = time.time()
+        self._expire(now)
+        self._answers.append((now, key))
+        self._counts[key] = self._counts.get(key, 0) + 1
+
+        if self.max_repeats and self._counts[key] >= self.max_repeats:
+            reason = (
+                f"the same prompt was answered {self._counts[key]} times "
+                f"in {self.window:g} s"
+            )
+            self._trip(reason, key, now)
+        elif self.max_responses and len(self._answers) >= self.max_responses:
+            reason = f"{len(self._answers)} answers in {self.window:g} s"
+            self._trip(reason, None, now)
+
+    def take_trips(self):
+        """Return the ``Trip``\\ s since the last call."""
+        trips = []
+        while self._new_trips:
+            trips.append(self._new_trips.popleft())
+        return trips
+
+    def stats(self, now=None):
+        """Return ``trips`` so far, prompts currently ``paused`` and whether
+        the whole session is paused (``session_paused``).
+        """
+        if now is None:
+            now = time.time()
+        paused = [key for key, until in list(self._paused.items()) if now < until]
+        return {
+            "trips": self.trips,
+            "paused": len([key for key in paused if key is not None]),
+            "session_paused": None in paused,
+        }
+
+    def _trip(self, reason, key, now):
+        if self.action != "pause":
+            key = None
+        self._paused[key] = now + self.window
+        self.trips += 1
+        # start counting afresh once the pause is over
+        if key is None:
+            self._answers.clear()
+        else:
+            self._answers = deque(answer for answer in self._answers if answer[1] != key)
+        self._counts = {}
+        for _, answered in self._answers:
+            self._counts[answered] = self._counts.get(answered, 0) + 1
+        self._new_trips.append(Trip(reason, key is None, self.action == "kill"))
+
+    def _expire(self, now):
+        horizon = now - self.window
+        while self._answers and self._answers[0][0] <= horizon:
+            _, key = self._answers.popleft()
+            self._counts[key] -= 1
+            if not self._counts[key]:
+                del self._counts[key]
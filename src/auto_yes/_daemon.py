@@ -0,0 +1,412 @@
+"""Optional auto-yes daemon (``auto-yes daemon start``, Unix only).
+
+Starting a session normally costs an interpreter start, the ``runner`` and
+``detector`` imports and compiling the pattern sets.  The daemon pays for
+those once: it listens on ``socket_path()``, keeps a compiled
+``PromptDetector`` per pattern configuration and forks a session process
+per request, which inherits the compiled detector.
+
+A client sends one request per connection: a length-prefixed JSON message
+with its stdin, stdout and stderr attached as ``SCM_RIGHTS`` ancillary
+data.  The session process proxies the command on those descriptors, so
+the client's terminal is driven directly, and replies with JSON lines::
+
+    {"pid": 1234}                     the session started
+    {"warning": "..."}                a pattern audit finding
+    {"error": "..."}                  the session could not start
+    {"exit": 0, "stats": {...}}       the command finished
+
+The CLI goes through the daemon when ``AUTO_YES_DAEMON=1`` is set and the
+daemon is reachable, and runs the session itself otherwise.
+
+A request carries the client's environment and terminal, and the daemon
+runs whatever it is sent, so both ends only talk to their own user: the
+socket lives in a ``_registry.private_dir`` and each side checks the
+other's uid (``SO_PEERCRED`` / ``LOCAL_PEERCRED``) where the platform
+reports it.
+"""
+
+import contextlib
+import json
+import os
+import signal
+import socket
+import struct
+import sys
+import warnings
+
+from auto_yes import _registry
+
+ENV_VAR = "AUTO_YES_DAEMON"
+
+_HEADER = struct.Struct("!I")
+_MAX_MESSAGE = 1 << 20
+_MAX_FDS = 3
+
+# Runner arguments that determine the compiled detector
+_DETECTOR_KEYS = ("categories", "extra_patterns", "max_line_chars", "narrow_after")
+
+
+def socket_path():
+    """Return the path of the daemon's Unix socket."""
+    return os.path.join(_registry.runtime_dir(), "daemon.sock")
+
+
+def enabled():
+    """Return ``True`` if the CLI should try the daemon (``AUTO_YES_DAEMON=1``)."""
+    return sys.platform != "win32" and os.environ.get(ENV_VAR) == "1"
+
+
+def _peer_uid(sock):
+    """Return the uid of the process at the other end of *sock*, or
+    ``None`` if the platform does not tell.
+    """
+    if hasattr(socket, "SO_PEERCRED"):
+        # struct ucred: pid, uid, gid
+        creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+        return struct.unpack("3i", creds)[1]
+    if hasattr(socket, "LOCAL_PEERCRED"):
+        # struct xucred (SOL_LOCAL): version, uid, ngroups, groups[16]
+        creds = sock.getsockopt(0, socket.LOCAL_PEERCRED, struct.calcsize("2Ih16I"))
+        return struct.unpack_from("2I", creds)[1]
+    return None
+
+
+def _same_user(sock):
+    uid = _peer_uid(sock)
+    return uid is None or uid == os.getuid()
+
+
+# ----------------------------------------------------------------------
+# wire format
+# ----------------------------------------------------------------------
+
+
+def _send(sock, message, fds=()):
+    data = json.dumps(message).encode()
+    payload = _HEADER.pack(len(data)) + data
+    if fds:
+        sent = socket.send_fds(sock, [payload], list(fds))
+        payload = payload[sent:]
+    if payload:
+        sock.sendall(payload)
+
+
+def _receive(sock):
+    """Return ``(message, fds)`` for one request read from *sock*."""
+    data, fds, _, _ = socket.recv_fds(sock, 65536, _MAX_FDS)
+    try:
+        while len(data) < _HEADER.size:
+            chunk = sock.recv(65536)
+            if not chunk:
+                raise ConnectionError("truncated request")
+            data += chunk
+        size = _HEADER.unpack_from(data)[0]
+        if size > _MAX_MESSAGE:
+            raise ConnectionError("request too large")
+        while len(data) < _HEADER.size + size:
+            chunk = sock.recv(65536)
+            if not chunk:
+                raise ConnectionError("truncated request")
+            data += chunk
+        message = json.loads(data[_HEADER.size : _HEADER.size + size])
+    except (ConnectionError, ValueError):
+        for fd in fds:
+            os.close(fd)
+        raise
+    return message, fds
+
+
+def _reply(conn, message):
+    conn.sendall(json.dumps(message).encode() + b"\n")
+
+
+# ----------------------------------------------------------------------
+# client
+# ----------------------------------------------------------------------
+
+
+def connect(path=None):
+    """Return a socket connected to the daemon, or ``None`` if none runs.
+
+    A socket outside a private directory, or served by another user, is
+    treated as no daemon at all: nothing is sent to it.
+    """
+    if path is None:
+        path = socket_path()
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        _registry.private_dir(os.path.dirname(path))
+        sock.connect(path)
+        if not _same_user(sock):
+            raise OSError(f"{path} is served by another user")
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def ping(path=None):
+    """Return the daemon's status dict, or ``None`` if it is not running."""
+    sock = connect(path)
+    if sock is None:
+        return None
+    with sock:
+        try:
+            _send(sock, {"op": "ping"})
+            line = sock.makefile("rb").readline()
+        except ConnectionError:
+            # connected while a stopping daemon closed its socket
+            return None
+    if not line:
+        return None
+    return json.loads(line)
+
+
+def stop(path=None):
+    """Ask the daemon to exit; return ``False`` if it was not running."""
+    sock = connect(path)
+    if sock is None:
+        return False
+    with sock:
+        _send(sock, {"op": "stop"})
+        sock.makefile("rb").readline()
+    return True
+
+
+def spawn(command, runner_kwargs, shell=False, path=None, on_warning=None):
+    """Run *command* (or an interactive shell) in a daemon session.
+
+    *runner_kwargs* are the ``Runner`` arguments.  Blocks until the command
+    exits and returns ``(exit_code, stats)``, or ``None`` if the daemon is
+    not running.  Raises ``ValueError`` with the daemon's message if the
+    session could not start (e.g. an unsafe custom pattern).  Pattern audit
+    findings are passed to *on_warning* as they arrive, or reported with
+    ``warnings.warn`` like ``Runner`` does.
+    """
+    sock = connect(path)
+    if sock is None:
+        return None
+
+    request = {
+        "op": "spawn",
+        "command": command,
+        "shell": shell,
+        "cwd": os.getcwd(),
+        "env": dict(os.environ),
+        "runner": runner_kwargs,
+    }
+    prev_winch = None
+    with sock:
+        _send(sock, request, (0, 1, 2))
+        replies = sock.makefile("rb")
+        try:
+            for line in replies:
+                reply = json.loads(line)
+                if "pid" in reply:
+                    prev_winch = _forward_winch(reply["pid"])
+                elif "warning" in reply and on_warning is not None:
+                    on_warning(reply["warning"])
+                elif "warning" in reply:
+                    warnings.warn(reply["warning"], RuntimeWarning, stacklevel=2)
+                elif "error" in reply:
+                    raise ValueError(reply["error"])
+                elif "exit" in reply:
+                    return reply["exit"], reply.get("stats", {})
+        finally:
+            if prev_winch is not None:
+                signal.signal(signal.SIGWINCH, prev_winch)
+    # the session process died without reporting
+    return 1, {}
+
+
+def _forward_winch(pid):
+    """Pass the terminal's resizes on to the session process *pid*.
+
+    The kernel signals the terminal's foreground job, the client, and not
+    the session, which the daemon started.
+    """
+
+    def _on_winch(_sig, _frame):
+        with contextlib.suppress(OSError):
+            os.kill(pid, signal.SIGWINCH)
+
+    return signal.signal(signal.SIGWINCH, _on_winch)
+
+
+# ----------------------------------------------------------------------
+# server
+# ----------------------------------------------------------------------
+
+
+class Daemon:
+    """Serve session requests on the Unix socket *path*.
+
+    Parameters
+    ----------
+    path : str
+        Socket to listen on; a stale socket left by a dead daemon is
+        replaced.  Raises ``OSError`` if another daemon answers there or
+        its directory is not private.
+    warm : list of dict, optional
+        ``Runner`` argument sets whose detectors are compiled up front.
+    """
+
+    def __init__(self, path, warm=None):
+        self.path = path
+        self.sessions = 0
+        self._detectors = {}
+        self._stopped = False
+        probe = connect(path)
+        if probe is not None:
+            probe.close()
+            raise OSError(f"a daemon is already listening on {path}")
+        _registry.private_dir(os.path.dirname(path))
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(path)
+        self._sock.listen(64)
+        # load what the sessions need once, before forking them
+        import auto_yes.runner  # noqa: F401
+
+        for kwargs in warm or ():
+            with contextlib.suppress(ValueError), warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                self._detector(kwargs)
+
+    def serve_forever(self):
+        """Handle requests until a ``stop`` request arrives."""
+        self._sock.settimeout(1.0)
+        try:
+            while not self._stopped:
+                self._reap()
+                try:
+                    conn, _ = self._sock.accept()
+                except socket.timeout:
+                    continue
+                if not _same_user(conn):
+                    conn.close()
+                    continue
+                with conn, contextlib.suppress(OSError, ValueError):
+                    conn.settimeout(5.0)
+                    self._handle(conn)
+        finally:
+            self._sock.close()
+            with contextlib.suppress(OSError):
+                os.unlink(self.path)
+
+    def _handle(self, conn):
+        message, fds = _receive(conn)
+        op = message.get("op")
+        if op == "spawn":
+            self._spawn(conn, message, fds)
+            return
+        for fd in fds:
+            os.close(fd)
+        if op == "ping":
+            _reply(
+                conn,
+                {"pid": os.getpid(), "sessions": self.sessions, "detectors": len(self._detectors)},
+            )
+        elif op == "stop":
+            self._stopped = True
+            _reply(conn, {"ok": True})
+
+    def _detector(self, kwargs):
+        """Return the compiled detector for *kwargs*, building it on first use."""
+        from auto_yes.detector import PromptDetector
+
+        key = json.dumps([kwargs.get(name) for name in _DETECTOR_KEYS])
+        detector = self._detectors.get(key)
+        if detector is None:
+            options = {name: kwargs[name] for name in _DETECTOR_KEYS if name in kwargs}
+            detector = PromptDetector(**options)
+            self._detectors[key] = detector
+        return detector
+
+    def _spawn(self, conn, message, fds):
+        kwargs = message.get("runner", {})
+        try:
+            if len(fds) != _MAX_FDS:
+                raise ValueError("a session needs stdin, stdout and stderr")
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter("always", RuntimeWarning)
+                detector = self._detector(kwargs)
+        except ValueError as exc:
+            for fd in fds:
+                os.close(fd)
+            _reply(conn, {"error": str(exc)})
+            return
+        for warning in caught:
+            _reply(conn, {"warning": str(warning.message)})
+
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                self._sock.close()
+                code = _session(conn, message, fds, detector)
+            finally:
+                os._exit(code)
+        self.sessions += 1
+        for fd in fds:
+            os.close(fd)
+
+    @staticmethod
+    def _reap():
+        with contextlib.suppress(ChildProcessError):
+            while os.waitpid(-1, os.WNOHANG)[0]:
+                pass
+
+
+def _session(conn, message, fds, detector):
+    """Body of a forked session process; returns its exit status."""
+    from auto_yes.runner import Runner
+
+    for target, fd in enumerate(fds):
+        os.dup2(fd, target)
+        os.close(fd)
+    # the daemon's own stream objects may not be bound to 0-2 any more
+    sys.stdin = open(0, closefd=False)  # noqa: SIM115
+    sys.stdout = open(1, "w", closefd=False)  # noqa: SIM115
+    sys.stderr = open(2, "w", closefd=False)  # noqa: SIM115
+    os.environ.clear()
+    os.environ.update(message.get("env", {}))
+    with contextlib.suppress(OSError):
+        os.chdir(message.get("cwd", "/"))
+
+    try:
+        runner = Runner(detector=detector, **message.get("runner", {}))
+        _reply(conn, {"pid": os.getpid()})
+        if message.get("shell"):
+            code = runner.run_shell()
+        else:
+            code = runner.run_command(message["command"])
+        _reply(conn, {"exit": code, "stats": runner.stats()})
+    except Exception as exc:  # report anything rather than leave the client hanging
+        with contextlib.suppress(OSError):
+            _reply(conn, {"error": f"{type(exc).__name__}: {exc}"})
+        return 1
+    return 0
+
+
+def daemonize():
+    """Detach from the terminal (double fork); returns in the daemon only.
+
+    Returns ``False`` in the calling process, which should wait for the
+    daemon's socket to accept connections.
+    """
+    pid = os.fork()
+    if pid:
+        os.waitpid(pid, 0)
+        return False
+    os.setsid()
+    if os.fork():
+        os._exit(0)
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+    os.close(devnull)
+    os.chdir("/")
+    return True
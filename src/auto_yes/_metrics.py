@@ -0,0 +1,239 @@
+"""Per-session counters in Prometheus text format (``--metrics-socket`` /
+``--metrics-textfile``).
+
+``Runner`` owns one ``Metrics`` and bumps its attributes as it goes; every
+update is an integer add or, for the latency histogram, one bisect over a
+fixed bucket list.  Exporters run on their own daemon thread and only read
+the counters, so rendering and writing never happen on the I/O loop.
+"""
+
+import bisect
+import contextlib
+import os
+import socket
+import stat
+import threading
+
+# prompt-to-response latency buckets, seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# how often the textfile exporter rewrites its file, seconds
+TEXTFILE_INTERVAL = 5.0
+
+_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Metrics attribute and help text of each counter
+_COUNTERS = (
+    ("bytes_in", "Bytes read from the child."),
+    ("bytes_out", "Bytes written to the child (keystrokes and answers)."),
+    ("reads", "read() calls on the terminal and the PTY."),
+    ("wakeups", "I/O loop wakeups (ready descriptors or timeouts)."),
+    ("writes", "write() / writev() calls on stdout."),
+    ("detections", "Prompt checks run against the output."),
+    ("matches", "Prompt checks that found a prompt."),
+    ("suppressed", "Prompts found but not answered (cooldown or already answered)."),
+    ("responses", "Answers sent."),
+)
+
+
+def _escape(value):
+    """Escape *value* for use as a Prometheus label value."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:
+    """Counters and the prompt-to-response latency histogram of one session.
+
+    The attributes named in ``_COUNTERS`` are plain integers the runner
+    increments directly; ``observe_latency`` and ``hit`` cover the
+    histogram and the per-pattern answer counts.
+    """
+
+    def __init__(self):
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.reads = 0
+        self.wakeups = 0
+        self.writes = 0
+        self.detections = 0
+        self.matches = 0
+        self.suppressed = 0
+        self.responses = 0
+        self._buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self._latency_sum = 0.0
+        self._patterns = {}
+
+    def observe_latency(self, seconds):
+        """Record one prompt-to-response latency."""
+        self._buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self._latency_sum += seconds
+
+    def hit(self, pattern):
+        """Count one answer triggered by *pattern*."""
+        self._patterns[pattern] = self._patterns.get(pattern, 0) + 1
+
+    def render(self, labels=None):
+        """Return the counters in Prometheus text exposition format.
+
+        *labels* (a dict) is attached to every sample, e.g. the session pid.
+        """
+        base = ""
+        if labels:
+            base = ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items())
+
+        def sample(name, value, extra=""):
+            inner = ",".join(part for part in (base, extra) if part)
+            if inner:
+                return f"auto_yes_{name}{{{inner}}} {value}\n"
+            return f"auto_yes_{name} {value}\n"
+
+        lines = []
+        for name, text in _COUNTERS:
+            lines.append(f"# HELP auto_yes_{name}_total {text}\n")
+            lines.append(f"# TYPE auto_yes_{name}_total counter\n")
+            lines.append(sample(f"{name}_total", getattr(self, name)))
+
+        lines.append(
+            "# HELP auto_yes_response_latency_seconds "
+            "Time from the prompt's last output to the answer.\n"
+        )
+        lines.append("# TYPE auto_yes_response_latency_seconds histogram\n")
+        buckets = list(self._buckets)
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, buckets):
+            cumulative += count
+            lines.append(sample("response_latency_seconds_bucket", cumulative, f'le="{bound}"'))
+        cumulative += buckets[-1]
+        lines.append(sample("response_latency_seconds_bucket", cumulative, 'le="+Inf"'))
+        lines.append(sample("response_latency_seconds_sum", repr(self._latency_sum)))
+        lines.append(sample("response_latency_seconds_count", cumulative))
+
+        lines.append("# HELP auto_yes_pattern_responses_total Answers sent per pattern.\n")
+        lines.append("# TYPE auto_yes_pattern_responses_total counter\n")
+        for pattern, count in sorted(self._patterns.copy().items()):
+            lines.append(sample("pattern_responses_total", count, f'pattern="{_escape(pattern)}"'))
+        return "".join(lines)
+
+
+# ----------------------------------------------------------------------
+# exporters
+# ----------------------------------------------------------------------
+
+
+class TextfileExporter:
+    """Rewrite *path* with ``metrics.render(labels)`` every *interval* seconds.
+
+    Each write goes to a temporary file in the same directory that is then
+    renamed over *path*, so a collector such as node-exporter's textfile
+    collector never sees a partial file.  ``close`` writes a final snapshot.
+    """
+
+    def __init__(self, path, metrics, labels=None, interval=TEXTFILE_INTERVAL):
+        self.path = path
+        self._metrics = metrics
+        self._labels = labels
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="auto-yes-metrics", daemon=True)
+        self._thread.start()
+
+    def write(self):
+        """Write the current snapshot to ``path`` atomically."""
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as fh:
+                fh.write(self._metrics.render(self._labels))
+            os.replace(tmp, self.path)
+        except OSError:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp)
+
+    def close(self):
+        """Stop the timer and write the final counters."""
+        self._stop.set()
+        self._thread.join(timeout=1.0)
+        self.write()
+
+    def _loop(self):
+        self.write()
+        while not self._stop.wait(self._interval):
+            self.write()
+
+
+def _is_socket(path):
+    try:
+        return stat.S_ISSOCK(os.stat(path).st_mode)
+    except OSError:
+        return False
+
+
+class SocketExporter:
+    """Serve ``metrics.render(labels)`` on the Unix socket *path*.
+
+    A client gets the current snapshot and the connection is closed.  A
+    request starting with ``GET`` is answered as HTTP/1.0, so Prometheus
+    (through a socket-capable proxy) or ``curl --unix-socket`` can scrape
+    it; anything else gets the bare text.
+
+    Raises ``OSError`` if *path* cannot be bound.
+    """
+
+    def __init__(self, path, metrics, labels=None):
+        self.path = path
+        self._metrics = metrics
+        self._labels = labels
+        self._stop = threading.Event()
+        # a socket left behind by a session that died
+        if _is_socket(path):
+            with contextlib.suppress(OSError):
+                probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                try:
+                    probe.connect(path)
+                except ConnectionRefusedError:
+                    os.unlink(path)
+                finally:
+                    probe.close()
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self._sock.bind(path)
+            self._sock.listen(8)
+        except OSError:
+            self._sock.close()
+            raise
+        self._sock.settimeout(0.2)
+        self._thread = threading.Thread(target=self._loop, name="auto-yes-metrics", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Stop serving and remove the socket."""
+        self._stop.set()
+        self._thread.join(timeout=1.0)
+        self._sock.close()
+        with contextlib.suppress(OSError):
+            os.unlink(self.path)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                conn, _ = self._sock.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            with conn, contextlib.suppress(OSError):
+                self._serve(conn)
+
+    def _serve(self, conn):
+        conn.settimeout(0.2)
+        request = b""
+        with contextlib.suppress(socket.timeout):
+            request = conn.recv(4096)
+        body = self._metrics.render(self._labels).encode()
+        if request.startswith(b"GET"):
+            head = (
+                "HTTP/1.0 200 OK\r\n"
+                f"Content-Type: {_CONTENT_TYPE}\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n"
+            )
+            body = head.encode() + body
+        conn.sendall(body)
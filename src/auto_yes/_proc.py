@@ -0,0 +1,214 @@
+"""Linux ``/proc`` probes for the foreground process group of a PTY.
+
+Used by the optional detection gate (``Runner(proc_gate=True)``): prompt
+patterns only run while a process in the PTY's foreground process group is
+asleep waiting for input, not while it is busy producing output.  Shell
+sessions also use ``program_names`` to tell which CLI is in the foreground.
+
+The probe is a best-effort hint read from ``wchan`` and ``syscall``: only
+a read of a terminal counts as waiting for input, and whatever it cannot
+classify (event loops, hidden kernel symbols) is reported as unknown, in
+which case the caller falls back to matching patterns alone.
+"""
+
+import os
+import platform
+import time
+
+# kernel functions a process sleeps in while it reads a terminal
+_TTY_READS = frozenset(["n_tty_read", "tty_read"])
+
+# generic sleeps the tty driver uses for reads and for writes to a full
+# buffer alike; /proc/PID/syscall tells which
+_TTY_SLEEPS = frozenset(["wait_woken"])
+
+# poll/select/epoll: an event loop may be waiting for the keyboard or for
+# anything else, so these tell nothing either way
+_EVENT_WAITS = frozenset(
+    [
+        "do_select",
+        "core_sys_select",
+        "do_sys_poll",
+        "poll_schedule_timeout",
+        "ep_poll",
+        "do_epoll_wait",
+    ]
+)
+
+# read-family syscall numbers (read, pread64, readv, preadv, preadv2)
+_READ_SYSCALLS = {
+    "x86_64": frozenset([0, 17, 19, 295, 327]),
+    "aarch64": frozenset([63, 65, 67, 69, 286]),
+}
+
+# what a probe found
+INPUT = "input"
+BUSY = "busy"
+
+
+def _read(path):
+    try:
+        with open(path, "rb") as fh:
+            return fh.read()
+    except OSError:
+        return None
+
+
+def _stat(pid):
+    """Return ``(state, pgrp)`` of *pid*, or ``None`` if it is gone."""
+    data = _read(f"/proc/{pid}/stat")
+    if data is None:
+        return None
+    # the command name may contain spaces and parentheses
+    fields = data.rsplit(b")", 1)[1].split()
+    return fields[0].decode(), int(fields[2])
+
+
+def _wchan(pid):
+    """Return the kernel function *pid* sleeps in, without compiler suffixes."""
+    data = _read(f"/proc/{pid}/wchan")
+    if data is None:
+        return ""
+    return data.decode(errors="replace").split(".", 1)[0]
+
+
+def _reads_terminal(pid):
+    """Return ``True`` if *pid* is blocked reading a terminal, ``False`` if
+    it is blocked in another syscall, ``None`` if that cannot be read.
+    """
+    reads = _READ_SYSCALLS.get(platform.machine())
+    data = _read(f"/proc/{pid}/syscall")
+    if reads is None or not data:
+        return None
+    fields = data.split()
+    # "running" while on a CPU, "-1 ..." outside a syscall
+    if len(fields) < 2 or not fields[0].isdigit():
+        return None
+    if int(fields[0]) not in reads:
+        return False
+    try:
+        target = os.readlink(f"/proc/{pid}/fd/{int(fields[1], 16)}")
+    except (OSError, ValueError):
+        return None
+    return target.startswith(("/dev/pts/", "/dev/tty"))
+
+
+def _children(pid):
+    data = _read(f"/proc/{pid}/task/{pid}/children")
+    if not data:
+        return []
+    return [int(child) for child in data.split()]
+
+
+def program_names(pid):
+    """Return the names *pid* may be known by, for profile lookup.
+
+    These are its ``comm`` and the base names of ``argv[0]`` and ``argv[1]``
+    (the script, when ``argv[0]`` is an interpreter such as ``node``).
+    """
+    names = []
+    comm = _read(f"/proc/{pid}/comm")
+    if comm:
+        names.append(comm.decode(errors="replace").strip())
+    cmdline = _read(f"/proc/{pid}/cmdline")
+    if cmdline:
+        argv = cmdline.decode(errors="replace").split("\0")
+        for arg in argv[:2]:
+            if arg and not arg.startswith("-"):
+                names.append(os.path.basename(arg))
+    return names
+
+
+def available():
+    """Return ``True`` if this system exposes the ``/proc`` files used here."""
+    return os.path.exists(f"/proc/{os.getpid()}/wchan")
+
+
+class ProcWatcher:
+    """Tell whether the foreground job of a PTY is waiting for input.
+
+    Parameters
+    ----------
+    master_fd : int
+        Master side of the PTY; ``tcgetpgrp`` on it names the foreground
+        process group of the child's terminal.
+    ttl : float
+        Seconds a probe result is reused (default 0.02), so bursts of output
+        cost one probe rather than one per read.
+
+    The probe walks the group leader and its descendants (a non-interactive
+    shell keeps its children in its own group).  The job is reading input
+    (``INPUT``) as soon as one group member is blocked reading the
+    terminal, and ``BUSY`` when every member was classified and none is.
+    Otherwise the state is unknown (``None``) and the gate stays open, so
+    it never hides a prompt it cannot see.
+    """
+
+    def __init__(self, master_fd, ttl=0.02):
+        self._master_fd = master_fd
+        self._ttl = ttl
+        self._checked = 0.0
+        self._state = None
+
+    def state(self):
+        """Return ``INPUT``, ``BUSY`` or ``None`` (unknown)."""
+        now = time.time()
+        if now - self._checked >= self._ttl:
+            self._state = self._probe()
+            self._checked = now
+        return self._state
+
+    def waiting_for_input(self):
+        """Return ``False`` only if the foreground job is known to be busy."""
+        return self.state() != BUSY
+
+    def _member_state(self, pid, state):
+        if state != "S":
+            # running, stopped, in uninterruptible I/O: not reading a key
+            return BUSY
+        wchan = _wchan(pid)
+        if wchan in _TTY_READS:
+            return INPUT
+        if wchan in _TTY_SLEEPS:
+            reading = _reads_terminal(pid)
+            if reading is None:
+                return None
+            if reading:
+                return INPUT
+            return BUSY
+        if wchan in _EVENT_WAITS or wchan in ("", "0"):
+            return None
+        return BUSY
+
+    def _probe(self):
+        try:
+            pgid = os.tcgetpgrp(self._master_fd)
+        except OSError:
+            return None
+
+        found = False
+        unknown = False
+        pending = [pgid]
+        seen = set()
+        while pending:
+            pid = pending.pop()
+            if pid in seen:
+                continue
+            seen.add(pid)
+            stat = _stat(pid)
+            if stat is None:
+                continue
+            state, pgrp = stat
+            if pgrp == pgid:
+                found = True
+                member = self._member_state(pid, state)
+                if member == INPUT:
+                    return INPUT
+                if member is None:
+                    unknown = True
+            pending.extend(_children(pid))
+
+        # nothing readable (e.g. the leader exited): cannot tell
+        if unknown or not found:
+            return None
+        return BUSY
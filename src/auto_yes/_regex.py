@@ -0,0 +1,528 @@
+"""Regex source analysis used when patterns are loaded.
+
+``PromptDetector`` compiles every pattern with ``re.IGNORECASE`` against
+``str`` input.  The helpers here work on the pattern *source* so that a
+pattern can also be run on raw bytes where that is provably equivalent.
+"""
+
+import re
+import string
+from collections import namedtuple
+
+# non-ASCII characters that IGNORECASE folds onto ASCII letters
+# (dotted/dotless i, LONG S, KELVIN SIGN)
+_ASCII_FOLDING = frozenset("İıſK")
+
+
+def ascii_twin(src):
+    """Return a bytes regex source equivalent to *src* on ASCII-only input.
+
+    On cleaned ASCII text every construct (``\\s``, ``\\w``, ``\\b``, ``.``,
+    classes, IGNORECASE) means the same for str and bytes patterns, so the
+    source only needs its non-ASCII literals encoded.  Each one is wrapped in
+    a group so a quantifier still applies to the whole character.  Returns
+    ``None`` if *src* cannot be expressed as a bytes pattern (``\\u`` escapes,
+    Unicode-only flags) or contains a character that folds onto ASCII.
+    """
+    if any(ch in _ASCII_FOLDING for ch in src):
+        return None
+
+    out = []
+    in_class = False
+    i = 0
+    while i < len(src):
+        ch = src[i]
+        if ch == "\\":
+            nxt = src[i + 1 : i + 2]
+            if nxt.isascii():
+                out.append(("\\" + nxt).encode())
+                i += 2
+                continue
+            # an escaped non-ASCII character is just that character
+            i += 1
+            ch = nxt
+        elif ch == "[" and not in_class:
+            in_class = True
+            # a leading "^" and/or "]" belong to the class body
+            j = i + 1
+            if src[j : j + 1] == "^":
+                j += 1
+            if src[j : j + 1] == "]":
+                j += 1
+            out.append(src[i:j].encode())
+            i = j
+            continue
+        elif ch == "]" and in_class:
+            in_class = False
+
+        if ch.isascii() or in_class:
+            # inside a class the encoded bytes can never match ASCII input,
+            # exactly like the original character
+            out.append(ch.encode())
+        else:
+            out.append(b"(?:" + ch.encode() + b")")
+        i += 1
+
+    twin = b"".join(out)
+    try:
+        re.compile(twin)
+    except re.error:
+        return None
+    return twin
+
+
+# ------------------------------------------------------------------
+# canonical form and subsumption (pattern-set optimisation)
+# ------------------------------------------------------------------
+
+# characters that keep a special meaning when escaped outside a class
+_SPECIAL = frozenset(".^$*+?{}[]\\|()")
+
+# quantifier spellings that have a shorter equivalent
+_QUANTIFIER_ALIASES = {"{0,}": "*", "{1,}": "+", "{0,1}": "?"}
+
+Canonical = namedtuple("Canonical", ["source", "tokens", "alternation"])
+
+
+def _quantifier_end(src, i):
+    """Return the index just past the quantifier starting at *i* (if any)."""
+    if i >= len(src):
+        return i
+    if src[i] in "*+?":
+        j = i + 1
+    elif src[i] == "{":
+        close = src.find("}", i)
+        if close == -1 or not _is_counted(src[i + 1 : close]):
+            return i
+        j = close + 1
+    else:
+        return i
+    # lazy / possessive modifier
+    if j < len(src) and src[j] in "?+":
+        j += 1
+    return j
+
+
+def _is_counted(body):
+    # "{m}", "{m,}", "{,n}", "{m,n}"; anything else is a literal brace
+    return body not in ("", ",") and re.fullmatch(r"\d*(?:,\d*)?", body) is not None
+
+
+def _canonical_class(body):
+    """Collapse a class of case variants (``[Aa]``) under IGNORECASE."""
+    inner = body[1:-1]
+    if inner.isalpha() and inner.isascii():
+        letters = sorted(set(inner.lower()))
+        if len(letters) == 1:
+            return letters[0]
+        return "[" + "".join(letters) + "]"
+    return body
+
+
+def _canonical_quantifier(text):
+    for alias, short in _QUANTIFIER_ALIASES.items():
+        if text.startswith(alias):
+            return short + text[len(alias) :]
+    return text
+
+
+def _group_end(src, i):
+    """Return the index of the ``)`` closing the group opened at *i*."""
+    depth = 0
+    j = i
+    while j < len(src):
+        ch = src[j]
+        if ch == "\\":
+            j += 2
+            continue
+        if ch == "[":
+            j = _class_end(src, j) + 1
+            if j == 0:
+                return -1
+            continue
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+            if depth == 0:
+                return j
+        j += 1
+    return -1
+
+
+def _class_end(src, i):
+    """Return the index of the ``]`` closing the class opened at *i*."""
+    j = i + 1
+    if src[j : j + 1] == "^":
+        j += 1
+    if src[j : j + 1] == "]":
+        j += 1
+    while j < len(src):
+        if src[j] == "\\":
+            j += 2
+            continue
+        if src[j] == "]":
+            return j
+        j += 1
+    return -1
+
+
+def _atoms(src):
+    """Yield ``(atom, quantifier)`` pairs for the top level of *src*.
+
+    A top-level ``|`` is yielded as ``("|", "")``.  Raises ``ValueError``
+    for constructs the scanner cannot delimit.
+    """
+    i = 0
+    while i < len(src):
+        ch = src[i]
+        if ch == "\\":
+            if i + 1 >= len(src):
+                raise ValueError("trailing backslash")
+            j = i + 2
+        elif ch == "[":
+            close = _class_end(src, i)
+            if close == -1:
+                raise ValueError("unterminated character class")
+            j = close + 1
+        elif ch == "(":
+            close = _group_end(src, i)
+            if close == -1:
+                raise ValueError("unbalanced parenthesis")
+            j = close + 1
+        elif ch == "|":
+            yield "|", ""
+            i += 1
+            continue
+        elif ch in "*+?":
+            raise ValueError("nothing to repeat")
+        else:
+            j = i + 1
+
+        end = _quantifier_end(src, j)
+        yield src[i:j], src[j:end]
+        i = end
+
+
+def _group_head(atom):
+    """Return the opening of group *atom* (``"("``, ``"(?:"``, ...).
+
+    Returns ``None`` for inline flags and named back-references, whose
+    body is not a sub-pattern.
+    """
+    if atom.startswith("(?P<"):
+        return atom[: atom.index(">") + 1]
+    for prefix in ("(?:", "(?=", "(?!", "(?<=", "(?<!"):
+        if atom.startswith(prefix):
+            return prefix
+    if atom.startswith("(?"):
+        return None
+    return "("
+
+
+def canonicalize(src):
+    """Return the ``Canonical`` form of *src* as matched with IGNORECASE.
+
+    Literal letters are case-folded, ``[Aa]``-style classes collapse to one
+    letter, needless escapes and long quantifier spellings are normalised.
+    ``tokens`` lists the top-level atoms with their quantifiers attached;
+    ``alternation`` tells whether the top level contains ``|``.  Returns
+    ``None`` for sources this simple parser does not understand or that use
+    back-references (whose numbering would not survive a comparison).
+    """
+    try:
+        atoms = list(_atoms(src))
+    except ValueError:
+        return None
+
+    tokens = []
+    alternation = False
+    for atom, quantifier in atoms:
+        if atom == "|":
+            alternation = True
+            tokens.append("|")
+            continue
+        if atom[0] == "\\":
+            nxt = atom[1]
+            if nxt.isdigit():
+                return None
+            if not (nxt.isalnum() or nxt in _SPECIAL):
+                atom = nxt
+        elif atom[0] == "[":
+            atom = _canonical_class(atom)
+        elif atom[0] == "(":
+            head = _group_head(atom)
+            if head is None:
+                return None
+            inner = canonicalize(atom[len(head) : -1])
+            if inner is None:
+                return None
+            atom = head + inner.source + ")"
+        else:
+            atom = atom.lower()
+        tokens.append(atom + _canonical_quantifier(quantifier))
+
+    return Canonical("".join(tokens), tuple(tokens), alternation)
+
+
+def covers(general, specific):
+    """Return ``True`` if *general* provably matches wherever *specific* does.
+
+    Both are ``Canonical`` forms of patterns used with ``search``.  Besides
+    equal sources this recognises the case where *general* is a contiguous
+    run of *specific*'s top-level atoms: every match of *specific* then
+    contains a match of *general* at the same position of the same string.
+    """
+    if general.source == specific.source:
+        return True
+    if general.alternation or specific.alternation:
+        return False
+    size = len(general.tokens)
+    if size == 0 or size > len(specific.tokens):
+        return False
+    for start in range(len(specific.tokens) - size + 1):
+        if specific.tokens[start : start + size] == general.tokens:
+            return True
+    return False
+
+
+# ------------------------------------------------------------------
+# backtracking audit (user-supplied patterns)
+# ------------------------------------------------------------------
+
+Finding = namedtuple("Finding", ["level", "message"])
+
+# characters probed to decide whether two single-character atoms overlap
+_PROBES = string.printable + " é─│❯●"
+
+# zero-width atoms never consume input, so they do not break a chain
+_ZERO_WIDTH = frozenset(["^", "$", "\\b", "\\B", "\\A", "\\Z"])
+
+
+def _bounds(quantifier):
+    """Return ``(min, max)`` repetitions for *quantifier*; ``max`` may be ``None``."""
+    q = quantifier
+    if len(q) > 1 and q[-1] in "?+":
+        # lazy / possessive modifier
+        q = q[:-1]
+    if q == "":
+        return 1, 1
+    if q == "*":
+        return 0, None
+    if q == "+":
+        return 1, None
+    if q == "?":
+        return 0, 1
+    low, _, high = q[1:-1].partition(",")
+    low = int(low or 0)
+    if "," not in q:
+        return low, low
+    if high == "":
+        return low, None
+    return low, int(high)
+
+
+def _charset(atom):
+    """Return the probe characters a single-character *atom* matches.
+
+    Returns ``None`` for groups and zero-width atoms.
+    """
+    if atom[0] == "(" or atom in _ZERO_WIDTH:
+        return None
+    try:
+        regex = re.compile(atom, re.IGNORECASE)
+    except re.error:
+        return None
+    return frozenset(ch for ch in _PROBES if regex.fullmatch(ch))
+
+
+def _unbounded(src):
+    """Return ``True`` if *src* repeats anything without an upper bound."""
+    try:
+        atoms = list(_atoms(src))
+    except ValueError:
+        return False
+    for atom, quantifier in atoms:
+        if _bounds(quantifier)[1] is None:
+            return True
+        if atom[0] == "(":
+            head = _group_head(atom)
+            if head is not None and _unbounded(atom[len(head) : -1]):
+                return True
+    return False
+
+
+def _ambiguous_repeat(src):
+    """Return ``True`` if repeating the group body *src* can split its input
+    between iterations in more than one way.
+
+    That is the case when an unbounded repeat in *src* can also match
+    whatever may follow it, up to the next mandatory atom, wrapping round
+    into the next iteration: in ``(a+)+`` the ``a+`` runs straight into the
+    next iteration's ``a+``.  A mandatory delimiter it cannot match, like
+    the ``\\.`` of ``(\\d+\\.)+``, stops the backtracking.  Nested groups and
+    alternations are not analysed and count as ambiguous.
+    """
+    try:
+        atoms = list(_atoms(src))
+    except ValueError:
+        return True
+    if any(atom == "|" for atom, _ in atoms):
+        return True
+
+    steps = []
+    for atom, quantifier in atoms:
+        low, high = _bounds(quantifier)
+        if atom[0] == "(":
+            if high is None or high > 1 or _unbounded(atom):
+                return True
+            # a bounded group: opaque, but it does not end a chain
+            steps.append((None, low, high))
+            continue
+        charset = _charset(atom)
+        if charset is not None:
+            steps.append((charset, low, high))
+
+    for index, (charset, _, high) in enumerate(steps):
+        if charset is None or high is not None:
+            continue
+        for offset in range(1, len(steps) + 1):
+            following, low, _ = steps[(index + offset) % len(steps)]
+            if following is None or following & charset:
+                return True
+            if low > 0:
+                break
+    return False
+
+
+def _has_alternation(src):
+    """Return ``True`` if *src* contains ``|`` at any group level."""
+    try:
+        atoms = list(_atoms(src))
+    except ValueError:
+        return False
+    for atom, _ in atoms:
+        if atom == "|":
+            return True
+        if atom[0] == "(":
+            head = _group_head(atom)
+            if head is not None and _has_alternation(atom[len(head) : -1]):
+                return True
+    return False
+
+
+def _deterministic_alternation(src):
+    """Return ``True`` if each iteration of a repeated *src* is fixed by its
+    first character.
+
+    That holds when every branch is a run of fixed-count single-character
+    atoms and no two branches can start with the same character, as in
+    ``(?:yes|no)+``.  Anything else, ``(a|aa)+`` or ``(ab?|b)+``, can split
+    its input between iterations in many ways and may take exponential time.
+    """
+    branches = [[]]
+    for atom, quantifier in _atoms(src):
+        if atom == "|":
+            branches.append([])
+            continue
+        low, high = _bounds(quantifier)
+        charset = _charset(atom)
+        if charset is None or low != high or low == 0:
+            return False
+        branches[-1].append(charset)
+
+    seen = frozenset()
+    for branch in branches:
+        if not branch or branch[0] & seen:
+            return False
+        seen |= branch[0]
+    return True
+
+
+def _audit(src, findings):
+    try:
+        atoms = list(_atoms(src))
+    except ValueError as exc:
+        findings.append(Finding("error", str(exc)))
+        return
+
+    # chain state: the last unbounded atom and what it can absorb
+    chain_atom = None
+    chain_set = None
+    for atom, quantifier in atoms:
+        if atom == "|":
+            chain_atom = None
+            continue
+
+        low, high = _bounds(quantifier)
+        if atom[0] == "(":
+            head = _group_head(atom)
+            if head is None:
+                chain_atom = None
+                continue
+            inner = atom[len(head) : -1]
+            if (high is None or high > 1) and _unbounded(inner):
+                level = "warning"
+                if _ambiguous_repeat(inner):
+                    level = "error"
+                findings.append(Finding(level, f"nested quantifier: {atom}{quantifier}"))
+            elif high is None and _has_alternation(inner):
+                level = "error"
+                if _deterministic_alternation(inner):
+                    level = "warning"
+                findings.append(Finding(level, f"repeated alternation: {atom}{quantifier}"))
+            _audit(inner, findings)
+            if low > 0:
+                chain_atom = None
+            continue
+
+        charset = _charset(atom)
+        if charset is None:
+            # zero-width: transparent to a chain
+            continue
+
+        if high is None:
+            if chain_atom is not None and charset & chain_set:
+                findings.append(
+                    Finding(
+                        "warning",
+                        f"ambiguous chain: {chain_atom} ... {atom}{quantifier}",
+                    )
+                )
+            chain_atom = atom + quantifier
+            chain_set = charset
+        elif low > 0 and chain_atom is not None and not charset <= chain_set:
+            # a mandatory atom the previous repeat cannot swallow ends the chain
+            chain_atom = None
+
+
+def audit(src):
+    """Statically check *src* for patterns prone to catastrophic backtracking.
+
+    Returns a list of ``Finding(level, message)``.  ``"error"`` findings
+    (an invalid pattern, a repeated group whose inner repeat can run into
+    the next iteration, such as ``(a+)+``, or a repeated alternation whose
+    branches can split the input in more than one way, such as ``(a|aa)+``)
+    can take exponential time and should be rejected.  ``"warning"``
+    findings (a nested quantifier kept apart by a delimiter, such as
+    ``(\\d+\\.)+``, unbounded repeats that can trade characters with each
+    other, such as ``.*x.*`` or ``\\s*:?\\s*``, or a repeated alternation
+    whose branches start with different characters, such as
+    ``(?:yes|no)+``) are polynomial and only worth pointing out.
+    """
+    try:
+        re.compile(src)
+    except re.error as exc:
+        return [Finding("error", f"invalid regex: {exc}")]
+    findings = []
+    _audit(src, findings)
+    return findings
+
+
+def check_pattern(src):
+    """Return the warning messages for *src*, raising ``ValueError`` on errors."""
+    findings = audit(src)
+    errors = [f.message for f in findings if f.level == "error"]
+    if errors:
+        raise ValueError(f"unsafe pattern {src!r}: {'; '.join(errors)}")
+    return [f.message for f in findings if f.level == "warning"]
@@ -0,0 +1,234 @@
+"""Registry of running auto-yes sessions, for ``auto-yes status --all``.
+
+Every ``Runner`` session owns one small file in ``runtime_dir()`` holding a
+fixed-layout record.  The session maps it into memory and updates its
+counters in place, so the hot path costs a ``struct.pack_into`` and no
+system calls; readers simply read the files.
+"""
+
+import contextlib
+import mmap
+import os
+import stat
+import struct
+import sys
+import tempfile
+import time
+from collections import namedtuple
+
+_MAGIC = b"AYS1"
+
+# magic, pid, started, last activity, bytes proxied, responses, command,
+# profiles, last matched pattern; the numeric fields are 8-byte aligned so
+# each update is a single aligned store
+_LAYOUT = struct.Struct("<4sIddQQ256s128s256s")
+_ACTIVITY = struct.Struct("<dQ")
+_ACTIVITY_OFFSET = 16
+_RESPONSES = struct.Struct("<Q")
+_RESPONSES_OFFSET = 32
+_MATCH_OFFSET = 424
+_MATCH_SIZE = 256
+
+SessionInfo = namedtuple(
+    "SessionInfo",
+    [
+        "pid",
+        "command",
+        "profiles",
+        "bytes_proxied",
+        "responses",
+        "last_match",
+        "started",
+        "last_activity",
+    ],
+)
+
+
+def runtime_dir():
+    """Return the directory session records live in.
+
+    ``$XDG_RUNTIME_DIR/auto-yes`` when that is set, otherwise a per-user
+    directory under the system temporary directory.
+    """
+    base = os.environ.get("XDG_RUNTIME_DIR")
+    if base:
+        return os.path.join(base, "auto-yes")
+    name = "auto-yes"
+    if hasattr(os, "getuid"):
+        name = f"auto-yes-{os.getuid()}"
+    return os.path.join(tempfile.gettempdir(), name)
+
+
+def available():
+    """Return ``True`` if sessions can be registered and listed here.
+
+    Not on Windows: a record cannot be deleted while it is mapped, dead
+    sessions cannot be told apart, and the directory cannot be checked.
+    """
+    return sys.platform != "win32"
+
+
+def private_dir(directory):
+    """Create *directory* if needed and check that only this user can use it.
+
+    Outside ``$XDG_RUNTIME_DIR`` its name is predictable, so another local
+    user could create it first and plant a socket or read the records.
+    Raises ``OSError`` unless it is a real directory (not a symlink) owned
+    by this user with mode 0700.
+    """
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    _check_private(directory)
+
+
+def _check_private(directory):
+    if not hasattr(os, "getuid"):
+        return
+    st = os.lstat(directory)
+    if not stat.S_ISDIR(st.st_mode):
+        raise OSError(f"{directory} is not a directory")
+    if st.st_uid != os.getuid():
+        raise OSError(f"{directory} belongs to another user (uid {st.st_uid})")
+    if stat.S_IMODE(st.st_mode) != 0o700:
+        raise OSError(f"{directory} is accessible to other users (mode {st.st_mode & 0o777:o})")
+
+
+def _text(value, size):
+    """Encode *value* into a NUL-padded field of *size* bytes."""
+    return value.encode("utf-8", errors="replace")[: size - 1]
+
+
+def _decode(field):
+    return field.split(b"\0", 1)[0].decode("utf-8", errors="ignore")
+
+
+class SessionRecord:
+    """The shared-memory record of one running session.
+
+    Created by ``register``.  ``proxied`` and ``responded`` only write to
+    the mapping; ``close`` removes the record.
+    """
+
+    def __init__(self, path, mapping):
+        self.path = path
+        self._map = mapping
+        self._bytes = 0
+        self._responses = 0
+
+    def proxied(self, count):
+        """Add *count* bytes to the traffic counter and mark activity."""
+        self._bytes += count
+        _ACTIVITY.pack_into(self._map, _ACTIVITY_OFFSET, time.time(), self._bytes)
+
+    def responded(self, pattern):
+        """Count one response, triggered by *pattern*."""
+        self._responses += 1
+        self._map[_MATCH_OFFSET : _MATCH_OFFSET + _MATCH_SIZE] = _text(
+            pattern, _MATCH_SIZE
+        ).ljust(_MATCH_SIZE, b"\0")
+        _RESPONSES.pack_into(self._map, _RESPONSES_OFFSET, self._responses)
+
+    def close(self):
+        """Unmap and delete the record."""
+        with contextlib.suppress(OSError, ValueError):
+            self._map.close()
+        with contextlib.suppress(OSError):
+            os.unlink(self.path)
+
+
+def register(command, profiles):
+    """Create the record of a new session and return its ``SessionRecord``.
+
+    Returns ``None`` if the runtime directory is not writable or not
+    private (see ``private_dir``); a session must never fail because it
+    cannot be listed.
+    """
+    directory = runtime_dir()
+    try:
+        private_dir(directory)
+        fd, path = tempfile.mkstemp(dir=directory, prefix=f"{os.getpid()}-", suffix=".session")
+    except OSError:
+        return None
+
+    now = time.time()
+    record = _LAYOUT.pack(
+        _MAGIC,
+        os.getpid(),
+        now,
+        now,
+        0,
+        0,
+        _text(command, 256),
+        _text(", ".join(profiles), 128),
+        b"",
+    )
+    try:
+        os.write(fd, record)
+        mapping = mmap.mmap(fd, _LAYOUT.size)
+    except OSError:
+        os.close(fd)
+        with contextlib.suppress(OSError):
+            os.unlink(path)
+        return None
+    os.close(fd)
+    return SessionRecord(path, mapping)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def sessions():
+    """Return a ``SessionInfo`` for every live session, oldest first.
+
+    Records left behind by sessions that died without cleaning up are
+    removed on the way.  Nothing is listed where the registry is not
+    ``available`` or the runtime directory is not private.
+    """
+    if not available():
+        return []
+    directory = runtime_dir()
+    try:
+        _check_private(directory)
+        names = os.listdir(directory)
+    except OSError:
+        return []
+
+    found = []
+    for name in names:
+        if not name.endswith(".session"):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            with open(path, "rb") as fh:
+                data = fh.read(_LAYOUT.size)
+        except OSError:
+            continue
+        if len(data) < _LAYOUT.size:
+            continue
+        fields = _LAYOUT.unpack(data)
+        if fields[0] != _MAGIC:
+            continue
+        if not _alive(fields[1]):
+            with contextlib.suppress(OSError):
+                os.unlink(path)
+            continue
+        found.append(
+            SessionInfo(
+                pid=fields[1],
+                command=_decode(fields[6]),
+                profiles=_decode(fields[7]),
+                bytes_proxied=fields[4],
+                responses=fields[5],
+                last_match=_decode(fields[8]),
+                started=fields[2],
+                last_activity=fields[3],
+            )
+        )
+    found.sort(key=lambda info: info.started)
+    return found
@@ -0,0 +1,161 @@
+"""Where a session's time goes: per-phase timers and cProfile output.
+
+With ``AUTO_YES_TRACE=1`` (or ``Runner(trace=True)``) the Unix loop times
+its phases with ``time.perf_counter``:
+
+``wait``     blocked in ``select``
+``read``     reading the child's output from the PTY
+``forward``  staging it for stdout, writing it out and keeping the
+             rolling buffer
+``detect``   matching the buffer's tail against the patterns
+``respond``  writing an answer to the child
+
+Each phase keeps a call count, a total and a maximum, plus its most
+recent durations in a ring of preallocated ``array`` slots for the
+percentiles, so recording allocates nothing and a long session costs
+the same as a short one.  Whatever the loop does between phases
+(gates, breaker, watchdog, reaping) is reported as ``other``.
+
+``profiled`` runs a block under ``cProfile`` for ``--profile-out``.
+"""
+
+import contextlib
+import os
+import time
+from array import array
+
+ENV_VAR = "AUTO_YES_TRACE"
+
+PHASES = ("wait", "read", "forward", "detect", "respond")
+WAIT, READ, FORWARD, DETECT, RESPOND = range(len(PHASES))
+
+# recent durations kept per phase for p50 / p99
+SAMPLES = 4096
+
+
+def enabled():
+    """Return ``True`` if sessions should be traced (``AUTO_YES_TRACE=1``)."""
+    return os.environ.get(ENV_VAR) == "1"
+
+
+class PhaseTimer:
+    """Call counts, totals and recent durations of the loop's phases.
+
+    Parameters
+    ----------
+    samples : int
+        Durations kept per phase for the percentiles.
+    """
+
+    def __init__(self, samples=SAMPLES):
+        count = len(PHASES)
+        self.samples = samples
+        self.counts = array("q", [0]) * count
+        self.totals = array("d", [0.0]) * count
+        self.peaks = array("d", [0.0]) * count
+        self._recent = array("d", [0.0]) * (count * samples)
+        self._started = None
+        self._elapsed = 0.0
+
+    def start(self):
+        """Start the wall clock the phases are compared with."""
+        self._started = time.perf_counter()
+
+    def stop(self):
+        """Stop the wall clock; the next ``start`` adds to it."""
+        if self._started is not None:
+            self._elapsed += time.perf_counter() - self._started
+            self._started = None
+
+    def add(self, phase, since):
+        """Record the time from *since* (a ``time.perf_counter()`` value)
+        to now under *phase*.  Returns now, to chain the next phase from.
+        """
+        now = time.perf_counter()
+        elapsed = now - since
+        calls = self.counts[phase]
+        self._recent[phase * self.samples + calls % self.samples] = elapsed
+        self.counts[phase] = calls + 1
+        self.totals[phase] += elapsed
+        if elapsed > self.peaks[phase]:
+            self.peaks[phase] = elapsed
+        return now
+
+    def elapsed(self):
+        """Return the wall-clock seconds between ``start`` and ``stop``."""
+        elapsed = self._elapsed
+        if self._started is not None:
+            elapsed += time.perf_counter() - self._started
+        return elapsed
+
+    def breakdown(self):
+        """Return ``{"elapsed": seconds, "phases": [...]}``, one dict per
+        phase with ``phase``, ``calls``, ``total``, ``p50``, ``p99`` and
+        ``max`` (seconds).  Plain values, so it survives JSON.
+        """
+        phases = []
+        for index, name in enumerate(PHASES):
+            calls = self.counts[index]
+            kept = min(calls, self.samples)
+            offset = index * self.samples
+            recent = sorted(self._recent[offset : offset + kept])
+            p50 = p99 = 0.0
+            if recent:
+                p50 = recent[(kept - 1) // 2]
+                p99 = recent[(kept - 1) * 99 // 100]
+            phases.append(
+                {
+                    "phase": name,
+                    "calls": calls,
+                    "total": self.totals[index],
+                    "p50": p50,
+                    "p99": p99,
+                    "max": self.peaks[index],
+                }
+            )
+        return {"elapsed": self.elapsed(), "phases": phases}
+
+
+def _duration(seconds):
+    if seconds >= 1.0:
+        return f"{seconds:.2f} s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.1f} ms"
+    return f"{seconds * 1e6:.0f} us"
+
+
+def report(breakdown):
+    """Return *breakdown* (``PhaseTimer.breakdown()``) as lines of text."""
+    elapsed = breakdown["elapsed"]
+    lines = [
+        f"{'phase':<8} {'calls':>8} {'total':>10} {'share':>6} "
+        f"{'p50':>9} {'p99':>9} {'max':>9}"
+    ]
+    accounted = 0.0
+    for row in breakdown["phases"]:
+        accounted += row["total"]
+        share = row["total"] / elapsed if elapsed else 0.0
+        lines.append(
+            f"{row['phase']:<8} {row['calls']:>8} {_duration(row['total']):>10} "
+            f"{share:>6.1%} {_duration(row['p50']):>9} {_duration(row['p99']):>9} "
+            f"{_duration(row['max']):>9}"
+        )
+    other = max(elapsed - accounted, 0.0)
+    share = other / elapsed if elapsed else 0.0
+    lines.append(f"{'other':<8} {'':>8} {_duration(other):>10} {share:>6.1%}")
+    lines.append(f"{'loop':<8} {'':>8} {_duration(elapsed):>10}")
+    return lines
+
+
+@contextlib.contextmanager
+def profiled(path):
+    """Run the block under ``cProfile`` and dump its stats to *path*."""
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
@@ -0,0 +1,51 @@
+"""Resource usage of the wrapped command and of auto-yes itself.
+
+``Runner`` reaps its child with ``os.wait4`` and keeps the child's
+``struct rusage`` (which includes the descendants the child waited for);
+``proxy`` reads the proxy's own with ``getrusage``.
+Both are turned into plain dicts (``from_rusage``) so they can go into
+``Runner.stats()`` and through the daemon's JSON replies unchanged.
+"""
+
+import sys
+
+
+def from_rusage(ru):
+    """Return the fields auto-yes reports from a ``resource.struct_rusage``.
+
+    ``user`` / ``sys`` are CPU seconds, ``max_rss`` is in bytes (Linux
+    reports kilobytes, macOS bytes), ``nvcsw`` / ``nivcsw`` count voluntary
+    and involuntary context switches, ``inblock`` / ``oublock`` block
+    input and output operations.
+    """
+    max_rss = ru.ru_maxrss
+    if sys.platform != "darwin":
+        max_rss *= 1024
+    return {
+        "user": ru.ru_utime,
+        "sys": ru.ru_stime,
+        "max_rss": max_rss,
+        "nvcsw": ru.ru_nvcsw,
+        "nivcsw": ru.ru_nivcsw,
+        "inblock": ru.ru_inblock,
+        "oublock": ru.ru_oublock,
+    }
+
+
+def proxy():
+    """Return the usage of this process so far, or ``None`` on Windows."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    return from_rusage(resource.getrusage(resource.RUSAGE_SELF))
+
+
+def describe(usage):
+    """Return *usage* as one short line of text."""
+    return (
+        f"{usage['user']:.2f} s user, {usage['sys']:.2f} s sys, "
+        f"{usage['max_rss'] / 1e6:.1f} MB max RSS, "
+        f"{usage['nvcsw'] + usage['nivcsw']} context switches, "
+        f"{usage['inblock']}/{usage['oublock']} blocks in/out"
+    )
@@ -0,0 +1,86 @@
+"""Background prompt detection for the Unix loop (``Runner(detect_thread=True)``).
+
+The I/O loop keeps forwarding output and keystrokes while a worker thread
+matches the newest snapshot of the output buffer.  Snapshots are coalesced,
+not queued: one submitted while the worker is busy replaces any other that
+is still waiting, so the worker never falls behind the screen.
+"""
+
+import contextlib
+import os
+import threading
+from collections import deque
+
+
+class DetectWorker:
+    """Run *detect* on the newest submitted snapshot in a background thread.
+
+    Parameters
+    ----------
+    detect : callable
+        Called on the worker thread with the arguments of ``submit``; returns
+        an item to hand back to the I/O loop, or ``None``.
+
+    Items are queued and signalled through ``fileno()``, the read end of a
+    self-pipe, which the I/O loop adds to its ``select`` set before draining
+    them with ``results()``.
+    """
+
+    def __init__(self, detect):
+        self._detect = detect
+        self._cond = threading.Condition()
+        self._snapshot = None
+        self._stopped = False
+        self._results = deque()
+        self._read_fd, self._write_fd = os.pipe()
+        os.set_blocking(self._read_fd, False)
+        os.set_blocking(self._write_fd, False)
+        self.coalesced = 0
+        self._thread = threading.Thread(target=self._loop, name="auto-yes-detect", daemon=True)
+        self._thread.start()
+
+    def fileno(self):
+        return self._read_fd
+
+    def submit(self, *snapshot):
+        """Hand the worker a new snapshot, dropping one it has not started on."""
+        with self._cond:
+            if self._snapshot is not None:
+                self.coalesced += 1
+            self._snapshot = snapshot
+            self._cond.notify()
+
+    def results(self):
+        """Return the items produced since the last call, oldest first."""
+        with contextlib.suppress(OSError):
+            os.read(self._read_fd, 4096)
+        items = []
+        while self._results:
+            items.append(self._results.popleft())
+        return items
+
+    def close(self):
+        """Stop the worker thread and release the self-pipe."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._thread.join(timeout=1.0)
+        os.close(self._read_fd)
+        os.close(self._write_fd)
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while self._snapshot is None and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                snapshot = self._snapshot
+                self._snapshot = None
+
+            item = self._detect(*snapshot)
+            if item is not None:
+                self._results.append(item)
+                # a full pipe already has a wake-up pending
+                with contextlib.suppress(OSError):
+                    os.write(self._write_fd, b"\0")
@@ -18,9 +18,13 @@ Usage (advanced)::
 """
 
 import argparse
+import contextlib
 import sys
+import time
+import warnings
 
 from auto_yes import __version__
+from auto_yes import _daemon, _registry, _trace, _usage
 from auto_yes import config as _cfg
 from auto_yes.patterns import (
     AI_CLI_NAMES,
@@ -28,8 +32,11 @@ from auto_yes.patterns import (
     available_categories,
     get_command,
     resolve_profile,
+    unpack_entry,
 )
-from auto_yes.runner import Runner
+
+# Runner (and with it the detector) is imported where a session is built,
+# so a session handed to the daemon never loads it
 
 _PROG = "auto-yes"
 
@@ -65,10 +72,15 @@ def _resolve_categories(cli_flags):
     return categories
 
 
-def _build_runner(opts, cfg):
-    """Create a ``Runner`` from parsed CLI flags merged with persistent cfg."""
+def _runner_kwargs(opts, cfg):
+    """Return ``Runner`` arguments from parsed CLI flags merged with persistent cfg."""
     response = opts.response if opts.response is not None else cfg.get("response", "y")
-    cooldown = opts.cooldown if opts.cooldown is not None else cfg.get("cooldown", 0.5)
+    cooldown = opts.cooldown if opts.cooldown is not None else cfg.get("cooldown", 0.1)
+    on_storm = opts.on_storm if opts.on_storm is not None else cfg.get("on_storm", "pause")
+    watchdog = {}
+    for name in ("idle_timeout", "max_runtime", "kill_grace"):
+        if getattr(opts, name) is not None:
+            watchdog[name] = getattr(opts, name)
 
     extra = list(cfg.get("custom_patterns", []))
     if hasattr(opts, "pattern") and opts.pattern:
@@ -77,15 +89,108 @@ def _build_runner(opts, cfg):
     cli_flags = getattr(opts, "cli", None) or []
     categories = _resolve_categories(cli_flags)
 
-    return Runner(
+    return _session_kwargs(
+        cfg,
         response=response,
         cooldown=cooldown,
         verbose=opts.verbose,
         categories=categories,
         extra_patterns=extra or None,
+        proc_gate=opts.proc_gate,
+        detect_thread=opts.detect_thread,
+        metrics_socket=opts.metrics_socket,
+        metrics_textfile=opts.metrics_textfile,
+        on_storm=on_storm,
+        **watchdog,
     )
 
 
+def _session_kwargs(cfg, **kwargs):
+    """Return *kwargs* plus the ``Runner`` arguments taken from cfg."""
+    settings = {
+        "max_line_chars": cfg.get("max_line_chars", 1024),
+        "narrow_after": cfg.get("narrow_after", 3),
+        "max_responses": cfg.get("max_responses", 0),
+        "max_repeats": cfg.get("max_repeats", 0),
+        "storm_window": cfg.get("storm_window", 60),
+        "on_storm": cfg.get("on_storm", "pause"),
+        "idle_timeout": cfg.get("idle_timeout"),
+        "max_runtime": cfg.get("max_runtime"),
+        "kill_grace": cfg.get("kill_grace", 5),
+    }
+    settings.update(kwargs)
+    return settings
+
+
+def _new_runner(kwargs):
+    """Create a ``Runner``, reporting pattern audit findings on stderr.
+
+    Exits with status 1 if a custom pattern is rejected as unsafe.
+    """
+    from auto_yes.runner import Runner
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always", RuntimeWarning)
+        try:
+            runner = Runner(**kwargs)
+        except ValueError as exc:
+            print(f"error: {exc}", file=sys.stderr)
+            sys.exit(1)
+    for warning in caught:
+        print(f"warning: {warning.message}", file=sys.stderr)
+    return runner
+
+
+def _report_warning(text):
+    print(f"warning: {text}", file=sys.stderr)
+
+
+def _run_session(kwargs, command=None, profile_out=None):
+    """Run *command*, or an interactive shell if ``None``, with a ``Runner``
+    built from *kwargs*.  Returns ``(exit_code, stats)``.
+
+    With ``AUTO_YES_DAEMON=1`` the session runs in the daemon if one is
+    listening (see ``_daemon``), otherwise in this process.  A session
+    profiled to *profile_out* (cProfile) or traced (``AUTO_YES_TRACE=1``)
+    always runs in this process, and prints where it spent its time.
+    """
+    if _daemon.enabled() and not profile_out and not _trace.enabled():
+        try:
+            found = _daemon.spawn(
+                command, kwargs, shell=command is None, on_warning=_report_warning
+            )
+        except ValueError as exc:
+            print(f"error: {exc}", file=sys.stderr)
+            sys.exit(1)
+        if found is not None:
+            return found
+
+    runner = _new_runner(kwargs)
+    profiling = contextlib.nullcontext()
+    if profile_out:
+        profiling = _trace.profiled(profile_out)
+    with profiling:
+        if command is None:
+            code = runner.run_shell()
+        else:
+            code = runner.run_command(command)
+    stats = runner.stats()
+    if stats["trace"] is not None:
+        _print_trace(stats["trace"])
+    if profile_out:
+        print(
+            f"[auto-yes] profile written to {profile_out} (python -m pstats {profile_out})",
+            file=sys.stderr,
+        )
+    return code, stats
+
+
+def _print_trace(breakdown):
+    print("[auto-yes] trace: time per phase of the proxy loop", file=sys.stderr)
+    for line in _trace.report(breakdown):
+        print(f"[auto-yes]   {line}", file=sys.stderr)
+
+
 def _make_opts_parser(prog):
     """Shared option flags for ``--on`` and ``run``."""
     parser = argparse.ArgumentParser(prog=prog, add_help=False)
@@ -94,7 +199,7 @@ def _make_opts_parser(prog):
         "--cooldown",
         type=float,
         default=None,
-        help="seconds between auto-responses (default: 0.5)",
+        help="minimum seconds between auto-responses (default: 0.1)",
     )
     parser.add_argument(
         "--verbose",
@@ -102,6 +207,67 @@ def _make_opts_parser(prog):
         action="store_true",
         help="print a notice every time auto-yes responds",
     )
+    parser.add_argument(
+        "--proc-gate",
+        action="store_true",
+        help="Linux: only match prompts while the child waits for input",
+    )
+    parser.add_argument(
+        "--detect-thread",
+        action="store_true",
+        help="Unix: match prompts on a worker thread, off the I/O path",
+    )
+    parser.add_argument(
+        "--on-storm",
+        choices=["pause", "pause-all", "kill"],
+        default=None,
+        help="when the same prompt keeps coming back: pause answers to it (default), "
+        "pause all answers, or terminate the command",
+    )
+    parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        metavar="SECONDS",
+        default=None,
+        help="stop the command after this long without output or an answer",
+    )
+    parser.add_argument(
+        "--max-runtime",
+        type=float,
+        metavar="SECONDS",
+        default=None,
+        help="stop the command after this long in total",
+    )
+    parser.add_argument(
+        "--kill-grace",
+        type=float,
+        metavar="SECONDS",
+        default=None,
+        help="wait between SIGINT, SIGTERM and SIGKILL when stopping (default: 5)",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="print response and detection-cache counters on exit",
+    )
+    parser.add_argument(
+        "--profile-out",
+        metavar="FILE",
+        default=None,
+        help="run the session under cProfile and write its stats to FILE",
+    )
+    parser.add_argument(
+        "--metrics-socket",
+        metavar="PATH",
+        default=None,
+        help="serve Prometheus metrics on this Unix socket",
+    )
+    parser.add_argument(
+        "--metrics-textfile",
+        metavar="PATH",
+        default=None,
+        help="rewrite this file with Prometheus metrics every 5 s",
+    )
     parser.add_argument(
         "--pattern",
         action="append",
@@ -123,11 +289,13 @@ def _make_opts_parser(prog):
 # ------------------------------------------------------------------
 
 
-def _handle_on(argv):
+def _handle_on(argv, profile_out=None):
     parser = _make_opts_parser(f"{_PROG} --on")
     opts = parser.parse_args(argv)
     cfg = _cfg.load()
-    runner = _build_runner(opts, cfg)
+    kwargs = _runner_kwargs(opts, cfg)
+    if opts.profile_out:
+        profile_out = opts.profile_out
 
     response_display = opts.response or cfg.get("response", "y")
     loaded = _resolve_categories(opts.cli)
@@ -138,9 +306,11 @@ def _handle_on(argv):
     print(f"\x1b[32m[auto-yes]\x1b[0m loaded profiles: {', '.join(loaded)}")
     print("\x1b[32m[auto-yes]\x1b[0m type 'exit' to end the session.")
 
-    code = runner.run_shell()
+    code, stats = _run_session(kwargs, profile_out=profile_out)
 
     print("\n\x1b[32m[auto-yes]\x1b[0m session ended.")
+    if opts.stats:
+        _print_stats(stats)
     sys.exit(code)
 
 
@@ -153,14 +323,53 @@ def _handle_off():
         print("\x1b[32m[auto-yes]\x1b[0m auto-yes is not active.")
 
 
-def _handle_status():
+def _handle_status(argv):
+    if "--all" in argv:
+        if not _registry.available():
+            print("error: status --all needs Unix", file=sys.stderr)
+            sys.exit(1)
+        _print_sessions(_registry.sessions())
+        return
     if _is_active():
         print("auto-yes: \x1b[32mactive\x1b[0m")
     else:
         print("auto-yes: \x1b[90minactive\x1b[0m")
 
 
-def _handle_run(argv):
+def _duration(seconds):
+    seconds = max(int(seconds), 0)
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m"
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+
+
+def _clip(text, width):
+    if len(text) <= width:
+        return text
+    return text[: width - 1] + "…"
+
+
+def _print_sessions(sessions):
+    if not sessions:
+        print("\x1b[90mno running auto-yes sessions\x1b[0m")
+        return
+    now = time.time()
+    print(
+        f"{'PID':>7}  {'UP':>6}  {'IDLE':>6}  {'BYTES':>10}  {'ANSWERS':>7}  "
+        f"{'PROFILES':<20}  {'LAST MATCH':<24}  COMMAND"
+    )
+    for info in sessions:
+        print(
+            f"{info.pid:>7}  {_duration(now - info.started):>6}  "
+            f"{_duration(now - info.last_activity):>6}  {info.bytes_proxied:>10}  "
+            f"{info.responses:>7}  {_clip(info.profiles, 20):<20}  "
+            f"{_clip(info.last_match, 24):<24}  {info.command}"
+        )
+
+
+def _handle_run(argv, profile_out=None):
     if "--" in argv:
         idx = argv.index("--")
         our_argv = argv[:idx]
@@ -177,12 +386,45 @@ def _handle_run(argv):
     parser = _make_opts_parser(f"{_PROG} run")
     opts = parser.parse_args(our_argv)
     cfg = _cfg.load()
-    runner = _build_runner(opts, cfg)
+    kwargs = _runner_kwargs(opts, cfg)
+    if opts.profile_out:
+        profile_out = opts.profile_out
 
-    code = runner.run_command(cmd_argv)
+    code, stats = _run_session(kwargs, cmd_argv, profile_out)
+    if opts.stats:
+        _print_stats(stats)
     sys.exit(code)
 
 
+def _print_stats(stats):
+    print(
+        f"[auto-yes] {stats['responses']} responses; detection cache "
+        f"{stats['cache_hits']} hits / {stats['cache_misses']} misses "
+        f"({stats['cache_hit_rate']:.1%} hit rate)",
+        file=sys.stderr,
+    )
+    if stats["narrowed"] or stats["widened"]:
+        state = "not narrowed"
+        if stats["narrowed"]:
+            state = f"narrowed to {', '.join(stats['narrowed'])}"
+        print(
+            f"[auto-yes] detection {state}; {stats['full_checks']} full checks, "
+            f"widened {stats['widened']} times",
+            file=sys.stderr,
+        )
+    breaker = stats.get("breaker")
+    if breaker and breaker["trips"]:
+        print(
+            f"[auto-yes] answer storms: circuit breaker tripped {breaker['trips']} times",
+            file=sys.stderr,
+        )
+    # what the wrapped command cost, next to what auto-yes itself did
+    for label, key in (("child", "child_usage"), ("auto-yes", "proxy_usage")):
+        usage = stats.get(key)
+        if usage:
+            print(f"[auto-yes] {label}: {_usage.describe(usage)}", file=sys.stderr)
+
+
 def _handle_patterns(argv):
     """List patterns, optionally filtered to specific categories."""
     cfg = _cfg.load()
@@ -203,8 +445,11 @@ def _handle_patterns(argv):
         print(f"[{name}] {entry['description']} ({len(pats)})")
         if not pats:
             print("  (none)")
-        for src, resp in pats:
+        for item in pats:
+            src, resp, window = unpack_entry(item)
             tag = f" -> '{resp}'" if resp is not None else ""
+            if window > 1:
+                tag += f" [last {window} lines]"
             print(f"  {src}{tag}")
         print()
 
@@ -245,22 +490,25 @@ def _handle_list():
     print("     e.g. auto-yes cursor chat 'fix the bug'")
 
 
-def _handle_wrap(profile, argv):
+def _handle_wrap(profile, argv, profile_out=None):
     """Shorthand: ``auto-yes claude "fix tests"`` wraps the CLI tool directly.
 
     Equivalent to ``auto-yes run -v --cli <profile> -- <binary> <argv...>``.
     The real binary name is looked up from the REGISTRY ``command`` field.
-    Verbose is on by default so users can see auto-yes in action.
+    Verbose is on by default so users can see auto-yes in action.  All of
+    *argv* goes to the tool, so *profile_out* comes from a ``--profile-out``
+    given before the profile name.
     """
     cfg = _cfg.load()
     response = cfg.get("response", "y")
-    cooldown = cfg.get("cooldown", 0.5)
+    cooldown = cfg.get("cooldown", 0.1)
 
     extra = list(cfg.get("custom_patterns", []))
 
     categories = _resolve_categories([profile])
 
-    runner = Runner(
+    kwargs = _session_kwargs(
+        cfg,
         response=response,
         cooldown=cooldown,
         verbose=True,
@@ -286,16 +534,87 @@ def _handle_wrap(profile, argv):
         f"with profile: {loaded}"
     )
 
-    code = runner.run_command(cmd_argv)
+    code, _ = _run_session(kwargs, cmd_argv, profile_out)
     sys.exit(code)
 
 
+def _handle_daemon(argv):
+    """``daemon start [--foreground]``, ``daemon stop``, ``daemon status``."""
+    action = "status"
+    if argv:
+        action = argv[0]
+    if sys.platform == "win32":
+        print("error: the daemon needs Unix sockets", file=sys.stderr)
+        sys.exit(1)
+
+    if action == "status":
+        info = _daemon.ping()
+        if info is None:
+            print("auto-yes daemon: \x1b[90mnot running\x1b[0m")
+        else:
+            print(
+                f"auto-yes daemon: \x1b[32mrunning\x1b[0m (pid {info['pid']}, "
+                f"{info['sessions']} sessions, {info['detectors']} cached detectors)"
+            )
+    elif action == "stop":
+        if not _daemon.stop():
+            print("auto-yes daemon: \x1b[90mnot running\x1b[0m")
+    elif action == "start":
+        _start_daemon(foreground="--foreground" in argv[1:])
+    else:
+        print(f"usage: {_PROG} daemon [start [--foreground] | stop | status]", file=sys.stderr)
+        sys.exit(1)
+
+
+def _start_daemon(foreground):
+    if _daemon.ping() is not None:
+        print("auto-yes daemon: already running")
+        return
+
+    # compile every single-profile detector before taking requests
+    cfg = _cfg.load()
+    extra = list(cfg.get("custom_patterns", []))
+    warm = [
+        _session_kwargs(cfg, categories=[name], extra_patterns=extra or None)
+        for name in REGISTRY
+    ]
+    path = _daemon.socket_path()
+
+    if not foreground and not _daemon.daemonize():
+        deadline = time.time() + 5.0
+        while time.time() < deadline:
+            info = _daemon.ping()
+            if info is not None:
+                print(f"auto-yes daemon: started (pid {info['pid']}, socket {path})")
+                print(f"set {_daemon.ENV_VAR}=1 to run sessions through it")
+                return
+            time.sleep(0.05)
+        print("error: the daemon did not come up", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        server = _daemon.Daemon(path, warm=warm)
+    except OSError as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        sys.exit(1)
+    server.serve_forever()
+
+
 def _handle_add_pattern(argv):
     if not argv:
         print("error: provide a regex pattern string", file=sys.stderr)
         sys.exit(1)
     pattern = argv[0]
-    _cfg.add_pattern(pattern)
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always", RuntimeWarning)
+        try:
+            _cfg.add_pattern(pattern)
+        except ValueError as exc:
+            print(f"error: {exc}", file=sys.stderr)
+            sys.exit(1)
+    for warning in caught:
+        print(f"warning: {warning.message}", file=sys.stderr)
     print(f"added pattern: {pattern}")
 
 
@@ -334,6 +653,8 @@ _HELP = f"""\
 {_BANNER}
 \x1b[97musage (recommended):\x1b[0m
   {_PROG} <profile> [ARGS...]       wrap an AI CLI tool directly (single process)
+  {_PROG} --profile-out FILE <profile> [ARGS...]
+                                    the same, profiled with cProfile
 
 \x1b[97musage (advanced):\x1b[0m
   {_PROG} --on [OPTIONS]            start an auto-yes shell session (global)
@@ -342,19 +663,33 @@ _HELP = f"""\
   {_PROG} patterns [CATEGORY...]    list prompt patterns
   {_PROG} add-pattern PATTERN       add a custom prompt pattern
   {_PROG} del-pattern PATTERN       remove a custom prompt pattern
-  {_PROG} status                    check if auto-yes is active
+  {_PROG} status [--all]            check if auto-yes is active (--all: list sessions)
+  {_PROG} daemon start|stop|status  keep compiled patterns warm for new sessions
   {_PROG} --off                     exit info
 
 \x1b[97mavailable profiles:\x1b[0m {', '.join(AI_CLI_NAMES)}
 
 \x1b[97moptions (for --on / run):\x1b[0m
   --response TEXT     text to send (default: y)
-  --cooldown FLOAT    seconds between responses (default: 0.5)
+  --cooldown FLOAT    minimum seconds between responses (default: 0.1)
   --verbose, -v       show when auto-yes responds
+  --stats             print response / detection-cache counters on exit
+  --profile-out FILE  run the session under cProfile, write its stats to FILE
+  --proc-gate         Linux: only match prompts while the child waits for input
+  --detect-thread     Unix: match prompts on a worker thread, off the I/O path
+  --on-storm MODE     pause, pause-all or kill when a prompt keeps coming back
+  --idle-timeout SECONDS   stop the command after this long without output
+  --max-runtime SECONDS    stop the command after this long in total
+  --kill-grace SECONDS     wait between SIGINT, SIGTERM and SIGKILL (default: 5)
+  --metrics-socket PATH    serve Prometheus metrics on a Unix socket
+  --metrics-textfile PATH  rewrite PATH with Prometheus metrics every 5 s
   --pattern REGEX     extra pattern (repeatable)
   --cli NAME          AI CLI profile to load (repeatable, or 'all')
                       note: 'generic' is opt-in, not loaded by default
 
+  set AUTO_YES_TRACE=1 to print how long the proxy loop spent waiting,
+  reading, forwarding, detecting and responding
+
 \x1b[97mexamples:\x1b[0m
   \x1b[96m{_PROG} claude "fix the tests"\x1b[0m                 wrap claude (recommended)
   \x1b[96m{_PROG} cursor chat "fix the bug"\x1b[0m              wrap cursor agent CLI
@@ -384,16 +719,26 @@ def main(argv=None):
         print(f"{_PROG} {__version__}")
         return
 
+    # --profile-out FILE ahead of the command applies to every session mode
+    profile_out = None
+    if argv[0] == "--profile-out" and len(argv) > 2:
+        profile_out = argv[1]
+        argv = argv[2:]
+    elif argv[0].startswith("--profile-out=") and len(argv) > 1:
+        profile_out = argv[0].partition("=")[2]
+        argv = argv[1:]
+
     cmd = argv[0]
     rest = argv[1:]
 
     dispatch = {
-        "--on": lambda: _handle_on(rest),
-        "on": lambda: _handle_on(rest),
+        "--on": lambda: _handle_on(rest, profile_out),
+        "on": lambda: _handle_on(rest, profile_out),
         "--off": _handle_off,
         "off": _handle_off,
-        "status": _handle_status,
-        "run": lambda: _handle_run(rest),
+        "status": lambda: _handle_status(rest),
+        "run": lambda: _handle_run(rest, profile_out),
+        "daemon": lambda: _handle_daemon(rest),
         "list": _handle_list,
         "-l": _handle_list,
         "--list": _handle_list,
@@ -410,7 +755,7 @@ def main(argv=None):
     # if cmd matches a known AI CLI profile (by name or binary), use wrap mode
     profile = resolve_profile(cmd)
     if profile is not None:
-        _handle_wrap(profile, rest)
+        _handle_wrap(profile, rest, profile_out)
         return
 
     print(f"unknown command: {cmd}", file=sys.stderr)
@@ -6,6 +6,9 @@ Config lives at ``~/.config/auto-yes/config.json`` on Unix or
 
 import json
 import os
+import warnings
+
+from auto_yes._regex import check_pattern
 
 _DIR_NAME = "auto-yes"
 _FILE_NAME = "config.json"
@@ -13,8 +16,17 @@ _FILE_NAME = "config.json"
 _DEFAULTS = {
     "custom_patterns": [],
     "response": "y",
-    "cooldown": 0.5,
+    "cooldown": 0.1,
     "verbose": False,
+    "max_line_chars": 1024,
+    "narrow_after": 3,
+    "max_responses": 0,
+    "max_repeats": 0,
+    "storm_window": 60,
+    "on_storm": "pause",
+    "idle_timeout": None,
+    "max_runtime": None,
+    "kill_grace": 5,
 }
 
 
@@ -63,7 +75,14 @@ def save(cfg):
 
 
 def add_pattern(pattern):
-    """Append *pattern* to the custom-patterns list (deduplicated)."""
+    """Append *pattern* to the custom-patterns list (deduplicated).
+
+    Raises ``ValueError`` if *pattern* is invalid or prone to catastrophic
+    backtracking (see ``_regex.audit``); nothing is saved in that case.
+    Lesser findings are reported as ``RuntimeWarning`` warnings.
+    """
+    for message in check_pattern(pattern):
+        warnings.warn(f"pattern {pattern!r}: {message}", RuntimeWarning, stacklevel=2)
     cfg = load()
     if pattern not in cfg["custom_patterns"]:
         cfg["custom_patterns"].append(pattern)
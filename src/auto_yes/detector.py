@@ -5,14 +5,82 @@ appropriate auto-response.  Patterns are loaded from ``patterns.py`` by
 category (e.g. ``"generic"``, ``"claude"``, ``"codex"``).
 """
 
+import logging
 import re
-from collections import namedtuple
+import time
+import warnings
+from collections import OrderedDict, namedtuple
 
 from auto_yes._ansi import clean_text
-from auto_yes.patterns import REGISTRY, get_patterns
+from auto_yes._regex import ascii_twin, canonicalize, check_pattern, covers
+from auto_yes.patterns import REGISTRY, unpack_entry
 
 DetectionResult = namedtuple("DetectionResult", ["pattern", "suggested_response"])
 
+# one compiled pattern; *bregex* is its bytes twin for ASCII input or ``None``,
+# *categories* the set of categories it serves (``None`` for user patterns)
+_Entry = namedtuple(
+    "_Entry", ["regex", "source", "response", "window", "bregex", "categories"]
+)
+
+logger = logging.getLogger(__name__)
+
+# longest stretch of a line a pattern is ever run against
+MAX_LINE_CHARS = 1024
+
+# number of recent tails whose results are memoised
+CACHE_SIZE = 64
+
+# consecutive confirmed matches from one category before the detector
+# narrows to it
+NARROW_AFTER = 3
+
+# seconds between checks against every pattern while narrowed
+FULL_CHECK_INTERVAL = 1.0
+
+# marks a tail that is not in the memo (``None`` is a cached negative)
+_MISSING = object()
+
+
+def _flags(window):
+    flags = re.IGNORECASE
+    if window > 1:
+        # let ``^`` / ``$`` anchor on every line of a multi-line window
+        flags |= re.MULTILINE
+    return flags
+
+
+def _serving(entries, categories):
+    """Return the *entries* that serve one of *categories* (``None``: all).
+
+    User patterns serve every category.
+    """
+    if categories is None:
+        return entries
+    return [
+        entry
+        for entry in entries
+        if entry.categories is None or entry.categories & categories
+    ]
+
+
+def _tail_lines(text, count):
+    """Return the last *count* lines of *text*, oldest first.
+
+    Walks backwards from the end so the cost depends on the size of the
+    window, not on the size of *text*.
+    """
+    lines = []
+    end = len(text)
+    while len(lines) < count:
+        start = text.rfind("\n", 0, end) + 1
+        lines.append(text[start:end])
+        if start == 0:
+            break
+        end = start - 1
+    lines.reverse()
+    return lines
+
 
 class PromptDetector:
     """Detect interactive prompts in terminal output.
@@ -23,41 +91,156 @@ class PromptDetector:
         Pattern categories to load (default ``["generic"]``).
         Pass ``["generic", "claude"]`` to also match Claude-specific prompts.
     extra_patterns : list[str] or None
-        Additional raw regex strings supplied by the user at runtime.
+        Additional raw regex strings supplied by the user at runtime.  They
+        are audited with ``_regex.audit``: ``ValueError`` is raised for a
+        pattern prone to catastrophic backtracking, a ``RuntimeWarning`` is
+        issued for one that is merely slow on long lines.
+    byte_patterns : bool
+        Also compile every pattern as a ``bytes`` regex so that
+        ``detect_tail`` can match ASCII output without decoding it
+        (default ``True``).
+    optimize : bool
+        Drop category patterns that are equivalent to, or provably subsumed
+        by, an earlier pattern with the same response and window (default
+        ``True``).  See ``redundant`` for what was removed.
+    max_line_chars : int
+        Only the last *max_line_chars* characters of each inspected line are
+        matched, which bounds the time any pattern can take on a long
+        unbroken line such as a progress bar (default 1024).
+    cache_size : int
+        Number of recent tails whose result (including "no prompt") is
+        memoised, so re-checking an unchanged screen is a dict lookup
+        (default 64, ``0`` disables the memo).  See ``stats``.
+    narrow_after : int
+        After this many consecutive ``confirm``-ed matches from the same
+        category, only that category and ``generic`` are matched (default 3,
+        ``0`` never narrows).  See ``narrowed``.
+    full_check_interval : float
+        While narrowed, a check against every pattern still runs at most
+        this many seconds apart (default 1.0).  A prompt that only an
+        outside pattern matches widens the detector back to all of them.
+
+    ``focus`` narrows matching to the patterns of some categories (plus the
+    user's own) without reloading anything.
 
     Only the *last* non-empty line of the text is inspected so that prompts
-    embedded in normal program output do not cause false positives.
+    embedded in normal program output do not cause false positives.  Patterns
+    that declare a window (see ``patterns.py``) see that many trailing lines
+    instead; the detector keeps at most ``window`` lines around for matching.
     """
 
-    def __init__(self, categories=None, extra_patterns=None):
+    def __init__(
+        self,
+        categories=None,
+        extra_patterns=None,
+        byte_patterns=True,
+        optimize=True,
+        max_line_chars=MAX_LINE_CHARS,
+        cache_size=CACHE_SIZE,
+        narrow_after=NARROW_AFTER,
+        full_check_interval=FULL_CHECK_INTERVAL,
+    ):
         if categories is None:
             categories = ["generic"]
 
+        self._byte_patterns = byte_patterns
+        self._optimize = optimize
+        self._max_line_chars = max_line_chars
+        self._cache_size = cache_size
+        self._memo = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._narrow_after = narrow_after
+        self._full_check_interval = full_check_interval
         self._entries = []
+        self._wide = self._entries
+        self._active = self._entries
+        self._focus = None
+        self._narrowed = None
+        self._streak = frozenset()
+        self._streak_hits = 0
+        self._full_due = 0.0
+        self._full_checks = 0
+        self._widened = 0
+        self._canonical = []
+        self._redundant = []
+        self._window = 1
         self._load_categories(categories)
 
         for pat in extra_patterns or []:
-            self._entries.append((re.compile(pat, re.IGNORECASE), pat, None))
+            self._append_checked(pat, None, 1)
 
     # ------------------------------------------------------------------
     # loading
     # ------------------------------------------------------------------
 
-    def _load_categories(self, categories):
-        seen = set()
-        for src, response in get_patterns(categories):
-            if src in seen:
+    def _append(self, src, response, window, category=None):
+        flags = _flags(window)
+        bregex = None
+        if self._byte_patterns:
+            bsrc = ascii_twin(src)
+            if bsrc is not None:
+                bregex = re.compile(bsrc, flags)
+        categories = None
+        if category is not None:
+            categories = {category}
+        self._entries.append(
+            _Entry(re.compile(src, flags), src, response, window, bregex, categories)
+        )
+        canonical = None
+        if self._optimize:
+            canonical = canonicalize(src)
+        self._canonical.append(canonical)
+        self._window = max(self._window, window)
+        self._refocus()
+
+    def _append_checked(self, src, response, window):
+        for message in check_pattern(src):
+            warnings.warn(f"pattern {src!r}: {message}", RuntimeWarning, stacklevel=3)
+        self._append(src, response, window)
+
+    def _covered_by(self, src, response, window):
+        """Return an earlier entry that makes *src* redundant, or ``None``."""
+        for entry in self._entries:
+            if entry.source == src:
+                return entry
+        if not self._optimize:
+            return None
+        canonical = canonicalize(src)
+        if canonical is None:
+            return None
+        for entry, earlier in zip(self._entries, self._canonical):
+            if earlier is None or entry.response != response or entry.window != window:
                 continue
-            seen.add(src)
-            self._entries.append((re.compile(src, re.IGNORECASE), src, response))
+            if covers(earlier, canonical):
+                return entry
+        return None
+
+    def _load(self, entries, category):
+        removed = 0
+        for entry in entries:
+            src, response, window = unpack_entry(entry)
+            kept = self._covered_by(src, response, window)
+            if kept is None:
+                self._append(src, response, window, category)
+                continue
+            # the kept pattern now stands in for *src* in its category too
+            if kept.categories is not None:
+                kept.categories.add(category)
+                self._refocus()
+            if kept.source != src:
+                self._redundant.append((src, kept.source))
+                removed += 1
+        if removed:
+            logger.debug("pattern set: removed %d redundant entries", removed)
+
+    def _load_categories(self, categories):
+        for name in categories:
+            self._load(REGISTRY[name]["patterns"], name)
 
     def load_category(self, name):
         """Add all patterns from *name* that are not already registered."""
-        existing = {src for _, src, _ in self._entries}
-        for src, response in REGISTRY[name]["patterns"]:
-            if src not in existing:
-                self._entries.append((re.compile(src, re.IGNORECASE), src, response))
-                existing.add(src)
+        self._load(REGISTRY[name]["patterns"], name)
 
     # ------------------------------------------------------------------
     # detection
@@ -67,22 +250,100 @@ class PromptDetector:
         """Return a ``DetectionResult`` if the tail of *raw_text* looks like
         a prompt waiting for user input, otherwise ``None``.
         """
-        text = clean_text(raw_text)
+        text = clean_text(raw_text).rstrip()
+        if not text:
+            return None
+        return self._cached("\n".join(_tail_lines(text, self._window)))
+
+    def detect_tail(self, tail):
+        """Like ``detect`` for an already cleaned tail of at most ``window``
+        lines, as produced by ``_ansi.tail_bytes`` or ``_ansi.tail_text``.
 
-        lines = text.rstrip().split("\n")
-        if not lines:
+        A pure-ASCII ``bytes`` tail is matched with the bytes twins directly
+        and never decoded; anything else is decoded once and matched as text,
+        so both paths give exactly the same results.
+        """
+        if not tail:
             return None
+        if isinstance(tail, bytearray):
+            # memo keys must be hashable
+            tail = bytes(tail)
+        return self._cached(tail)
 
-        last_line = lines[-1]
-        if not last_line.strip():
+    def _cached(self, tail):
+        """Return the memoised result for *tail*, matching it on a miss."""
+        if self._narrowed is not None and time.time() >= self._full_due:
+            return self._full_check(tail)
+
+        result = self._memo.get(tail, _MISSING)
+        if result is not _MISSING:
+            self._hits += 1
+            self._memo.move_to_end(tail)
+            return result
+
+        self._misses += 1
+        result = self._match_tail(tail, self._active)
+        if self._cache_size > 0:
+            self._memo[tail] = result
+            if len(self._memo) > self._cache_size:
+                self._memo.popitem(last=False)
+        return result
+
+    def _full_check(self, tail):
+        """Match *tail* against every focused pattern, not just the narrowed
+        set, and widen again if only an outside pattern matches.
+        """
+        self._full_due = time.time() + self._full_check_interval
+        self._full_checks += 1
+        result = self._match_tail(tail, self._wide)
+        if result is not None and self._match_tail(tail, self._active) is None:
+            logger.info("prompt outside %s: matching every pattern again", sorted(self._narrowed))
+            self._widened += 1
+            self._narrowed = None
+            self._streak_hits = 0
+            self._refocus()
+        return result
+
+    def _match_tail(self, tail, entries):
+        if isinstance(tail, str):
+            return self._match(tail.split("\n"), False, entries)
+        if self._byte_patterns and tail.isascii():
+            return self._match(tail.split(b"\n"), True, entries)
+        text = tail.decode("utf-8", errors="replace")
+        return self._match(text.split("\n"), False, entries)
+
+    def _match(self, lines, ascii_bytes, entries):
+        if not lines[-1].strip():
             return None
 
+        limit = self._max_line_chars
+        if any(len(line) > limit for line in lines):
+            lines = [line[-limit:] for line in lines]
+
         # only inspect the last visible line (the one the cursor is on)
         # if a prompt appeared on an earlier line and further output followed,
-        # the process already moved past that prompt
-        for compiled, source, response in self._entries:
-            if compiled.search(last_line):
-                return DetectionResult(pattern=source, suggested_response=response)
+        # the process already moved past that prompt; windowed patterns
+        # extend this to a fixed number of trailing lines
+        views = {}
+        text_views = {}
+        for entry in entries:
+            window = entry.window
+            if ascii_bytes and entry.bregex is not None:
+                view = views.get(window)
+                if view is None:
+                    view = b"\n".join(lines[-window:])
+                    views[window] = view
+                found = entry.bregex.search(view)
+            else:
+                view = text_views.get(window)
+                if view is None:
+                    view = "\n".join(lines[-window:])
+                    if ascii_bytes:
+                        view = view.decode("ascii")
+                    text_views[window] = view
+                found = entry.regex.search(view)
+            if found:
+                return DetectionResult(pattern=entry.source, suggested_response=entry.response)
 
         return None
 
@@ -90,11 +351,120 @@ class PromptDetector:
     # runtime mutation
     # ------------------------------------------------------------------
 
-    def add_pattern(self, pattern_str, response=None):
-        """Register an additional pattern at runtime."""
-        self._entries.append((re.compile(pattern_str, re.IGNORECASE), pattern_str, response))
+    def add_pattern(self, pattern_str, response=None, window=1):
+        """Register an additional pattern at runtime.
+
+        The pattern is audited like ``extra_patterns``.
+        """
+        self._append_checked(pattern_str, response, window)
+
+    def focus(self, categories=None):
+        """Only match the patterns of *categories* from now on.
+
+        User patterns (``extra_patterns`` and ``add_pattern``) always stay
+        active.  ``None`` makes every loaded pattern active again.  Category
+        names that were never loaded simply contribute no patterns.
+        """
+        if categories is not None:
+            categories = frozenset(categories)
+        if categories != self._focus:
+            self._focus = categories
+            # what was learnt about the previous program does not carry over
+            self._narrowed = None
+            self._streak_hits = 0
+            self._refocus()
+
+    def confirm(self, result):
+        """Record that the child accepted the answer to *result*.
+
+        Consecutive confirmed matches whose patterns share a category (other
+        than ``generic``) count towards ``narrow_after``; a match from an
+        unrelated category starts the count again.
+        """
+        if not self._narrow_after or self._narrowed is not None:
+            return
+        categories = None
+        for entry in self._entries:
+            if entry.source == result.pattern:
+                categories = entry.categories
+                break
+        if not categories:
+            # a user pattern says nothing about the profile
+            return
+        categories = frozenset(categories) - {"generic"}
+        if not categories:
+            return
+
+        common = self._streak & categories
+        if common and self._streak_hits:
+            self._streak = common
+            self._streak_hits += 1
+        else:
+            self._streak = categories
+            self._streak_hits = 1
+        if self._streak_hits < self._narrow_after:
+            return
+
+        narrowed = self._streak | {"generic"}
+        if len(_serving(self._wide, narrowed)) == len(self._wide):
+            # a single profile: nothing to set aside
+            return
+        logger.info("narrowing detection to %s", sorted(narrowed))
+        self._narrowed = narrowed
+        self._full_due = time.time() + self._full_check_interval
+        self._refocus()
+
+    def _refocus(self):
+        self._wide = _serving(self._entries, self._focus)
+        self._active = _serving(self._wide, self._narrowed)
+        # cached results may be stale for the new pattern set
+        self._memo.clear()
+
+    def stats(self):
+        """Return a dict with memo ``cache_hits``, ``cache_misses``,
+        ``cache_hit_rate`` (0.0 - 1.0) and current ``cache_entries``, plus
+        the ``narrowed`` categories (see ``narrowed``), the ``full_checks``
+        made while narrowed and how often the detector ``widened`` again.
+        """
+        lookups = self._hits + self._misses
+        rate = 0.0
+        if lookups:
+            rate = self._hits / lookups
+        return {
+            "cache_hits": self._hits,
+            "cache_misses": self._misses,
+            "cache_hit_rate": rate,
+            "cache_entries": len(self._memo),
+            "narrowed": self.narrowed,
+            "full_checks": self._full_checks,
+            "widened": self._widened,
+        }
+
+    @property
+    def narrowed(self):
+        """Sorted categories the detector narrowed to, or ``None``."""
+        if self._narrowed is None:
+            return None
+        return sorted(self._narrowed)
+
+    @property
+    def window(self):
+        """Number of trailing lines the widest registered pattern looks at."""
+        return self._window
+
+    @property
+    def redundant(self):
+        """``(source, kept_source)`` pairs for every category pattern dropped
+        at load time because *kept_source* already matches wherever it does.
+        """
+        return list(self._redundant)
 
     @property
     def pattern_strings(self):
         """Return a list of all registered pattern source strings."""
-        return [source for _, source, _ in self._entries]
+        return [entry.source for entry in self._entries]
+
+    @property
+    def active_pattern_strings(self):
+        """Source strings of the patterns currently matched (see ``focus``)."""
+        return [entry.source for entry in self._active]
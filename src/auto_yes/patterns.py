@@ -11,6 +11,12 @@ Each pattern entry is a ``(regex_source, suggested_response)`` tuple.
 * ``"yes"`` - the prompt requires the full word
 * ``""``    - just press Enter (empty response)
 
+An optional third element declares a *window*: the number of trailing visible
+lines the pattern is matched against (default ``1``, the cursor line only).
+Box-drawn menus whose selected option sits a few lines above the bottom border
+use this.  Inside a window the lines are joined with ``\n`` and ``^`` / ``$``
+match at line boundaries, so multi-line regexes work as expected.
+
 To add a new tool, append a new key to ``REGISTRY`` following the same
 structure.  No other file needs to change.
 """
@@ -40,7 +46,7 @@ _GENERIC = {
         # --- standalone (y) suffix (npm "Ok to proceed? (y)") ---
         (r"\?\s*\(y\)\s*$", None),
         # --- bare y/n without brackets ---
-        (r"\?\s*y/n\s*:?\s*$", None),
+        (r"\?\s*y/n\s*(?::\s*)?$", None),
         # --- [Y]es / [N]o style ---
         (r"\[Y\]es\s*/\s*\[N\]o", None),
         (r"\[Y\]es\s*/\s*\[n\]o", None),
@@ -113,10 +119,12 @@ _GEMINI = {
     "description": "Google Gemini CLI",
     "command": ["gemini"],
     "patterns": [
-        (r"│\s*●?\s*1\.\s*(?:Yes,?\s+)?[Aa]llow once", None),
-        (r"│\s*●?\s*1\.\s*Yes", None),
-        (r"│\s*●?\s*2\.\s*[Aa]llow for this session", None),
-        (r"│\s*●?\s*3\.\s*[Aa]lways allow", None),
+        # the menu is followed by more options and the box border, so look
+        # at the trailing window instead of the cursor line only
+        (r"│\s*(?:●\s*)?1\.\s*(?:Yes,?\s+)?[Aa]llow once", None, 6),
+        (r"│\s*(?:●\s*)?1\.\s*Yes", None, 6),
+        (r"│\s*(?:●\s*)?2\.\s*[Aa]llow for this session", None, 6),
+        (r"│\s*(?:●\s*)?3\.\s*[Aa]lways allow", None, 6),
     ],
 }
 
@@ -140,8 +148,8 @@ _COPILOT = {
     "description": "GitHub Copilot CLI",
     "command": ["gh", "copilot"],
     "patterns": [
-        (r"│?\s*❯?\s*1\.\s*Yes,?\s+proceed", None),  # noqa: RUF001
-        (r"❯\s*1\.\s*Yes", None),  # noqa: RUF001
+        (r"│?\s*(?:❯\s*)?1\.\s*Yes,?\s+proceed", None, 6),  # noqa: RUF001
+        (r"❯\s*1\.\s*Yes", None, 6),  # noqa: RUF001
         (r"Allow Copilot to run\b.*\?", None),
     ],
 }
@@ -283,8 +291,21 @@ REGISTRY = {
 AI_CLI_NAMES = sorted(k for k in REGISTRY if k != "generic")
 
 
+def unpack_entry(entry):
+    """Return ``(regex_source, response, window)`` for a registry *entry*.
+
+    Two-element entries only look at the last visible line (``window == 1``).
+    """
+    if len(entry) == 3:
+        return entry
+    src, response = entry
+    return src, response, 1
+
+
 def get_patterns(categories):
-    """Collect ``(regex_source, response)`` tuples for the given *categories*.
+    """Collect pattern entries for the given *categories*.
+
+    Entries are returned as stored in ``REGISTRY`` (see ``unpack_entry``).
 
     Raises ``KeyError`` for unknown category names.
     """
@@ -12,34 +12,387 @@ import contextlib
 import errno
 import os
 import signal
+import struct
 import sys
+import threading
 import time
+from collections import deque, namedtuple
 
-from auto_yes.detector import PromptDetector
+from auto_yes import _breaker, _metrics, _proc, _registry, _trace, _usage
+from auto_yes._ansi import CursorTracker, compact_cr, tail_bytes, tail_text
+from auto_yes.detector import MAX_LINE_CHARS, NARROW_AFTER, PromptDetector
+from auto_yes.patterns import resolve_profile
 
 _BUFFER_LIMIT = 8192
 _BUFFER_TRIM = 4096
 
+# two redraws of the current line within this many seconds mean it is
+# still animating (progress bar, spinner) and not waiting for input
+_ANIMATION_WINDOW = 0.25
+
+# how many answered prompt fingerprints are remembered; a fingerprint is
+# dropped early once its answer is confirmed (see Runner._release)
+_ANSWERED_LIMIT = 8
+
+# an answer is confirmed when the prompt is gone this long after sending;
+# otherwise it is re-sent, doubling the wait each time
+_CONFIRM_DELAY = 0.2
+_RETRY_LIMIT = 3
+
+# an answer reaches the child's input queue asynchronously; FIONREAD is only
+# trusted this many seconds after writing it, and no longer polled once the
+# answer has sat unread for as long as all confirm retries take
+_QUEUE_SETTLE = 0.005
+_QUEUE_WATCH = _CONFIRM_DELAY * 2 ** (_RETRY_LIMIT + 1)
+
+# an answer waiting for confirmation: *tail* is the prompt it answered,
+# *result* the detection that produced it
+_Pending = namedtuple(
+    "_Pending", ["tail", "data", "deadline", "retries", "result"], defaults=(None,)
+)
+
+# headless mode (stdout is not a terminal): child output is written in
+# batches of up to _FLUSH_SIZE bytes, none held back longer than
+# _FLUSH_INTERVAL seconds, and up to _HEADLESS_READ bytes that are ready
+# are read before they are ingested and checked
+_FLUSH_SIZE = 64 * 1024
+_FLUSH_INTERVAL = 0.05
+_HEADLESS_READ = 64 * 1024
+
+# on a terminal, output already waiting is read (up to _STAGE_READ bytes),
+# staged with any notices and written with one writev() per wakeup
+_STAGE_READ = 16 * 1024
+
+# iovec entries per writev() call (IOV_MAX on Linux and macOS)
+_IOV_MAX = 1024
+
+# what the watchdog sends, kill_grace seconds apart, and the exit status
+# of a session it stopped (as timeout(1))
+_WATCHDOG_SIGNALS = ("SIGINT", "SIGTERM", "SIGKILL")
+TIMEOUT_EXIT = 124
+
+# TIOCPKT status bits (<sys/ioctl.h>, same on Linux and the BSDs); the
+# termios module does not export TIOCPKT_IOCTL.  Linux only reports IOCTL
+# with EXTPROC set, but a switch to raw mode clears IXON, which it reports
+# as NOSTOP (and the switch back as DOSTOP)
+_PKT_FLUSHREAD = 0x01
+_PKT_NOSTOP = 0x10
+_PKT_DOSTOP = 0x20
+_PKT_IOCTL = 0x40
+_PKT_TERMIOS = _PKT_NOSTOP | _PKT_DOSTOP | _PKT_IOCTL
+
+
+def _unread_input(slave_name):
+    """Return how many bytes sit unread in the child's terminal input queue."""
+    if slave_name is None:
+        return 0
+    import fcntl
+    import termios
+
+    try:
+        fd = os.open(slave_name, os.O_RDWR | os.O_NOCTTY)
+    except OSError:
+        return 0
+    try:
+        count = fcntl.ioctl(fd, termios.FIONREAD, b"\x00" * 4)
+        return struct.unpack("i", count)[0]
+    except OSError:
+        return 0
+    finally:
+        os.close(fd)
+
+
+def _packet_mode(master_fd):
+    """Switch *master_fd* to ``TIOCPKT`` packet mode; ``True`` on success."""
+    import fcntl
+    import termios
+
+    request = getattr(termios, "TIOCPKT", None)
+    if request is None:
+        return False
+    try:
+        fcntl.ioctl(master_fd, request, struct.pack("i", 1))
+    except OSError:
+        return False
+    return True
+
+
+def _split_packet(data):
+    """Split a packet-mode read into ``(status, payload)``.
+
+    A data packet starts with ``TIOCPKT_DATA`` (0); any other leading byte
+    is a status packet, which carries no output.
+    """
+    status = data[0]
+    if status:
+        return status, b""
+    return 0, data[1:]
+
+
+def _exit_code(wstatus):
+    """Exit code of a wait status; ``128 + N`` for a child killed by signal N."""
+    if os.WIFEXITED(wstatus):
+        return os.WEXITSTATUS(wstatus)
+    if os.WIFSIGNALED(wstatus):
+        return 128 + os.WTERMSIG(wstatus)
+    return 1
+
+
+def _headless_winsize():
+    """Return the packed window size for a child with no terminal to copy
+    it from: ``$LINES`` x ``$COLUMNS`` if set, otherwise 24 x 80.
+    """
+    rows, cols = 24, 80
+    with contextlib.suppress(ValueError):
+        rows = int(os.environ.get("LINES", rows))
+    with contextlib.suppress(ValueError):
+        cols = int(os.environ.get("COLUMNS", cols))
+    return struct.pack("HHHH", rows, cols, 0, 0)
+
+
+class _OutputBuffer:
+    """Staged writes to *fd*: chunks are collected in order and written
+    with a single ``os.writev``.
+
+    Data is written once *size* bytes are buffered, or when ``flush_due``
+    finds the oldest byte has waited *interval* seconds (``0``: at every
+    call, i.e. once per loop wakeup); ``timeout`` tells the loop how long
+    it may sleep before that.  Write calls are counted in ``writes`` and,
+    if given, in *metrics*.
+    """
+
+    def __init__(self, fd, size=_FLUSH_SIZE, interval=_FLUSH_INTERVAL, metrics=None):
+        self.fd = fd
+        self.size = size
+        self.interval = interval
+        self.metrics = metrics
+        self.writes = 0
+        self._chunks = []
+        self._buffered = 0
+        self._since = 0.0
+        self._last = b"\n"
+
+    def write(self, data):
+        if not data:
+            return
+        if not self._chunks:
+            self._since = time.time()
+        self._last = data[-1:]
+        self._chunks.append(data)
+        self._buffered += len(data)
+        if self._buffered >= self.size:
+            self.flush()
+
+    def line(self, text):
+        """Write *text* as a line of its own."""
+        prefix = ""
+        if self._last not in (b"\n", b"\r"):
+            prefix = "\n"
+        self.write(f"{prefix}{text}\n".encode())
+
+    def timeout(self, default):
+        """Return *default*, shortened to when the next flush is due."""
+        if not self._chunks:
+            return default
+        return max(0.0, min(default, self._since + self.interval - time.time()))
+
+    def flush_due(self):
+        if self._chunks and time.time() - self._since >= self.interval:
+            self.flush()
+
+    def flush(self):
+        chunks = self._chunks
+        if not chunks:
+            return
+        self._chunks = []
+        self._buffered = 0
+        while chunks:
+            written = os.writev(self.fd, chunks[:_IOV_MAX])
+            self.writes += 1
+            if self.metrics is not None:
+                self.metrics.writes += 1
+            # drop what went out; a short write leaves the rest of a chunk
+            done = 0
+            while done < len(chunks) and written >= len(chunks[done]):
+                written -= len(chunks[done])
+                done += 1
+            chunks = chunks[done:]
+            if written:
+                chunks[0] = memoryview(chunks[0])[written:]
+
+
+def _fork_pty(command, env, winsz=None, cwd=None):
+    """Start *command* (list or str) on a new PTY with environment *env*,
+    in directory *cwd* (default: the current one).
+
+    *winsz* (a packed ``winsize``) is applied to the terminal first.  The
+    master is put in packet mode before the fork, so no early termios
+    change is missed.  Returns ``(pid, master_fd, slave_name, packet)``.
+    """
+    import fcntl
+    import pty
+    import termios
+
+    master_fd, slave_fd = pty.openpty()
+    packet = _packet_mode(master_fd)
+    if winsz is not None:
+        with contextlib.suppress(OSError):
+            fcntl.ioctl(slave_fd, termios.TIOCSWINSZ, winsz)
+
+    pid = os.fork()
+
+    if pid == 0:
+        # ---- child process ----
+        os.close(master_fd)
+        os.setsid()
+        fcntl.ioctl(slave_fd, termios.TIOCSCTTY, 0)
+
+        os.dup2(slave_fd, 0)
+        os.dup2(slave_fd, 1)
+        os.dup2(slave_fd, 2)
+        if slave_fd > 2:
+            os.close(slave_fd)
+        if cwd is not None:
+            os.chdir(cwd)
+
+        if isinstance(command, (list, tuple)):
+            os.execvpe(command[0], command, env)
+        else:
+            os.execvpe("/bin/sh", ["/bin/sh", "-c", command], env)
+        # unreachable
+
+    # ---- parent process ----
+    slave_name = None
+    with contextlib.suppress(OSError):
+        slave_name = os.ttyname(slave_fd)
+    os.close(slave_fd)
+    return pid, master_fd, slave_name, packet
+
 
 class Runner:
-    """PTY proxy that intercepts prompts and auto-responds."""
+    """PTY proxy that intercepts prompts and auto-responds.
+
+    A prompt is answered once: answers are keyed on the prompt's cleaned
+    tail and its row on screen, so a re-drawn prompt is not answered again
+    while a different one is answered at once.
+
+    Parameters
+    ----------
+    response : str
+        Text sent when the matched pattern suggests none (default ``y``).
+    cooldown : float
+        Safety floor in seconds between two answers.
+    verbose : bool
+        Print a notice for every answer.
+    categories, extra_patterns, max_line_chars, narrow_after
+        Passed to the ``PromptDetector``.
+    proc_gate : bool
+        Linux: only match while the child waits for input (``_proc``).
+    detect_thread : bool
+        Unix: match on a ``_worker.DetectWorker`` thread.
+    metrics_socket, metrics_textfile : str
+        Where to export ``metrics`` (``_metrics``).
+    detector : PromptDetector
+        Already compiled detector to use instead (the daemon's).
+    headless : bool
+        Batch output for a log rather than a screen (``None``: when stdout
+        is not a terminal).
+    max_responses, max_repeats, storm_window, on_storm
+        Circuit-breaker limits (``_breaker.Breaker``).
+    idle_timeout, max_runtime : float
+        Unix: stop the child after that long idle or in total; it gets
+        SIGINT, SIGTERM and SIGKILL *kill_grace* seconds apart and the
+        session exits with ``TIMEOUT_EXIT``.
+    trace : bool
+        Time the Unix loop's phases (``_trace``; ``None``:
+        ``AUTO_YES_TRACE=1``).
+    """
 
     def __init__(
         self,
         response="y",
-        cooldown=0.5,
+        cooldown=0.1,
         verbose=False,
         categories=None,
         extra_patterns=None,
+        max_line_chars=MAX_LINE_CHARS,
+        proc_gate=False,
+        narrow_after=NARROW_AFTER,
+        detect_thread=False,
+        metrics_socket=None,
+        metrics_textfile=None,
+        detector=None,
+        headless=None,
+        max_responses=_breaker.MAX_RESPONSES,
+        max_repeats=_breaker.MAX_REPEATS,
+        storm_window=_breaker.WINDOW,
+        on_storm="pause",
+        idle_timeout=None,
+        max_runtime=None,
+        kill_grace=5.0,
+        trace=None,
     ):
         self.response = response
         self.cooldown = cooldown
         self.verbose = verbose
-        self.detector = PromptDetector(
-            categories=categories,
-            extra_patterns=extra_patterns,
-        )
+        self.proc_gate = proc_gate
+        self.detect_thread = detect_thread
+        self.headless = headless
+        self.idle_timeout = idle_timeout
+        self.max_runtime = max_runtime
+        self.kill_grace = kill_grace
+        self.metrics_socket = metrics_socket
+        self.metrics_textfile = metrics_textfile
+        if categories is None:
+            categories = ["generic"]
+        self.categories = list(categories)
+        if detector is None:
+            detector = PromptDetector(
+                categories=categories,
+                extra_patterns=extra_patterns,
+                max_line_chars=max_line_chars,
+                narrow_after=narrow_after,
+            )
+        self.detector = detector
+        self.breaker = _breaker.Breaker(max_responses, max_repeats, storm_window, on_storm)
         self._last_response_time = 0.0
+        self._redraws = deque(maxlen=2)
+        self._responses = 0
+        self._cursor = CursorTracker()
+        self._answered = deque(maxlen=_ANSWERED_LIMIT)
+        # the prompt last held back, so one that stays on screen counts once
+        self._held = None
+        self._pending = None
+        self._queued = None
+        self._queued_since = 0.0
+        self._queued_seen = False
+        self._requeued = 0
+        self._retries = 0
+        self._gated = 0
+        self._foreground = None
+        self._narrowed = None
+        self._coalesced = 0
+        self._record = None
+        self.child_usage = None
+        # why the watchdog stopped the last command, if it did
+        self.timed_out = None
+        self._started = 0.0
+        self._signals_sent = 0
+        self._next_signal = 0.0
+        self._out = None
+        # notices as plain log lines (headless)
+        self._plain = False
+        # tells _confirm_unix whether the child sits in a terminal read
+        self._reader = None
+        self.metrics = _metrics.Metrics()
+        if trace is None:
+            trace = _trace.enabled()
+        self.trace = None
+        if trace:
+            self.trace = _trace.PhaseTimer()
+        self._last_output = 0.0
+        # held by whichever thread calls into the detector
+        self._detect_lock = threading.Lock()
 
     # ------------------------------------------------------------------
     # public API
@@ -47,26 +400,327 @@ class Runner:
 
     def run_command(self, command):
         """Run *command* (list or str) with auto-yes.  Returns exit code."""
-        if sys.platform == "win32":
-            return self._run_windows(command)
-        return self._run_unix(command)
+        with self._registered(command), self._exported():
+            if sys.platform == "win32":
+                return self._run_windows(command)
+            return self._run_unix(command)
 
     def run_shell(self):
         """Launch an interactive shell session with auto-yes.  Returns exit code."""
         if sys.platform == "win32":
             shell = os.environ.get("COMSPEC", "cmd.exe")
-            return self._run_windows([shell])
+            with self._registered([shell]), self._exported():
+                return self._run_windows([shell])
 
         shell = os.environ.get("SHELL", "/bin/sh")
-        return self._run_unix([shell])
+        with self._registered([shell]), self._exported():
+            return self._run_unix([shell], follow_foreground=True)
+
+    def stats(self):
+        """Return session counters: ``responses`` sent, ``retries`` of
+        unconfirmed answers, checks skipped by the ``proc_gate`` (``gated``),
+        snapshots the ``detect_thread`` skipped (``coalesced``), plus the
+        detector's ``stats()`` (memo hit rate, narrowing).
+
+        ``breaker`` holds the circuit breaker's ``stats()`` and
+        ``timed_out`` why the watchdog stopped the command (or ``None``),
+        ``trace`` the ``PhaseTimer.breakdown()`` when tracing (or ``None``).
+        ``child_usage`` is the resource usage of the last command once it
+        has been reaped (Unix; else ``None``) and ``proxy_usage`` that of
+        this process so far, both as ``_usage.from_rusage`` dicts.
+        """
+        stats = {
+            "responses": self._responses,
+            "retries": self._retries,
+            "gated": self._gated,
+            "coalesced": self._coalesced,
+            "child_usage": self.child_usage,
+            "proxy_usage": _usage.proxy(),
+            "breaker": self.breaker.stats(),
+            "timed_out": self.timed_out,
+            "trace": None,
+        }
+        if self.trace is not None:
+            stats["trace"] = self.trace.breakdown()
+        stats.update(self.detector.stats())
+        return stats
+
+    # ------------------------------------------------------------------
+    # session registry
+    # ------------------------------------------------------------------
+
+    @contextlib.contextmanager
+    def _registered(self, command):
+        """Publish this session in the registry while the block runs."""
+        if isinstance(command, (list, tuple)):
+            command = " ".join(command)
+        if _registry.available():
+            self._record = _registry.register(command, self.categories)
+        try:
+            yield
+        finally:
+            if self._record is not None:
+                self._record.close()
+                self._record = None
+
+    @contextlib.contextmanager
+    def _exported(self):
+        """Export ``metrics`` to the configured socket / textfile while the
+        block runs.
+        """
+        labels = {"pid": os.getpid()}
+        exporters = []
+        if self.metrics_textfile:
+            exporters.append(
+                _metrics.TextfileExporter(self.metrics_textfile, self.metrics, labels)
+            )
+        if self.metrics_socket:
+            try:
+                exporters.append(_metrics.SocketExporter(self.metrics_socket, self.metrics, labels))
+            except OSError as exc:
+                sys.stderr.write(
+                    f"[auto-yes] cannot serve metrics on {self.metrics_socket}: {exc}\n"
+                )
+        try:
+            yield
+        finally:
+            for exporter in exporters:
+                exporter.close()
+
+    def _proxied(self, count):
+        if self._record is not None:
+            self._record.proxied(count)
+
+    def _count_response(self, result):
+        self._responses += 1
+        self.metrics.responses += 1
+        if self._last_output:
+            self.metrics.observe_latency(time.time() - self._last_output)
+        if result is not None:
+            self.metrics.hit(result.pattern)
+            if self._record is not None:
+                self._record.responded(result.pattern)
+
+    # ------------------------------------------------------------------
+    # output buffer
+    # ------------------------------------------------------------------
+
+    def _ingest(self, buf, data):
+        """Append *data* to the rolling output buffer *buf* and return it.
+
+        CR-overwritten segments are compacted away as they arrive so the
+        buffer holds what the terminal shows rather than every frame of a
+        progress bar.  Redraws of the current line are recorded for
+        ``_animating``, which only the Unix loop consults: it re-checks the
+        buffer on every select timeout, while the Windows readers only check
+        after a read and would miss a prompt drawn by the final frame.
+        """
+        self._proxied(len(data))
+        self.metrics.bytes_in += len(data)
+        self._last_output = time.time()
+        self._cursor.feed(data)
+        buf, overwrites = compact_cr(buf + data, len(buf))
+        if b"\n" in data:
+            self._redraws.clear()
+        if overwrites:
+            self._redraws.append(time.time())
+        if len(buf) > _BUFFER_LIMIT:
+            buf = buf[-_BUFFER_TRIM:]
+        return buf
+
+    # ------------------------------------------------------------------
+    # response gating
+    # ------------------------------------------------------------------
+
+    def _new_prompt(self, buf, position=None):
+        """Return ``(result, fingerprint)`` for a prompt at the end of *buf*
+        that has not been answered yet, otherwise ``None``.
+
+        *position* is the cursor position when *buf* was captured (default:
+        the current one).
+        """
+        if not self.breaker.allows():
+            return None
+
+        tail = tail_bytes(buf, self.detector.window)
+        self.metrics.detections += 1
+        trace = self.trace
+        if trace is not None:
+            mark = time.perf_counter()
+        result = self.detector.detect_tail(tail)
+        if trace is not None:
+            trace.add(_trace.DETECT, mark)
+        if result is None:
+            return None
+        self.metrics.matches += 1
+
+        if position is None:
+            position = self._cursor.position
+        fingerprint = (tail, position)
+        if self._suppressed(fingerprint):
+            return None
+        if not self.breaker.allows(tail):
+            return None
+        return result, fingerprint
+
+    def _suppressed(self, fingerprint):
+        """Return ``True`` if the prompt identified by *fingerprint* must not
+        be answered now: it was answered already, or the cooldown after the
+        last answer has not passed.  Each prompt held back is counted once.
+        """
+        if fingerprint not in self._answered and (
+            time.time() - self._last_response_time >= self.cooldown
+        ):
+            return False
+        if fingerprint != self._held:
+            self._held = fingerprint
+            self.metrics.suppressed += 1
+        return True
+
+    def _answered_prompt(self, fingerprint, result=None):
+        """Record that the prompt identified by *fingerprint* was answered,
+        triggered by *result*.
+        """
+        self._claim(fingerprint)
+        self._count_response(result)
+
+    def _claim(self, fingerprint):
+        """Keep the prompt identified by *fingerprint* from being answered again."""
+        self._last_response_time = time.time()
+        self._answered.append(fingerprint)
+        self._held = None
+        self.breaker.record(fingerprint[0])
+
+    def _release(self, tail):
+        """Forget the answered prompt ending in *tail* once the child has
+        moved past it, so the same question asked again at the same row
+        (a full-screen TUI that does not scroll) is answered again.
+        """
+        with self._detect_lock:
+            kept = [fingerprint for fingerprint in self._answered if fingerprint[0] != tail]
+            self._answered = deque(kept, maxlen=_ANSWERED_LIMIT)
+
+    def _check_breaker(self, stdout_fd, pid):
+        """Report circuit-breaker trips; terminate *pid* if one asks to."""
+        for trip in self.breaker.take_trips():
+            paused = "answers to that prompt"
+            if trip.session:
+                paused = "all answers"
+            window = f"{self.breaker.window:g}"
+            self._notice(stdout_fd, f"answer storm: {trip.reason}; pausing {paused} for {window} s")
+            if trip.kill:
+                self._notice(stdout_fd, "answer storm: terminating the command")
+                with contextlib.suppress(ProcessLookupError):
+                    os.kill(pid, signal.SIGTERM)
+
+    def _detect_snapshot(self, buf, position):
+        """Worker-thread check: return ``(result, fingerprint)`` if *buf*
+        ends in a new prompt, otherwise ``None``.
+
+        Nothing is claimed here: the I/O loop claims the prompt when it
+        actually writes the answer (``_worker_answers``).
+        """
+        with self._detect_lock:
+            return self._new_prompt(buf, position)
+
+    def _worker_answers(self, found, buf, master_fd, stdout_fd):
+        """Answer the ``(result, fingerprint)`` pairs in *found* that still
+        hold and return the output buffer to carry on with.
+
+        A result is dropped when the screen moved on while the worker was
+        matching, or when an earlier result, the cooldown or the circuit
+        breaker now rules it out.
+        """
+        for result, fingerprint in found:
+            tail = tail_bytes(buf, self.detector.window)
+            if tail != fingerprint[0]:
+                continue
+            with self._detect_lock:
+                if self._suppressed(fingerprint) or not self.breaker.allows(tail):
+                    continue
+            if not self._inject_unix(result, tail, master_fd, stdout_fd):
+                continue
+            with self._detect_lock:
+                self._claim(fingerprint)
+            self._count_response(result)
+            buf = b""
+        return buf
+
+    def _gate_open(self, watcher):
+        """Return ``True`` unless *watcher* reports the child is busy."""
+        if watcher is None or watcher.waiting_for_input():
+            return True
+        self._gated += 1
+        return False
+
+    def _follow_foreground(self, master_fd):
+        """Focus the detector on the profile of the PTY's foreground job."""
+        try:
+            pgid = os.tcgetpgrp(master_fd)
+        except OSError:
+            return
+        if pgid == self._foreground:
+            return
+        self._foreground = pgid
+
+        focus = None
+        for name in _proc.program_names(pgid):
+            profile = resolve_profile(name)
+            if profile is not None:
+                focus = [profile, "generic"]
+                break
+        # otherwise the shell itself, or a program without a profile
+        with self._detect_lock:
+            self.detector.focus(focus)
+
+    def _begin_session(self, master_fd, winsz=None):
+        """Reset the per-command state for a child just started on the PTY
+        *master_fd*, with window size *winsz* (packed ``winsize``).
+
+        Shared by the Unix loop and ``session.Session``.
+        """
+        if winsz is not None:
+            self._track_rows(winsz)
+        self.timed_out = None
+        self._started = time.time()
+        self._signals_sent = 0
+        self._reader = None
+        if _proc.available():
+            # tells a dropped answer from one the child took in silence
+            self._reader = _proc.ProcWatcher(master_fd, ttl=0)
+
+    def _typed(self):
+        """Note that keystrokes reached the child: someone took over, so no
+        answer is re-sent behind their back.
+        """
+        self._pending = None
+        self._queued = None
+
+    def _track_rows(self, winsz):
+        """Update the cursor tracker from a packed ``TIOCGWINSZ`` result."""
+        rows = struct.unpack("HHHH", winsz)[0]
+        if rows:
+            self._cursor.rows = rows
+
+    def _animating(self):
+        """Return ``True`` while the current line is being redrawn repeatedly."""
+        if len(self._redraws) < self._redraws.maxlen:
+            return False
+        return time.time() - self._redraws[0] < _ANIMATION_WINDOW
 
     # ==================================================================
     # Unix implementation
     # ==================================================================
 
-    def _run_unix(self, command):
+    def _run_unix(self, command, follow_foreground=False):
+        """Proxy *command* on a PTY until it exits.  Returns exit code.
+
+        The master is in packet mode, so a termios change of the child is
+        checked at once (``_packet_event``), and what goes to stdout is
+        staged in an ``_OutputBuffer``.  With *follow_foreground* (shell
+        sessions) the detector follows the foreground job's profile.
+        """
         import fcntl
-        import pty
         import select
         import termios
         import tty
@@ -82,38 +736,28 @@ class Runner:
         if stdin_is_tty:
             old_tty_attrs = termios.tcgetattr(stdin_fd)
 
-        master_fd, slave_fd = pty.openpty()
+        headless = self.headless
+        if headless is None:
+            headless = not os.isatty(stdout_fd)
+        if headless:
+            out = _OutputBuffer(stdout_fd, metrics=self.metrics)
+            batch = _HEADLESS_READ
+        else:
+            out = _OutputBuffer(stdout_fd, interval=0, metrics=self.metrics)
+            batch = _STAGE_READ
+        self._out = out
+        self._plain = headless
 
         # propagate current window size to the child PTY
-        if stdin_is_tty:
-            try:
+        winsz = None
+        if headless:
+            winsz = _headless_winsize()
+        elif stdin_is_tty:
+            with contextlib.suppress(OSError):
                 winsz = fcntl.ioctl(stdout_fd, termios.TIOCGWINSZ, b"\x00" * 8)
-                fcntl.ioctl(slave_fd, termios.TIOCSWINSZ, winsz)
-            except OSError:
-                pass
-
-        pid = os.fork()
-
-        if pid == 0:
-            # ---- child process ----
-            os.close(master_fd)
-            os.setsid()
-            fcntl.ioctl(slave_fd, termios.TIOCSCTTY, 0)
 
-            os.dup2(slave_fd, 0)
-            os.dup2(slave_fd, 1)
-            os.dup2(slave_fd, 2)
-            if slave_fd > 2:
-                os.close(slave_fd)
-
-            if isinstance(command, (list, tuple)):
-                os.execvpe(command[0], command, env)
-            else:
-                os.execvpe("/bin/sh", ["/bin/sh", "-c", command], env)
-            # unreachable
-
-        # ---- parent process ----
-        os.close(slave_fd)
+        pid, master_fd, slave_name, packet = _fork_pty(command, env, winsz)
+        self._begin_session(master_fd, winsz)
 
         # forward SIGWINCH so the child PTY tracks terminal resizes
         prev_winch = signal.getsignal(signal.SIGWINCH)
@@ -122,77 +766,154 @@ class Runner:
             try:
                 ws = fcntl.ioctl(stdout_fd, termios.TIOCGWINSZ, b"\x00" * 8)
                 fcntl.ioctl(master_fd, termios.TIOCSWINSZ, ws)
+                self._track_rows(ws)
                 os.kill(pid, signal.SIGWINCH)
             except (OSError, ProcessLookupError):
                 pass
 
-        signal.signal(signal.SIGWINCH, _on_winch)
+        if not headless:
+            signal.signal(signal.SIGWINCH, _on_winch)
+
+        watcher = None
+        if self.proc_gate and _proc.available():
+            watcher = _proc.ProcWatcher(master_fd)
+        if not _proc.available():
+            follow_foreground = False
 
         if stdin_is_tty:
             tty.setraw(stdin_fd)
 
+        worker = None
+        if self.detect_thread:
+            from auto_yes._worker import DetectWorker
+
+            worker = DetectWorker(self._detect_snapshot)
+
         output_buf = b""
-        exit_code = 0
+        exit_code = None
+        watchdog = bool(self.idle_timeout or self.max_runtime)
+        trace = self.trace
+        if trace is not None:
+            trace.start()
 
         try:
             while True:
+                # write what the last wakeup staged before waiting again
+                if trace is not None:
+                    mark = time.perf_counter()
+                out.flush_due()
+                if trace is not None:
+                    mark = trace.add(_trace.FORWARD, mark)
+
                 watch_fds = [master_fd]
                 if stdin_is_tty:
                     watch_fds.append(stdin_fd)
-
+                if worker is not None:
+                    watch_fds.append(worker.fileno())
+
+                timeout = 0.05
+                if self._queued is not None and not self._queued_seen:
+                    # look at the child's input queue as soon as it settles
+                    timeout = _QUEUE_SETTLE
+                timeout = out.timeout(timeout)
                 try:
-                    readable, _, _ = select.select(watch_fds, [], [], 0.05)
+                    readable, _, _ = select.select(watch_fds, [], [], timeout)
                 except (OSError, InterruptedError):
                     continue
+                self.metrics.wakeups += 1
+                if trace is not None:
+                    trace.add(_trace.WAIT, mark)
 
                 # ---- user input -> child ----
                 if stdin_fd in readable:
                     try:
                         data = os.read(stdin_fd, 4096)
+                        self.metrics.reads += 1
                         if not data:
                             break
                         os.write(master_fd, data)
+                        self._proxied(len(data))
+                        self.metrics.bytes_out += len(data)
+                        self._typed()
                     except OSError:
                         break
 
                 # ---- child output -> user (with interception) ----
+                termios_changed = False
                 if master_fd in readable:
-                    try:
-                        data = os.read(master_fd, 4096)
-                        if not data:
-                            break
-                    except OSError as exc:
-                        if exc.errno == errno.EIO:
-                            break
-                        raise
-
-                    os.write(stdout_fd, data)
+                    if trace is not None:
+                        mark = time.perf_counter()
+                    data, termios_changed, closed = self._read_child(
+                        master_fd, stdout_fd, packet, batch
+                    )
+                    if trace is not None:
+                        mark = trace.add(_trace.READ, mark)
+                    if data:
+                        out.write(data)
+                        output_buf = self._ingest(output_buf, data)
+                        if trace is not None:
+                            trace.add(_trace.FORWARD, mark)
+                    if closed:
+                        break
 
-                    output_buf += data
-                    if len(output_buf) > _BUFFER_LIMIT:
-                        output_buf = output_buf[-_BUFFER_TRIM:]
+                # ---- answers found by the detection worker ----
+                if worker is not None and worker.fileno() in readable:
+                    output_buf = self._worker_answers(
+                        worker.results(), output_buf, master_fd, stdout_fd
+                    )
 
                 # re-check the buffer on every iteration (including timeouts)
-                # so a prompt that arrived during cooldown is not missed
-                if output_buf:
-                    responded = self._maybe_respond_unix(output_buf, master_fd, stdout_fd)
-                    if responded:
+                # so a prompt that arrived during cooldown or while the line
+                # was still animating is not missed; a termios change means
+                # the child is about to read, so it skips the gates
+                if follow_foreground:
+                    self._follow_foreground(master_fd)
+                check = termios_changed
+                if not check:
+                    check = not self._animating() and self._gate_open(watcher)
+                if output_buf and check:
+                    if worker is not None:
+                        worker.submit(output_buf, self._cursor.position)
+                    elif self._maybe_respond_unix(output_buf, master_fd, stdout_fd):
                         output_buf = b""
+                    self._report_narrowing(stdout_fd)
+
+                if self._pending is not None:
+                    self._confirm_unix(output_buf, master_fd, stdout_fd, slave_name)
+                self._track_queued(slave_name)
+                self._check_breaker(stdout_fd, pid)
+                if watchdog:
+                    self._watch(stdout_fd, pid, master_fd, output_buf)
 
                 # ---- check child status (non-blocking) ----
                 exit_code = self._reap_child(pid)
                 if exit_code is not None:
-                    self._drain_pty(master_fd, stdout_fd)
+                    out.flush()
+                    self._drain_pty(master_fd, stdout_fd, packet)
                     break
 
             # if loop exited without reaping, wait for child
             if exit_code is None:
                 exit_code = self._wait_child(pid)
+            if self.timed_out is not None:
+                exit_code = TIMEOUT_EXIT
+            self._report_usage(stdout_fd, exit_code)
 
         finally:
+            self._out = None
+            self._plain = False
+            self._reader = None
+            with contextlib.suppress(OSError):
+                out.flush()
+            if trace is not None:
+                trace.stop()
+            if worker is not None:
+                worker.close()
+                self._coalesced += worker.coalesced
             if old_tty_attrs is not None:
                 termios.tcsetattr(stdin_fd, termios.TCSAFLUSH, old_tty_attrs)
-            signal.signal(signal.SIGWINCH, prev_winch)
+            if not headless:
+                signal.signal(signal.SIGWINCH, prev_winch)
             with contextlib.suppress(OSError):
                 os.close(master_fd)
 
@@ -200,75 +921,315 @@ class Runner:
 
     # ------------------------------------------------------------------
 
+    def _read_child(self, master_fd, stdout_fd, packet, batch=0):
+        """Read the child's output from *master_fd*.
+
+        Returns ``(data, termios_changed, closed)``; *closed* is true once
+        the child's side of the PTY is gone.  With *batch*, reading goes on
+        while more output is ready, up to *batch* bytes, so a burst is
+        ingested and checked once instead of once per read.
+        """
+        import select
+
+        chunks = []
+        size = 0
+        termios_changed = False
+        closed = False
+        while True:
+            try:
+                data = os.read(master_fd, max(4096, batch - size))
+                self.metrics.reads += 1
+            except OSError as exc:
+                if exc.errno != errno.EIO:
+                    raise
+                data = b""
+            if not data:
+                closed = True
+                break
+            if packet:
+                status, data = _split_packet(data)
+                if self._packet_event(status, master_fd, stdout_fd):
+                    termios_changed = True
+            chunks.append(data)
+            size += len(data)
+            if size >= batch or not select.select([master_fd], [], [], 0)[0]:
+                break
+        return b"".join(chunks), termios_changed, closed
+
     def _maybe_respond_unix(self, buf, master_fd, stdout_fd):
         """Check *buf* for a prompt.  If found, write the response to *master_fd*.
 
-        Returns ``True`` when a response was sent.
+        Returns ``(result, fingerprint)`` when a response was sent, otherwise
+        ``None``.
         """
-        now = time.time()
-        if (now - self._last_response_time) < self.cooldown:
-            return False
+        found = self._new_prompt(buf)
+        if found is None:
+            return None
+        result, fingerprint = found
+        if not self._inject_unix(result, fingerprint[0], master_fd, stdout_fd):
+            return None
+        self._answered_prompt(fingerprint, result)
+        return found
 
-        text = buf.decode("utf-8", errors="replace")
-        result = self.detector.detect(text)
-        if result is None:
-            return False
+    def _inject_unix(self, result, tail, master_fd, stdout_fd):
+        """Write the answer to *result*, the prompt ending in *tail*, to
+        *master_fd* and wait for the child to confirm it.
 
+        Returns ``True`` when the answer was written.
+        """
         response = result.suggested_response
         if response is None:
             response = self.response
 
+        trace = self.trace
+        if trace is not None:
+            mark = time.perf_counter()
         try:
-            os.write(master_fd, (response + "\n").encode())
+            data = (response + "\n").encode()
+            os.write(master_fd, data)
         except OSError:
             return False
+        if trace is not None:
+            trace.add(_trace.RESPOND, mark)
+        self.metrics.bytes_out += len(data)
 
-        self._last_response_time = time.time()
+        self._pending = _Pending(tail, data, time.time() + _CONFIRM_DELAY, 0, result)
+        self._queue(data)
+        self._requeued = 0
 
-        if self.verbose:
-            msg = (
-                f"\r\n\x1b[33m[auto-yes] responded '{response}'"
-                f" (matched: {result.pattern})\x1b[0m\r\n"
-            )
-            with contextlib.suppress(OSError):
-                os.write(stdout_fd, msg.encode())
+        self._notice(stdout_fd, f"responded '{response}' (matched: {result.pattern})")
 
         return True
 
+    def _confirm_unix(self, buf, master_fd, stdout_fd, slave_name):
+        """Re-send the pending answer if it was provably dropped.
+
+        *buf* holds the output since the answer was sent.  Once the deadline
+        passes, any visible output other than the prompt itself (an echo,
+        the next screen) confirms the answer.  Silence alone proves nothing:
+        a child that read the answer with echo off may just be working.
+        Only if the prompt is still the tail, the answer is no longer queued
+        on the slave and the child is blocked reading the terminal (see
+        ``_proc.ProcWatcher.state``) are the keystrokes sent again, with
+        exponential backoff, at most ``_RETRY_LIMIT`` times.  Without that
+        evidence the answer is left alone; a flush of the input queue is
+        handled by ``_packet_event``.
+        """
+        pending = self._pending
+        now = time.time()
+        if now < pending.deadline:
+            return
+
+        tail = tail_bytes(buf, self.detector.window)
+        if tail and tail != pending.tail:
+            self._pending = None
+            self._release(pending.tail)
+            if pending.result is not None:
+                with self._detect_lock:
+                    self.detector.confirm(pending.result)
+                self._report_narrowing(stdout_fd)
+            return
+
+        state = None
+        if self._reader is not None:
+            state = self._reader.state()
+        if state != _proc.INPUT:
+            # busy with the answer, or cannot tell: nothing shows it was lost
+            self._pending = None
+            if state == _proc.BUSY:
+                self._release(pending.tail)
+            return
+
+        if pending.retries >= _RETRY_LIMIT:
+            self._pending = None
+            self._notice(stdout_fd, "no reaction to the answer; giving up")
+            return
+
+        if _unread_input(slave_name) == 0:
+            try:
+                os.write(master_fd, pending.data)
+            except OSError:
+                self._pending = None
+                return
+            self.metrics.bytes_out += len(pending.data)
+            self._retries += 1
+            self._queue(pending.data)
+            self._notice(stdout_fd, "no reaction to the answer; sent it again")
+
+        delay = _CONFIRM_DELAY * 2 ** (pending.retries + 1)
+        self._pending = pending._replace(deadline=now + delay, retries=pending.retries + 1)
+
+    def _queue(self, data):
+        """Track *data*, just written to the child, until it reads it."""
+        self._queued = data
+        self._queued_since = time.time()
+        self._queued_seen = False
+
+    def _track_queued(self, slave_name):
+        """Forget the queued answer once the child has read it.
+
+        A zero count right after writing only means the answer has not
+        reached the child's input queue yet, so it is ignored.  An answer
+        still unread after ``_QUEUE_WATCH`` seconds is no longer tracked, so
+        a child that never reads it does not cost a slave open per wakeup.
+        """
+        if self._queued is None:
+            return
+        waited = time.time() - self._queued_since
+        if waited < _QUEUE_SETTLE:
+            return
+        if waited >= _QUEUE_WATCH:
+            self._queued = None
+            return
+        if _unread_input(slave_name) == 0:
+            self._queued = None
+        else:
+            self._queued_seen = True
+
+    def _packet_event(self, status, master_fd, stdout_fd):
+        """Handle a ``TIOCPKT`` status byte from the child's terminal.
+
+        A flush of the child's input queue while an answer was seen sitting
+        there unread discarded that answer (``tty.setraw`` flushes, for one),
+        so it is sent again, at most ``_RETRY_LIMIT`` times.  Returns
+        ``True`` if the child changed its terminal settings.
+        """
+        if status & _PKT_FLUSHREAD and self._queued is not None and self._queued_seen:
+            if self._requeued >= _RETRY_LIMIT:
+                self._queued = None
+            else:
+                try:
+                    os.write(master_fd, self._queued)
+                    self.metrics.bytes_out += len(self._queued)
+                    self._queue(self._queued)
+                    self._requeued += 1
+                    self._retries += 1
+                    self._notice(stdout_fd, "the answer was flushed unread; sent it again")
+                except OSError:
+                    self._queued = None
+        if status & _PKT_TERMIOS:
+            # a child going raw is about to read a key, not animating
+            self._redraws.clear()
+            return True
+        return False
+
+    def _report_narrowing(self, stdout_fd):
+        """Tell the user when the detector narrowed or widened again."""
+        narrowed = self.detector.narrowed
+        if narrowed == self._narrowed:
+            return
+        self._narrowed = narrowed
+        if narrowed is None:
+            self._notice(stdout_fd, "prompt from another profile; matching all patterns again")
+        else:
+            self._notice(stdout_fd, f"narrowed detection to {', '.join(narrowed)}")
+
+    def _notice(self, stdout_fd, text):
+        if self.verbose:
+            self._alert(stdout_fd, text)
+
+    def _alert(self, stdout_fd, text):
+        """Show *text* (may span lines) whether or not *verbose* is on."""
+        if self._plain:
+            # a log file, not a screen: no colours, no cursor games
+            self._out.line(f"[auto-yes] {text}")
+            return
+        text = text.replace("\n", "\r\n")
+        msg = f"\r\n\x1b[33m[auto-yes] {text}\x1b[0m\r\n".encode()
+        if self._out is not None:
+            # staged behind the output it comments on
+            self._out.write(msg)
+            return
+        if stdout_fd is None:
+            return
+        with contextlib.suppress(OSError):
+            os.write(stdout_fd, msg)
+
+    # ------------------------------------------------------------------
+    # watchdog
     # ------------------------------------------------------------------
 
-    @staticmethod
-    def _reap_child(pid):
-        """Non-blocking waitpid.  Returns exit code or ``None``."""
+    def _watch(self, stdout_fd, pid, master_fd, buf):
+        """Enforce *idle_timeout* and *max_runtime*.
+
+        Once a budget runs out the last screen (*buf*) is shown and the
+        child's process group, and the terminal's foreground group, get
+        ``SIGINT``, then ``SIGTERM`` and ``SIGKILL`` *kill_grace* seconds
+        apart.  Only compares timestamps: the loop wakes up anyway.
+        """
+        now = time.time()
+        if self.timed_out is None:
+            reason = None
+            if self.max_runtime and now - self._started >= self.max_runtime:
+                reason = f"still running after {self.max_runtime:g} s (max runtime)"
+            elif self.idle_timeout:
+                active = max(self._started, self._last_output, self._last_response_time)
+                if now - active >= self.idle_timeout:
+                    reason = f"no output or answer for {self.idle_timeout:g} s (idle timeout)"
+            if reason is None:
+                return
+            self.timed_out = reason
+            self._alert(stdout_fd, f"watchdog: {reason}; stopping the command")
+            self._dump_screen(stdout_fd, buf)
+            self._next_signal = now
+
+        if self._signals_sent >= len(_WATCHDOG_SIGNALS) or now < self._next_signal:
+            return
+        signum = getattr(signal, _WATCHDOG_SIGNALS[self._signals_sent])
+        self._signals_sent += 1
+        self._next_signal = now + self.kill_grace
+        groups = {pid}
+        with contextlib.suppress(OSError):
+            groups.add(os.tcgetpgrp(master_fd))
+        for pgid in groups:
+            with contextlib.suppress(ProcessLookupError, PermissionError):
+                os.killpg(pgid, signum)
+        self._alert(stdout_fd, f"watchdog: sent {signal.Signals(signum).name}")
+
+    def _dump_screen(self, stdout_fd, buf):
+        screen = tail_text(buf, self._cursor.rows)
+        if not screen:
+            self._alert(stdout_fd, "watchdog: no output since the last answer")
+            return
+        lines = "\n".join(f"  | {line}" for line in screen.split("\n"))
+        self._alert(stdout_fd, f"watchdog: last screen:\n{lines}")
+
+    # ------------------------------------------------------------------
+
+    def _reap_child(self, pid):
+        """Non-blocking wait4.  Returns exit code or ``None``."""
         try:
-            wpid, wstatus = os.waitpid(pid, os.WNOHANG)
+            wpid, wstatus, ru = os.wait4(pid, os.WNOHANG)
         except ChildProcessError:
             return 0
 
         if wpid == 0:
             return None
 
-        if os.WIFEXITED(wstatus):
-            return os.WEXITSTATUS(wstatus)
-        if os.WIFSIGNALED(wstatus):
-            return 128 + os.WTERMSIG(wstatus)
-        return 1
+        self.child_usage = _usage.from_rusage(ru)
+        return _exit_code(wstatus)
 
-    @staticmethod
-    def _wait_child(pid):
-        """Blocking waitpid.  Returns exit code."""
+    def _wait_child(self, pid):
+        """Blocking wait4.  Returns exit code."""
         try:
-            _, wstatus = os.waitpid(pid, 0)
+            _, wstatus, ru = os.wait4(pid, 0)
         except ChildProcessError:
             return 0
-        if os.WIFEXITED(wstatus):
-            return os.WEXITSTATUS(wstatus)
-        if os.WIFSIGNALED(wstatus):
-            return 128 + os.WTERMSIG(wstatus)
-        return 1
+        self.child_usage = _usage.from_rusage(ru)
+        return _exit_code(wstatus)
+
+    def _report_usage(self, stdout_fd, exit_code):
+        """With *verbose*, note what the child and auto-yes itself cost."""
+        if not self.verbose or self.child_usage is None:
+            return
+        text = f"exited {exit_code}; child: {_usage.describe(self.child_usage)}"
+        proxy = _usage.proxy()
+        if proxy is not None:
+            text = f"{text}; auto-yes: {_usage.describe(proxy)}"
+        self._notice(stdout_fd, text)
 
     @staticmethod
-    def _drain_pty(master_fd, stdout_fd):
+    def _drain_pty(master_fd, stdout_fd, packet=False):
         """Flush any remaining bytes in the master PTY buffer."""
         import select as _sel
 
@@ -280,6 +1241,8 @@ class Runner:
                 data = os.read(master_fd, 4096)
                 if not data:
                     break
+                if packet:
+                    data = _split_packet(data)[1]
                 os.write(stdout_fd, data)
         except OSError:
             pass
@@ -323,9 +1286,7 @@ class Runner:
                 sys.stdout.buffer.write(raw)
                 sys.stdout.buffer.flush()
 
-                output_buf += raw
-                if len(output_buf) > _BUFFER_LIMIT:
-                    output_buf = output_buf[-_BUFFER_TRIM:]
+                output_buf = self._ingest(output_buf, raw)
 
                 responded = self._maybe_respond_winpty(output_buf, proc)
                 if responded:
@@ -337,14 +1298,10 @@ class Runner:
         return proc.exitstatus or 0
 
     def _maybe_respond_winpty(self, buf, proc):
-        now = time.time()
-        if (now - self._last_response_time) < self.cooldown:
-            return False
-
-        text = buf.decode("utf-8", errors="replace")
-        result = self.detector.detect(text)
-        if result is None:
+        found = self._new_prompt(buf)
+        if found is None:
             return False
+        result, fingerprint = found
 
         response = result.suggested_response
         if response is None:
@@ -354,8 +1311,9 @@ class Runner:
             proc.write(response + "\n")
         except Exception:
             return False
+        self.metrics.bytes_out += len(response) + 1
 
-        self._last_response_time = time.time()
+        self._answered_prompt(fingerprint, result)
 
         if self.verbose:
             msg = f"[auto-yes] responded '{response}'\n"
@@ -394,26 +1352,23 @@ class Runner:
                 sys.stdout.buffer.flush()
 
                 with lock:
-                    output_buf.extend(byte)
-                    if len(output_buf) > _BUFFER_LIMIT:
-                        del output_buf[: len(output_buf) - _BUFFER_TRIM]
-
-                    now = time.time()
-                    if (now - self._last_response_time) >= self.cooldown:
-                        text = output_buf.decode("utf-8", errors="replace")
-                        result = self.detector.detect(text)
-                        if result is not None:
-                            resp = result.suggested_response
-                            if resp is None:
-                                resp = self.response
-                            try:
-                                assert proc.stdin is not None
-                                proc.stdin.write((resp + "\n").encode())
-                                proc.stdin.flush()
-                            except (OSError, BrokenPipeError):
-                                pass
-                            self._last_response_time = time.time()
-                            output_buf.clear()
+                    output_buf[:] = self._ingest(output_buf, byte)
+
+                    found = self._new_prompt(output_buf)
+                    if found is not None:
+                        result, fingerprint = found
+                        resp = result.suggested_response
+                        if resp is None:
+                            resp = self.response
+                        try:
+                            assert proc.stdin is not None
+                            proc.stdin.write((resp + "\n").encode())
+                            proc.stdin.flush()
+                            self.metrics.bytes_out += len(resp) + 1
+                        except (OSError, BrokenPipeError):
+                            pass
+                        self._answered_prompt(fingerprint, result)
+                        output_buf.clear()
 
         reader_thread = threading.Thread(target=_reader, daemon=True)
         reader_thread.start()
@@ -0,0 +1,371 @@
+"""Programmatic sessions: drive an interactive command from Python (Unix).
+
+``spawn`` starts a command on its own PTY and returns a ``Session``.  The
+session answers prompts with the same ``PromptDetector`` and response
+gating as ``Runner`` (it drives a ``Runner`` internally) but never touches
+the parent's terminal: output is buffered for ``iter_output`` and
+``wait_for``, answers are reported by ``events``.
+
+Sessions have no threads.  A session only makes progress while one of its
+methods is waiting on it, or while ``pump`` is called with it; ``pump``
+multiplexes any number of sessions over one ``selectors`` poller, so
+hundreds of them can be driven from a single thread.
+
+Example::
+
+    with auto_yes.spawn(["apt", "install", "nginx"], categories=["generic"]) as s:
+        s.wait_for(r"Setting up nginx", timeout=120)
+        print([event.pattern for event in s.events()])
+"""
+
+import codecs
+import contextlib
+import errno
+import os
+import re
+import select
+import selectors
+import signal
+import struct
+import sys
+import time
+from collections import deque, namedtuple
+
+from auto_yes.runner import Runner, _fork_pty, _split_packet
+
+# an answered prompt: the detector's *pattern*, the *response* sent, the
+# prompt's cleaned last line(s) and when it was answered
+Event = namedtuple("Event", ["pattern", "response", "prompt", "time"])
+
+# unread output kept for iter_output(); the oldest chunks are dropped beyond it
+OUTPUT_LIMIT = 1 << 20
+
+# how much recent output wait_for() searches (like pexpect's searchwindowsize)
+SEARCH_WINDOW = 64 * 1024
+
+# the longest a session waits on its PTY before re-checking pending answers
+_TICK = 0.05
+
+
+def spawn(
+    command,
+    categories=None,
+    response="y",
+    cooldown=0.1,
+    extra_patterns=None,
+    env=None,
+    cwd=None,
+    rows=24,
+    cols=80,
+    **runner_kwargs,
+):
+    """Start *command* (list or str) on a new PTY and return its ``Session``.
+
+    *categories*, *response*, *cooldown* and *extra_patterns*, and any
+    further keyword, are ``Runner`` arguments.  *env* replaces the
+    environment (default: a copy of ``os.environ``), *cwd* is the working
+    directory and *rows* x *cols* the terminal size the command sees.
+    *idle_timeout* and *max_runtime* stop the command as they do for
+    ``Runner``, while the session is being driven; ``stats()["timed_out"]``
+    then says why.
+
+    Raises ``OSError`` on Windows, which has no PTY to run it on.
+    """
+    if sys.platform == "win32":
+        raise OSError("auto_yes.spawn needs a Unix pseudo-terminal")
+    runner = Runner(
+        response=response,
+        cooldown=cooldown,
+        categories=categories,
+        extra_patterns=extra_patterns,
+        **runner_kwargs,
+    )
+    # notices would go to the parent's terminal
+    runner.verbose = False
+    return Session(runner, command, env=env, cwd=cwd, rows=rows, cols=cols)
+
+
+class Session:
+    """A command running on its own PTY, answered by *runner*.
+
+    Created by ``spawn``.  As a context manager it closes the session on
+    exit.
+    """
+
+    def __init__(self, runner, command, env=None, cwd=None, rows=24, cols=80):
+        self.runner = runner
+        self.command = command
+        self.exitstatus = None
+        if env is None:
+            env = os.environ.copy()
+        env = dict(env, AUTO_YES_ACTIVE="1")
+        winsz = struct.pack("HHHH", rows, cols, 0, 0)
+
+        self.pid, self._fd, self._slave, self._packet = _fork_pty(command, env, winsz, cwd)
+        os.set_blocking(self._fd, False)
+        runner._begin_session(self._fd, winsz)
+
+        self._buf = b""
+        self._eof = False
+        self._chunks = deque()
+        self._chunk_bytes = 0
+        self._events = deque()
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._text = ""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def fileno(self):
+        """The PTY master, readable when the command has produced output."""
+        return self._fd
+
+    @property
+    def closed(self):
+        return self._fd is None
+
+    @property
+    def eof(self):
+        """``True`` once the command has closed its terminal."""
+        return self._eof
+
+    def stats(self):
+        """Return the ``Runner.stats()`` of this session."""
+        return self.runner.stats()
+
+    # ------------------------------------------------------------------
+    # reading
+    # ------------------------------------------------------------------
+
+    def iter_output(self, timeout=None):
+        """Yield output chunks (bytes) as the command produces them.
+
+        Stops at end of output, or after *timeout* seconds without any.
+        """
+        while True:
+            if self._chunks:
+                chunk = self._chunks.popleft()
+                self._chunk_bytes -= len(chunk)
+                yield chunk
+                continue
+            if self._eof or self.closed:
+                return
+            if not self._step_until(lambda: self._chunks, timeout):
+                return
+
+    def events(self, timeout=0):
+        """Yield an ``Event`` for every prompt answered.
+
+        Answers already made are yielded at once; after that it waits up to
+        *timeout* seconds (``None``: until end of output) for each new one.
+        """
+        while True:
+            if self._events:
+                yield self._events.popleft()
+                continue
+            if self._eof or self.closed:
+                return
+            if not self._step_until(lambda: self._events, timeout):
+                return
+
+    def wait_for(self, pattern, timeout=None):
+        """Wait until the output matches *pattern* (str or compiled regex).
+
+        The output is searched as text, from just after the previous
+        ``wait_for`` match.  Returns the ``re.Match``.  Raises
+        ``TimeoutError`` after *timeout* seconds and ``EOFError`` if the
+        output ends first.
+        """
+        if isinstance(pattern, str):
+            pattern = re.compile(pattern)
+
+        def found():
+            return pattern.search(self._text)
+
+        if found() is None and not self._step_until(found, timeout):
+            if self._eof or self.closed:
+                raise EOFError(f"output ended before {pattern.pattern!r} appeared")
+            raise TimeoutError(f"{pattern.pattern!r} did not appear within {timeout} s")
+        match = found()
+        self._text = self._text[match.end() :]
+        return match
+
+    # ------------------------------------------------------------------
+    # writing / lifetime
+    # ------------------------------------------------------------------
+
+    def send(self, data):
+        """Type *data* (str or bytes) into the command's terminal."""
+        if isinstance(data, str):
+            data = data.encode()
+        self.runner.metrics.bytes_out += len(data)
+        while data:
+            try:
+                written = os.write(self._fd, data)
+            except BlockingIOError:
+                self._step(_TICK)
+                continue
+            data = data[written:]
+        self.runner._typed()
+
+    def sendline(self, line=""):
+        """``send`` *line* followed by a newline."""
+        self.send(f"{line}\n")
+
+    def wait(self, timeout=None):
+        """Wait for the command to exit and return its exit status.
+
+        Output produced meanwhile stays available to ``iter_output``.
+        Raises ``TimeoutError`` if it is still running after *timeout*.
+        """
+        if not self._step_until(lambda: self._reaped(), timeout):
+            raise TimeoutError(f"the command is still running after {timeout} s")
+        return self.exitstatus
+
+    def close(self, timeout=1.0):
+        """Stop the command if it is still running and release the PTY.
+
+        Sends ``SIGHUP``, then ``SIGKILL`` after *timeout* seconds.  Returns
+        the exit status.
+        """
+        if self.closed:
+            return self.exitstatus
+        if not self._reaped():
+            with contextlib.suppress(ProcessLookupError):
+                os.kill(self.pid, signal.SIGHUP)
+            deadline = time.time() + timeout
+            while not self._reaped() and time.time() < deadline:
+                time.sleep(0.01)
+            if not self._reaped():
+                with contextlib.suppress(ProcessLookupError):
+                    os.kill(self.pid, signal.SIGKILL)
+                self.exitstatus = self.runner._wait_child(self.pid)
+        os.close(self._fd)
+        self._fd = None
+        return self.exitstatus
+
+    # ------------------------------------------------------------------
+    # I/O step (shared with pump)
+    # ------------------------------------------------------------------
+
+    def _step_until(self, done, timeout):
+        """Run I/O steps until ``done()`` is true; ``False`` on timeout/EOF."""
+        deadline = None
+        if timeout is not None:
+            deadline = time.time() + timeout
+        while not done():
+            if self.closed or (self._eof and self._reaped()):
+                return bool(done())
+            wait = _TICK
+            if deadline is not None:
+                remaining = deadline - time.time()
+                if remaining < 0:
+                    return False
+                wait = min(wait, remaining)
+            self._step(wait)
+        return True
+
+    def _step(self, wait):
+        """Wait up to *wait* seconds for output, then process it."""
+        if self._eof:
+            time.sleep(wait)
+            return
+        readable, _, _ = select.select([self._fd], [], [], wait)
+        if readable:
+            self._read()
+        self._tick()
+
+    def _read(self):
+        """Read what the PTY has and run prompt detection on it."""
+        runner = self.runner
+        try:
+            data = os.read(self._fd, 65536)
+        except BlockingIOError:
+            return
+        except OSError as exc:
+            if exc.errno != errno.EIO:
+                raise
+            data = b""
+        runner.metrics.reads += 1
+        if not data:
+            self._eof = True
+            return
+
+        termios_changed = False
+        if self._packet:
+            status, data = _split_packet(data)
+            termios_changed = runner._packet_event(status, self._fd, None)
+        if data:
+            self._output(data)
+            self._buf = runner._ingest(self._buf, data)
+        if termios_changed or not runner._animating():
+            self._respond()
+
+    def _tick(self):
+        """Re-check the buffer and pending answers; runs on every step."""
+        runner = self.runner
+        if self._buf and not runner._animating():
+            self._respond()
+        if runner._pending is not None:
+            runner._confirm_unix(self._buf, self._fd, None, self._slave)
+        runner._track_queued(self._slave)
+        runner._check_breaker(None, self.pid)
+        if runner.idle_timeout or runner.max_runtime:
+            runner._watch(None, self.pid, self._fd, self._buf)
+
+    def _respond(self):
+        if not self._buf:
+            return
+        answered = self.runner._maybe_respond_unix(self._buf, self._fd, None)
+        if answered is None:
+            return
+        result, fingerprint = answered
+        response = result.suggested_response
+        if response is None:
+            response = self.runner.response
+        prompt = fingerprint[0].decode("utf-8", errors="replace")
+        self._events.append(Event(result.pattern, response, prompt, time.time()))
+        self._buf = b""
+
+    def _output(self, data):
+        self._chunks.append(data)
+        self._chunk_bytes += len(data)
+        while self._chunk_bytes > OUTPUT_LIMIT and len(self._chunks) > 1:
+            self._chunk_bytes -= len(self._chunks.popleft())
+        self._text += self._decoder.decode(data)
+        if len(self._text) > SEARCH_WINDOW:
+            self._text = self._text[-SEARCH_WINDOW:]
+
+    def _reaped(self):
+        if self.exitstatus is None:
+            self.exitstatus = self.runner._reap_child(self.pid)
+        return self.exitstatus is not None
+
+
+def pump(sessions, timeout=_TICK):
+    """Run one I/O step for every session in *sessions*.
+
+    Waits up to *timeout* seconds for any of them to produce output, using
+    one ``selectors`` poller for all of them, and returns the sessions that
+    did.  Pending answers of every session are re-checked on each call, so
+    call it in a loop to keep a fleet of sessions moving.
+    """
+    selector = selectors.DefaultSelector()
+    with selector:
+        live = []
+        for session in sessions:
+            if session.closed or session.eof:
+                continue
+            selector.register(session.fileno(), selectors.EVENT_READ, session)
+            live.append(session)
+        ready = []
+        if live:
+            for key, _ in selector.select(timeout):
+                key.data._read()
+                ready.append(key.data)
+        for session in live:
+            session._tick()
+    return ready
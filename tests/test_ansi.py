@@ -1,6 +1,14 @@
 """Tests for auto_yes._ansi module."""
 
-from auto_yes._ansi import clean_text, strip_ansi, strip_control
+from auto_yes._ansi import (
+    CursorTracker,
+    clean_text,
+    compact_cr,
+    strip_ansi,
+    strip_control,
+    tail_bytes,
+    tail_text,
+)
 
 
 class TestStripAnsi:
@@ -47,3 +55,144 @@ class TestCleanText:
     def test_multiline_preserved(self):
         raw = "line 1\nline 2\nline 3"
         assert clean_text(raw) == "line 1\nline 2\nline 3"
+
+    def test_crlf_line_ending_keeps_line(self):
+        raw = "done\r\nnext line\r\n"
+        assert clean_text(raw) == "done\nnext line\n"
+
+
+class TestTailText:
+    def test_last_line_only(self):
+        assert tail_text(b"first\r\nsecond\r\nContinue? [y/n] ") == "Continue? [y/n]"
+
+    def test_skips_trailing_blank_lines(self):
+        assert tail_text(b"Continue? [y/n]\r\n\r\n   \r\n") == "Continue? [y/n]"
+
+    def test_skips_escape_only_lines(self):
+        assert tail_text(b"Proceed?\r\n\x1b[0m\x1b[?25h") == "Proceed?"
+
+    def test_multiple_lines_oldest_first(self):
+        assert tail_text(b"a\nb\n\nc\n", lines=3) == "b\n\nc"
+
+    def test_fewer_lines_than_requested(self):
+        assert tail_text(b"only\n", lines=4) == "only"
+
+    def test_carriage_return_overwrite(self):
+        buf = b"\r".join(b"%d%%" % i for i in range(100)) + b"\rDone? [y/n]"
+        assert tail_text(buf) == "Done? [y/n]"
+
+    def test_escape_after_carriage_return_is_trailing(self):
+        assert tail_text(b"ready\r\x1b[K") == "ready"
+
+    def test_incomplete_utf8_at_end_dropped(self):
+        assert tail_text("\u276f 1. Yes".encode() + "\u276f".encode()[:2]) == "\u276f 1. Yes"
+
+    def test_orphaned_continuation_bytes_at_start_dropped(self):
+        assert tail_text("\u276f 1. Yes".encode()[1:]) == " 1. Yes"
+
+    def test_matches_full_clean(self):
+        buf = b"\x1b[1mOK\x1b[0m\r\nwork\rdone\r\n\x1b]0;title\x07Next? (y/n)"
+        expected = clean_text(buf.decode()).rstrip().split("\n")[-2:]
+        assert tail_text(buf, lines=2) == "\n".join(expected)
+
+    def test_bytearray_input(self):
+        assert tail_text(bytearray(b"x\nAre you sure?")) == "Are you sure?"
+
+    def test_empty_buffer(self):
+        assert tail_text(b"") == ""
+
+
+class TestTailBytes:
+    def test_returns_clean_bytes(self):
+        buf = b"log\r\n\x1b[1mContinue? [y/n]\x1b[0m "
+        assert tail_bytes(buf) == b"Continue? [y/n]"
+
+    def test_matches_tail_text(self):
+        buf = "\u2502 \u276f 1. Yes\r\n\u2570\u2500\u256f\r\n".encode()
+        assert tail_bytes(buf, lines=2).decode() == tail_text(buf, lines=2)
+
+
+class TestCompactCr:
+    def test_keeps_latest_complete_frame(self):
+        assert compact_cr(b"10%\r20%\r30%") == (b"20%\r30%", 1)
+
+    def test_closed_line_keeps_last_visible_segment(self):
+        assert compact_cr(b"a\nx\r\x1b[2K\ry\r\n") == (b"a\ny\r\n", 1)
+
+    def test_no_carriage_return_is_untouched(self):
+        buf = b"plain output\nmore"
+        result, overwrites = compact_cr(buf)
+        assert result is buf
+        assert overwrites == 0
+
+    def test_trailing_cr_is_not_an_overwrite(self):
+        assert compact_cr(b"done\r\n") == (b"done\r\n", 0)
+
+    def test_only_scans_from_start_line(self):
+        buf = b"1%\r2%\n3%\r4%\r5%"
+        assert compact_cr(buf, len(buf) - 3) == (b"1%\r2%\n4%\r5%", 1)
+
+    def test_clear_line_frame_falls_back(self):
+        # an erase-only frame is invisible: the previous frame stays visible
+        result, _ = compact_cr(b"50%\r60%\r\x1b[2K")
+        assert tail_text(result) == "60%"
+
+    def test_keeps_bytearray(self):
+        result, _ = compact_cr(bytearray(b"1\r2\r3"))
+        assert result == bytearray(b"2\r3")
+        assert isinstance(result, bytearray)
+
+    def test_incremental_tail_matches_full_buffer(self):
+        stream = (
+            b"Downloading \x1b[32m10%\x1b[0m\r"
+            b"Downloading \x1b[32m55%\x1b[0m\r\x1b[2K"
+            b"Downloading \xe2\x94\x82 100%\r\n"
+            b"Continue? [y/n] "
+        )
+        buf = b""
+        for i in range(0, len(stream), 3):
+            buf, _ = compact_cr(buf + stream[i : i + 3], len(buf))
+            seen = stream[: i + 3]
+            assert tail_text(buf, 2) == tail_text(seen, 2)
+
+
+class TestCursorTracker:
+    def test_newlines_move_down(self):
+        cursor = CursorTracker(rows=10)
+        cursor.feed(b"a\nb\nc")
+        assert cursor.row == 3
+        assert cursor.position == 3
+
+    def test_bottom_row_scrolls(self):
+        cursor = CursorTracker(rows=3)
+        cursor.feed(b"\n" * 5)
+        assert (cursor.row, cursor.scrolled) == (3, 3)
+        assert cursor.position == 6
+
+    def test_redraw_in_place_keeps_position(self):
+        cursor = CursorTracker(rows=24)
+        cursor.feed(b"menu\n  1. Yes\n  2. No")
+        before = cursor.position
+        cursor.feed(b"\x1b[2A\rmenu\n  1. Yes\n  2. No")
+        assert cursor.position == before
+
+    def test_absolute_moves(self):
+        cursor = CursorTracker(rows=24)
+        cursor.feed(b"\x1b[10;1H")
+        assert cursor.row == 10
+        cursor.feed(b"\x1b[H")
+        assert cursor.row == 1
+        cursor.feed(b"\x1b[5d\x1b[2B")
+        assert cursor.row == 7
+
+    def test_moves_are_clamped(self):
+        cursor = CursorTracker(rows=5)
+        cursor.feed(b"\x1b[9A")
+        assert cursor.row == 1
+        cursor.feed(b"\x1b[99E")
+        assert cursor.row == 5
+
+    def test_private_sequences_ignored(self):
+        cursor = CursorTracker(rows=5)
+        cursor.feed(b"\x1b[?25h\x1b[?1049h\x1b[31m")
+        assert cursor.row == 1
@@ -0,0 +1,71 @@
+"""Tests for auto_yes._breaker module."""
+
+import pytest
+
+from auto_yes._breaker import Breaker
+
+
+class TestRepeats:
+    def test_same_prompt_is_paused(self):
+        breaker = Breaker(max_responses=0, max_repeats=3, window=10)
+        for now in (0, 1, 2):
+            assert breaker.allows(b"again?", now=now)
+            breaker.record(b"again?", now=now)
+        assert not breaker.allows(b"again?", now=3)
+        assert breaker.allows(b"other?", now=3)
+        (trip,) = breaker.take_trips()
+        assert "answered 3 times" in trip.reason
+        assert not trip.session
+        assert not trip.kill
+        assert breaker.take_trips() == []
+        assert breaker.stats(now=3) == {"trips": 1, "paused": 1, "session_paused": False}
+
+    def test_pause_ends_after_the_window(self):
+        breaker = Breaker(max_responses=0, max_repeats=2, window=10)
+        breaker.record(b"again?", now=0)
+        breaker.record(b"again?", now=1)
+        assert not breaker.allows(b"again?", now=10.5)
+        assert breaker.allows(b"again?", now=11.5)
+        # counting starts afresh
+        breaker.record(b"again?", now=12)
+        assert breaker.allows(b"again?", now=12)
+        assert breaker.stats(now=12)["paused"] == 0
+
+    def test_old_answers_leave_the_window(self):
+        breaker = Breaker(max_responses=0, max_repeats=3, window=10)
+        for now in (0, 6, 12, 18):
+            breaker.record(b"again?", now=now)
+        assert breaker.trips == 0
+
+
+class TestRate:
+    def test_too_many_answers_pause_the_session(self):
+        breaker = Breaker(max_responses=4, max_repeats=0, window=10)
+        for index in range(4):
+            breaker.record(f"prompt {index}".encode(), now=index)
+        assert not breaker.allows(now=5)
+        assert not breaker.allows(b"new prompt", now=5)
+        (trip,) = breaker.take_trips()
+        assert trip.session
+        assert breaker.stats(now=5)["session_paused"]
+        assert breaker.allows(b"new prompt", now=14)
+
+    def test_pause_all_and_kill_pause_the_session(self):
+        for action in ("pause-all", "kill"):
+            breaker = Breaker(max_responses=0, max_repeats=2, window=10, action=action)
+            breaker.record(b"again?", now=0)
+            breaker.record(b"again?", now=1)
+            assert not breaker.allows(b"other?", now=2)
+            (trip,) = breaker.take_trips()
+            assert trip.session
+            assert trip.kill == (action == "kill")
+
+    def test_limits_can_be_turned_off(self):
+        breaker = Breaker(max_responses=0, max_repeats=0)
+        for now in range(100):
+            breaker.record(b"again?", now=now / 100)
+        assert breaker.trips == 0
+
+    def test_unknown_action(self):
+        with pytest.raises(ValueError, match="unknown storm action"):
+            Breaker(action="explode")
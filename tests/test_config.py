@@ -2,6 +2,8 @@
 
 import tempfile
 
+import pytest
+
 import auto_yes.config as cfg
 
 
@@ -28,7 +30,7 @@ class TestConfig:
     def test_load_defaults_when_no_file(self):
         c = cfg.load()
         assert c["response"] == "y"
-        assert c["cooldown"] == 0.5
+        assert c["cooldown"] == 0.1
         assert c["custom_patterns"] == []
 
     def test_save_and_reload(self):
@@ -52,6 +54,20 @@ class TestConfig:
         c = cfg.load()
         assert c["custom_patterns"].count("dup") == 1
 
+    def test_add_pattern_rejects_catastrophic(self):
+        with pytest.raises(ValueError, match="nested quantifier"):
+            cfg.add_pattern(r"(a+)+\?")
+        assert r"(a+)+\?" not in cfg.load()["custom_patterns"]
+
+    def test_add_pattern_warns_on_delimited_nesting(self):
+        with pytest.warns(RuntimeWarning, match="nested quantifier"):
+            cfg.add_pattern(r"(\d+\.)+\d+\?")
+        assert r"(\d+\.)+\d+\?" in cfg.load()["custom_patterns"]
+
+    def test_add_pattern_rejects_invalid(self):
+        with pytest.raises(ValueError, match="invalid regex"):
+            cfg.add_pattern(r"[unclosed")
+
     def test_remove_pattern(self):
         cfg.add_pattern("gone")
         cfg.remove_pattern("gone")
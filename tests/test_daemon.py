@@ -0,0 +1,132 @@
+"""Tests for auto_yes._daemon module (Unix only)."""
+
+import os
+import socket
+import sys
+import threading
+
+import pytest
+
+from auto_yes import _daemon
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="needs Unix sockets")
+
+
+@pytest.fixture
+def daemon(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    server = _daemon.Daemon(_daemon.socket_path())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    _daemon.stop()
+    thread.join(timeout=5)
+
+
+class TestWireFormat:
+    def test_message_and_fds_round_trip(self):
+        left, right = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        read_fd, write_fd = os.pipe()
+        try:
+            message = {"op": "spawn", "env": {"X": "y" * 200000}}
+            sender = threading.Thread(target=_daemon._send, args=(left, message, [write_fd]))
+            sender.start()
+            received, fds = _daemon._receive(right)
+            sender.join()
+            assert received == message
+            assert len(fds) == 1
+            os.write(fds[0], b"through the passed fd")
+            os.close(fds[0])
+            assert os.read(read_fd, 64) == b"through the passed fd"
+        finally:
+            for fd in (read_fd, write_fd):
+                os.close(fd)
+            left.close()
+            right.close()
+
+
+class TestDaemon:
+    def test_not_running(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+        assert _daemon.ping() is None
+        assert _daemon.stop() is False
+        assert _daemon.spawn(["true"], {}) is None
+
+    def test_ping_and_stop(self, daemon):
+        info = _daemon.ping()
+        assert info["pid"] == os.getpid()
+        assert info["sessions"] == 0
+        assert _daemon.stop() is True
+        assert _daemon.ping() is None
+
+    def test_second_daemon_is_refused(self, daemon):
+        with pytest.raises(OSError):
+            _daemon.Daemon(_daemon.socket_path())
+
+    def test_session_runs_the_command(self, daemon, capfd):
+        kwargs = {"categories": ["generic"]}
+        code, stats = _daemon.spawn(["sh", "-c", "echo from-session; exit 3"], kwargs)
+        assert code == 3
+        assert stats["responses"] == 0
+        assert "from-session" in capfd.readouterr().out
+        info = _daemon.ping()
+        assert info["sessions"] == 1
+        assert info["detectors"] == 1
+
+    def test_open_socket_directory_is_refused(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+        directory = tmp_path / "auto-yes"
+        directory.mkdir()
+        os.chmod(directory, 0o777)
+        with pytest.raises(OSError, match="other users"):
+            _daemon.Daemon(_daemon.socket_path())
+
+    def test_client_ignores_a_foreign_daemon(self, daemon, monkeypatch):
+        monkeypatch.setattr(_daemon, "_peer_uid", lambda sock: os.getuid() + 1)
+        assert _daemon.ping() is None
+        assert _daemon.spawn(["true"], {}) is None
+        monkeypatch.setattr(_daemon, "_peer_uid", lambda sock: os.getuid())
+
+    def test_daemon_drops_a_foreign_client(self, daemon, monkeypatch):
+        # only the daemon's end of a connection has a bound name
+        def peer_uid(sock):
+            if sock.getsockname():
+                return os.getuid() + 1
+            return os.getuid()
+
+        monkeypatch.setattr(_daemon, "_peer_uid", peer_uid)
+        assert _daemon.ping() is None
+        monkeypatch.setattr(_daemon, "_peer_uid", lambda sock: os.getuid())
+        assert _daemon.ping()["sessions"] == 0
+
+    def test_peer_uid_of_own_socket(self):
+        left, right = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        with left, right:
+            assert _daemon._peer_uid(left) in (None, os.getuid())
+
+    def test_detector_is_compiled_once(self, daemon):
+        kwargs = {"categories": ["claude"], "max_line_chars": 512}
+        first = daemon._detector(kwargs)
+        assert daemon._detector(dict(kwargs, response="n")) is first
+        assert daemon._detector(dict(kwargs, categories=["codex"])) is not first
+
+    def test_unsafe_pattern_is_reported(self, daemon):
+        with pytest.raises(ValueError, match="unsafe pattern"):
+            _daemon.spawn(["true"], {"extra_patterns": ["(a+)+$"]})
+
+    def test_audit_warnings_are_passed_on(self, daemon, capfd):
+        found = []
+        code, _ = _daemon.spawn(
+            ["true"], {"extra_patterns": [".*foo.*bar"]}, on_warning=found.append
+        )
+        assert code == 0
+        assert len(found) == 1
+        assert "ambiguous" in found[0]
+
+
+class TestEnabled:
+    def test_needs_the_environment_variable(self, monkeypatch):
+        monkeypatch.delenv(_daemon.ENV_VAR, raising=False)
+        assert not _daemon.enabled()
+        monkeypatch.setenv(_daemon.ENV_VAR, "1")
+        assert _daemon.enabled() == (sys.platform != "win32")
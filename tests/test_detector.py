@@ -1,6 +1,7 @@
 """Tests for auto_yes.detector module."""
 
 from auto_yes.detector import PromptDetector  # noqa: I001
+from auto_yes.patterns import REGISTRY
 
 
 # ==================================================================
@@ -299,6 +300,21 @@ class TestGeminiPatterns:
     def test_always_allow(self):
         assert self.det.detect("│ ● 3. Always allow") is not None
 
+    def test_menu_above_box_border(self):
+        text = (
+            "│ Allow execution of: 'ls'?           │\r\n"
+            "│                                     │\r\n"
+            "│ ● 1. Yes, allow once                │\r\n"
+            "│   2. Yes, allow always              │\r\n"
+            "│   3. No, suggest changes (esc)      │\r\n"
+            "╰─────────────────────────────────────╯"
+        )
+        assert self.det.detect(text) is not None
+
+    def test_menu_scrolled_out_of_window(self):
+        text = "│ ● 1. Yes, allow once │\n" + "log line\n" * 6 + "done"
+        assert self.det.detect(text) is None
+
 
 class TestCodexPatterns:
     def setup_method(self):
@@ -359,6 +375,15 @@ class TestCopilotPatterns:
     def test_allow_copilot(self):
         assert self.det.detect("Allow Copilot to run this command?") is not None
 
+    def test_yes_proceed_above_box_border(self):
+        text = (
+            "│ Do you want to run this command?\r\n"
+            "│ \u276f 1. Yes, proceed\r\n"
+            "│   2. No, and tell Copilot what to do differently\r\n"
+            "╰──────────────────────────────────────╯"
+        )
+        assert self.det.detect(text) is not None
+
 
 class TestAiderPatterns:
     def setup_method(self):
@@ -451,6 +476,61 @@ class TestLoadAll:
             assert len(entry["patterns"]) > 0, f"category '{name}' has no patterns"
 
 
+class TestPatternSetOptimizer:
+    def test_case_variants_are_merged(self):
+        det = PromptDetector()
+        assert r"\[y/n\]" in det.pattern_strings
+        assert r"\[Y/N\]" not in det.pattern_strings
+        assert (r"\[Y/N\]", r"\[y/n\]") in det.redundant
+
+    def test_merged_variants_still_match(self):
+        det = PromptDetector()
+        for line in ("Continue? [Y/N]", "Continue? [y/N]", "Overwrite? [Yes/No]"):
+            assert det.detect(line) is not None
+
+    def test_optimize_off_keeps_everything(self):
+        det = PromptDetector(optimize=False)
+        assert r"\[Y/N\]" in det.pattern_strings
+        assert det.redundant == []
+
+    def test_subsumed_pattern_is_dropped(self):
+        det = PromptDetector(categories=["claude", "codex"])
+        assert r">\s*1\.\s*Yes,?\s+allow Codex to work" not in det.pattern_strings
+        assert det.detect("> 1. Yes, allow Codex to work") is not None
+
+    def test_different_response_is_kept(self):
+        det = PromptDetector(categories=[])
+        det._load(
+            [(r"Really proceed\?", "n"), (r"Proceed\?", None), (r"Proceed\?\s*$", "y")], "generic"
+        )
+        assert len(det.pattern_strings) == 3
+        assert det.redundant == []
+
+    def test_load_category_skips_covered_patterns(self):
+        det = PromptDetector(categories=["claude"])
+        det.load_category("codex")
+        assert r">\s*1\.\s*Yes,?\s+allow Codex to work" not in det.pattern_strings
+        assert r">\s*1\.\s*Approve and run now" in det.pattern_strings
+
+    def test_optimized_set_agrees_with_full_set(self):
+        from auto_yes.patterns import REGISTRY
+
+        fast = PromptDetector(categories=list(REGISTRY))
+        full = PromptDetector(categories=list(REGISTRY), optimize=False)
+        lines = (
+            "Proceed? (Y/n)",
+            "[Y]es / [n]o",
+            "> 1. Yes, allow Codex to work",
+            "Overwrite? [YES/NO]",
+            "downloading...",
+        )
+        for line in lines:
+            got, expected = fast.detect(line), full.detect(line)
+            assert (got is None) == (expected is None), line
+            if got is not None:
+                assert got.suggested_response == expected.suggested_response
+
+
 # ==================================================================
 # custom patterns & runtime mutation
 # ==================================================================
@@ -473,11 +553,245 @@ class TestCustomPatterns:
         det.load_category("claude")
         assert det.detect("> 1. Yes, I trust this folder") is not None
 
+    def test_add_windowed_pattern(self):
+        det = PromptDetector()
+        text = "Pick one:\n  > first\n    second"
+        assert det.detect(text) is None
+        det.add_pattern(r"^\s*>\s*first$", window=3)
+        assert det.window == 3
+        assert det.detect(text) is not None
+
+    def test_multiline_regex_in_window(self):
+        det = PromptDetector(categories=[])
+        det.add_pattern(r"Select an option:\n\s*1\.", window=2)
+        assert det.detect("Select an option:\n  1. Apply\n") is not None
+        assert det.detect("Select an option:\nnone left\n") is None
+
+    def test_catastrophic_extra_pattern_rejected(self):
+        import pytest
+
+        with pytest.raises(ValueError, match="nested quantifier"):
+            PromptDetector(extra_patterns=[r"(\w+\s?)+\?"])
+
+    def test_slow_extra_pattern_warns(self):
+        import pytest
+
+        with pytest.warns(RuntimeWarning, match="ambiguous chain"):
+            det = PromptDetector(extra_patterns=[r"ok.*=.*\?"])
+        assert det.detect("ok = fine?") is not None
+
+    def test_add_pattern_is_audited(self):
+        import pytest
+
+        det = PromptDetector()
+        with pytest.raises(ValueError):
+            det.add_pattern(r"(?:x*)*y")
+
+    def test_long_line_is_truncated(self):
+        det = PromptDetector(max_line_chars=64)
+        assert det.detect("=" * 200 + " Continue? [y/n]") is not None
+        assert det.detect("Overwrite? [y/n]" + "=" * 100) is None
+        assert det.detect_tail(b"Overwrite? [y/n]" + b"=" * 100) is None
+
     def test_pattern_strings_includes_custom(self):
         det = PromptDetector(extra_patterns=[r"my_pat"])
         assert r"my_pat" in det.pattern_strings
 
 
+class TestMemo:
+    def test_repeat_check_is_a_hit(self):
+        det = PromptDetector()
+        first = det.detect_tail(b"Continue? [y/n]")
+        assert det.detect_tail(b"Continue? [y/n]") is first
+        stats = det.stats()
+        assert (stats["cache_hits"], stats["cache_misses"]) == (1, 1)
+        assert stats["cache_hit_rate"] == 0.5
+
+    def test_negative_result_is_cached(self):
+        det = PromptDetector()
+        for _ in range(5):
+            assert det.detect("compiling...") is None
+        assert det.stats()["cache_misses"] == 1
+
+    def test_add_pattern_invalidates(self):
+        det = PromptDetector()
+        assert det.detect_tail(b"do_thing?") is None
+        det.add_pattern(r"do_thing\?")
+        assert det.detect_tail(b"do_thing?") is not None
+
+    def test_load_category_invalidates(self):
+        det = PromptDetector()
+        assert det.detect("> 1. Yes, I trust this folder") is None
+        det.load_category("claude")
+        assert det.detect("> 1. Yes, I trust this folder") is not None
+
+    def test_memo_is_bounded(self):
+        det = PromptDetector(cache_size=4)
+        for i in range(10):
+            det.detect_tail(f"line {i}".encode())
+        assert det.stats()["cache_entries"] == 4
+
+    def test_least_recent_is_evicted(self):
+        det = PromptDetector(cache_size=2)
+        det.detect_tail(b"a")
+        det.detect_tail(b"b")
+        det.detect_tail(b"a")
+        det.detect_tail(b"c")
+        det.detect_tail(b"a")
+        assert det.stats()["cache_hits"] == 2
+
+    def test_cache_disabled(self):
+        det = PromptDetector(cache_size=0)
+        det.detect_tail(b"Continue? [y/n]")
+        det.detect_tail(b"Continue? [y/n]")
+        assert det.stats()["cache_hits"] == 0
+        assert det.stats()["cache_entries"] == 0
+
+    def test_bytearray_tail(self):
+        det = PromptDetector()
+        assert det.detect_tail(bytearray(b"Continue? [y/n]")) is not None
+
+
+class TestFocus:
+    def setup_method(self):
+        self.det = PromptDetector(categories=list(REGISTRY), extra_patterns=[r"deploy now\?"])
+
+    def test_other_profile_is_ignored(self):
+        self.det.focus(["codex", "generic"])
+        assert self.det.detect("Do you want to use this API key?") is None
+
+    def test_own_profile_and_generic_match(self):
+        self.det.focus(["claude", "generic"])
+        assert self.det.detect("Do you want to use this API key?") is not None
+        assert self.det.detect("Continue? [y/n]") is not None
+
+    def test_pattern_kept_for_another_category(self):
+        # codex's "> 1. Yes, allow Codex" is subsumed by claude's "> 1. Yes"
+        self.det.focus(["codex"])
+        assert self.det.detect("> 1. Yes, allow Codex to work") is not None
+
+    def test_user_patterns_stay_active(self):
+        self.det.focus(["codex"])
+        assert self.det.detect("deploy now?") is not None
+
+    def test_none_restores_everything(self):
+        self.det.focus(["codex"])
+        self.det.focus(None)
+        assert self.det.detect("Do you want to use this API key?") is not None
+        assert self.det.active_pattern_strings == self.det.pattern_strings
+
+    def test_focus_invalidates_memo(self):
+        assert self.det.detect("Do you want to use this API key?") is not None
+        self.det.focus(["codex"])
+        assert self.det.detect("Do you want to use this API key?") is None
+
+    def test_same_as_single_profile(self):
+        single = PromptDetector(categories=["claude", "generic"])
+        self.det.focus(["claude", "generic"])
+        active = set(self.det.active_pattern_strings)
+        assert active - {r"deploy now\?"} == set(single.pattern_strings)
+
+
+class TestNarrowing:
+    CODEX = "> 1. Approve and run now"
+    CLAUDE = "Do you want to use this API key?"
+
+    def _detector(self, **kwargs):
+        return PromptDetector(categories=["generic", "claude", "codex"], **kwargs)
+
+    def _confirm(self, det, text, times):
+        for _ in range(times):
+            det.confirm(det.detect(text))
+
+    def test_narrows_after_consistent_hits(self):
+        det = self._detector(narrow_after=2, full_check_interval=60)
+        self._confirm(det, self.CODEX, 1)
+        assert det.narrowed is None
+        self._confirm(det, self.CODEX, 1)
+        assert det.narrowed == ["codex", "generic"]
+        assert det.detect(self.CLAUDE) is None
+        assert det.detect("Continue? [y/n]") is not None
+
+    def test_other_category_resets_streak(self):
+        det = self._detector(narrow_after=2)
+        self._confirm(det, self.CODEX, 1)
+        self._confirm(det, self.CLAUDE, 1)
+        assert det.narrowed is None
+        self._confirm(det, self.CLAUDE, 1)
+        assert det.narrowed == ["claude", "generic"]
+
+    def test_generic_hits_do_not_count(self):
+        det = self._detector(narrow_after=1)
+        self._confirm(det, "Continue? [y/n]", 3)
+        assert det.narrowed is None
+
+    def test_single_profile_is_not_narrowed(self):
+        det = PromptDetector(categories=["generic", "codex"], narrow_after=1)
+        self._confirm(det, self.CODEX, 1)
+        assert det.narrowed is None
+
+    def test_disabled(self):
+        det = self._detector(narrow_after=0)
+        self._confirm(det, self.CODEX, 5)
+        assert det.narrowed is None
+
+    def test_full_check_widens(self):
+        det = self._detector(narrow_after=1, full_check_interval=0)
+        self._confirm(det, self.CODEX, 1)
+        assert det.narrowed == ["codex", "generic"]
+        assert det.detect(self.CLAUDE) is not None
+        assert det.narrowed is None
+        stats = det.stats()
+        assert (stats["full_checks"], stats["widened"]) == (1, 1)
+
+    def test_full_check_keeps_narrowing(self):
+        det = self._detector(narrow_after=1, full_check_interval=0)
+        self._confirm(det, self.CODEX, 1)
+        assert det.detect("compiling...") is None
+        assert det.detect(self.CODEX) is not None
+        assert det.narrowed == ["codex", "generic"]
+
+    def test_focus_resets(self):
+        det = self._detector(narrow_after=1)
+        self._confirm(det, self.CODEX, 1)
+        det.focus(["claude", "codex", "generic"])
+        assert det.narrowed is None
+
+
+class TestDetectTail:
+    def test_ascii_bytes_tail(self):
+        det = PromptDetector()
+        result = det.detect_tail(b"Continue? [y/n]")
+        assert result is not None
+        assert result.pattern == r"\[y/n\]"
+
+    def test_non_ascii_bytes_tail(self):
+        det = PromptDetector(categories=["copilot"])
+        assert det.detect_tail("\u276f 1. Yes, proceed".encode()) is not None
+
+    def test_str_tail(self):
+        det = PromptDetector()
+        assert det.detect_tail("Are you sure?") is not None
+
+    def test_blank_tail(self):
+        det = PromptDetector()
+        assert det.detect_tail(b"") is None
+        assert det.detect_tail(b"   ") is None
+
+    def test_windowed_bytes_tail(self):
+        det = PromptDetector(categories=["gemini"])
+        tail = "\u2502 \u25cf 1. Allow once\n\u2502   2. No\n\u2570\u2500\u256f".encode()
+        assert det.detect_tail(tail) is not None
+
+    def test_bytes_and_text_paths_agree(self):
+        from auto_yes.patterns import REGISTRY
+
+        fast = PromptDetector(categories=list(REGISTRY))
+        slow = PromptDetector(categories=list(REGISTRY), byte_patterns=False)
+        for line in ("Proceed? (y/N)", "> 1. Approve and run now", "building...", "Ok?"):
+            assert fast.detect_tail(line.encode()) == slow.detect_tail(line)
+
+
 class TestAnsiInPrompt:
     def test_colored_prompt_detected(self):
         det = PromptDetector()
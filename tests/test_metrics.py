@@ -0,0 +1,123 @@
+"""Tests for auto_yes._metrics module."""
+
+import os
+import socket
+import sys
+
+import pytest
+
+from auto_yes._metrics import Metrics, SocketExporter, TextfileExporter
+
+
+def _samples(text):
+    """Parse exposition *text* into ``{series: value}``."""
+    found = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            series, value = line.rsplit(" ", 1)
+            found[series] = float(value)
+    return found
+
+
+class TestMetrics:
+    def test_counters(self):
+        metrics = Metrics()
+        metrics.bytes_in += 100
+        metrics.reads += 2
+        samples = _samples(metrics.render())
+        assert samples["auto_yes_bytes_in_total"] == 100
+        assert samples["auto_yes_reads_total"] == 2
+        assert samples["auto_yes_responses_total"] == 0
+
+    def test_every_series_is_typed(self):
+        text = Metrics().render()
+        for line in text.splitlines():
+            if not line.startswith("#"):
+                name = line.split("{")[0].split(" ")[0]
+                family = name.removesuffix("_bucket").removesuffix("_sum").removesuffix("_count")
+                assert f"# TYPE {family} " in text
+
+    def test_latency_histogram_is_cumulative(self):
+        metrics = Metrics()
+        for seconds in (0.0005, 0.003, 0.003, 0.2, 10.0):
+            metrics.observe_latency(seconds)
+        samples = _samples(metrics.render())
+        assert samples['auto_yes_response_latency_seconds_bucket{le="0.001"}'] == 1
+        assert samples['auto_yes_response_latency_seconds_bucket{le="0.005"}'] == 3
+        assert samples['auto_yes_response_latency_seconds_bucket{le="0.25"}'] == 4
+        assert samples['auto_yes_response_latency_seconds_bucket{le="2.5"}'] == 4
+        assert samples['auto_yes_response_latency_seconds_bucket{le="+Inf"}'] == 5
+        assert samples["auto_yes_response_latency_seconds_count"] == 5
+        assert samples["auto_yes_response_latency_seconds_sum"] == pytest.approx(10.2065)
+
+    def test_pattern_labels_are_escaped(self):
+        metrics = Metrics()
+        metrics.hit(r'\[y/N\] "now"')
+        metrics.hit(r'\[y/N\] "now"')
+        samples = _samples(metrics.render({"pid": 42}))
+        key = 'auto_yes_pattern_responses_total{pid="42",pattern="\\\\[y/N\\\\] \\"now\\""}'
+        assert samples[key] == 2
+
+    def test_labels_apply_to_every_sample(self):
+        text = Metrics().render({"pid": 7})
+        for line in text.splitlines():
+            if not line.startswith("#"):
+                assert 'pid="7"' in line
+
+
+class TestTextfileExporter:
+    def test_written_atomically_and_on_close(self, tmp_path):
+        path = tmp_path / "auto-yes.prom"
+        metrics = Metrics()
+        exporter = TextfileExporter(str(path), metrics, interval=60)
+        metrics.responses += 3
+        exporter.close()
+        assert _samples(path.read_text())["auto_yes_responses_total"] == 3
+        assert os.listdir(tmp_path) == ["auto-yes.prom"]
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="needs Unix sockets")
+class TestSocketExporter:
+    def _fetch(self, path, request=b""):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(2.0)
+            client.connect(path)
+            if request:
+                client.sendall(request)
+            chunks = []
+            while True:
+                chunk = client.recv(65536)
+                if not chunk:
+                    return b"".join(chunks)
+                chunks.append(chunk)
+
+    def test_plain_and_http(self, tmp_path):
+        path = str(tmp_path / "metrics.sock")
+        metrics = Metrics()
+        metrics.wakeups += 5
+        exporter = SocketExporter(path, metrics)
+        try:
+            body = self._fetch(path).decode()
+            assert _samples(body)["auto_yes_wakeups_total"] == 5
+            reply = self._fetch(path, b"GET /metrics HTTP/1.1\r\n\r\n").decode()
+            head, body = reply.split("\r\n\r\n", 1)
+            assert head.startswith("HTTP/1.0 200 OK")
+            assert _samples(body)["auto_yes_wakeups_total"] == 5
+        finally:
+            exporter.close()
+        assert not os.path.exists(path)
+
+    def test_stale_socket_is_replaced(self, tmp_path):
+        path = str(tmp_path / "metrics.sock")
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(path)
+        stale.close()
+        exporter = SocketExporter(path, Metrics())
+        exporter.close()
+
+    def test_regular_file_is_left_alone(self, tmp_path):
+        path = tmp_path / "notes.txt"
+        path.write_text("keep me")
+        with pytest.raises(OSError):
+            SocketExporter(str(path), Metrics())
+        assert path.read_text() == "keep me"
@@ -5,6 +5,7 @@ from auto_yes.patterns import (
     REGISTRY,
     available_categories,
     get_patterns,
+    unpack_entry,
 )
 
 
@@ -33,10 +34,11 @@ class TestRegistry:
         for name, entry in REGISTRY.items():
             for item in entry["patterns"]:
                 assert isinstance(item, tuple), f"{name}: not a tuple"
-                assert len(item) == 2, f"{name}: expected 2-tuple"
-                src, resp = item
+                assert len(item) in (2, 3), f"{name}: expected 2- or 3-tuple"
+                src, resp, window = unpack_entry(item)
                 assert isinstance(src, str)
                 assert resp is None or isinstance(resp, str)
+                assert isinstance(window, int) and window >= 1
 
 
 class TestGetPatterns:
@@ -72,3 +74,11 @@ class TestAvailableCategories:
     def test_contains_generic(self):
         names = [name for name, _ in available_categories()]
         assert "generic" in names
+
+
+class TestUnpackEntry:
+    def test_two_tuple_defaults_to_last_line(self):
+        assert unpack_entry((r"abc", None)) == (r"abc", None, 1)
+
+    def test_three_tuple_keeps_window(self):
+        assert unpack_entry((r"abc", "yes", 4)) == (r"abc", "yes", 4)
@@ -0,0 +1,164 @@
+"""Micro-benchmarks for the hot paths of _ansi and PromptDetector.
+
+Opt-in: the default run deselects them, ``pytest -m perf`` runs them.
+Each case is timed as the best of several rounds and divided by the time
+of a fixed reference workload, so the numbers carry over between
+machines.  It fails when it is more than ``AUTO_YES_PERF_TOLERANCE``
+(default 2.0) times its entry in ``perf_baseline.json``.
+``AUTO_YES_PERF_UPDATE=1 pytest -m perf`` rewrites the baseline.
+"""
+
+import json
+import os
+import re
+import time
+
+import pytest
+
+from auto_yes._ansi import clean_text, strip_ansi, strip_control
+from auto_yes.detector import PromptDetector
+from auto_yes.patterns import REGISTRY
+
+pytestmark = pytest.mark.perf
+
+BASELINE = os.path.join(os.path.dirname(__file__), "perf_baseline.json")
+
+_ROUNDS = 5
+_MIN_ROUND = 0.005
+
+# ------------------------------------------------------------------
+# corpora
+# ------------------------------------------------------------------
+
+CORPORA = {
+    "plain_log": "".join(
+        f"2026-01-01 12:00:{i % 60:02d} INFO building target src/mod_{i}.o\r\n"
+        for i in range(200)
+    ),
+    "colour256": "".join(f"\x1b[38;5;{i % 256}m{chr(65 + i % 26)}" for i in range(4000))
+    + "\x1b[0m\r\n",
+    # an OSC title that never ends: the OSC branch scans to the end of the
+    # buffer, from every ESC ] that starts one
+    "osc_unterminated": "\x1b]0;" + "t" * 8192,
+    "osc_many_unterminated": "\x1b]0;title " * 400,
+    "progress_cr": "".join(f"\r[{'#' * (i // 5):<20}] {i:3d}%" for i in range(100)) * 10,
+    "line_8k": "x" * 8192,
+}
+
+# a real prompt for every profile, shown at the end of ordinary output
+PROMPTS = {
+    "generic": "Do you want to continue? [Y/n] ",
+    "claude": " > 1. Yes, I trust this folder",
+    "gemini": "│ ● 1. Yes, allow once",
+    "codex": "> 1. Approve and run now",
+    "copilot": "│ ❯ 1. Yes, proceed",
+    "cursor": " │  → Run (once) (y) (enter)  │",
+    "grok": "  1. Yes",
+    "auggie": "[Y] Enable indexing",
+    "amp": "  Approve this command",
+    "aider": "Run shell command? (Y)es/(N)o/(D)on't ask again [Yes]:",
+    "openhands": "Do you want to execute this action?",
+    "windsurf": "Accept all changes?",
+    "qwen": "Approve execution?",
+    "amazonq": "Do you approve this action?",
+}
+
+_REFERENCE_RE = re.compile(r"\x1b\[[0-9;]*m")
+_REFERENCE_TEXT = "\x1b[1mref\x1b[0m erence " * 256
+
+
+def _reference():
+    """A fixed mix of regex and interpreter work to normalise timings."""
+    _REFERENCE_RE.sub("", _REFERENCE_TEXT)
+    total = 0
+    for i in range(2000):
+        total += i & 7
+    return total
+
+
+# ------------------------------------------------------------------
+# timing and baseline
+# ------------------------------------------------------------------
+
+
+def _best(func):
+    """Return the best per-call time of *func* over ``_ROUNDS`` rounds."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        if time.perf_counter() - start >= _MIN_ROUND:
+            break
+        number *= 2
+    best = None
+    for _ in range(_ROUNDS):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = (time.perf_counter() - start) / number
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+@pytest.fixture(scope="module")
+def unit():
+    return _best(_reference)
+
+
+def _load_baseline():
+    if not os.path.exists(BASELINE):
+        return {}
+    with open(BASELINE, encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def _check(name, func, unit):
+    relative = _best(func) / unit
+    if os.environ.get("AUTO_YES_PERF_UPDATE"):
+        baseline = _load_baseline()
+        baseline[name] = round(relative, 3)
+        with open(BASELINE, "w", encoding="utf-8") as fh:
+            json.dump(dict(sorted(baseline.items())), fh, indent=2)
+            fh.write("\n")
+        return
+    expected = _load_baseline().get(name)
+    if expected is None:
+        pytest.skip(f"{name} has no baseline; run with AUTO_YES_PERF_UPDATE=1")
+    tolerance = float(os.environ.get("AUTO_YES_PERF_TOLERANCE", "2.0"))
+    assert relative <= expected * tolerance, (
+        f"{name}: {relative:.3f} reference units, baseline {expected:.3f} "
+        f"(tolerance {tolerance:g}x)"
+    )
+
+
+# ------------------------------------------------------------------
+# cases
+# ------------------------------------------------------------------
+
+
+@pytest.mark.parametrize("corpus", sorted(CORPORA))
+@pytest.mark.parametrize(
+    "func", [strip_ansi, strip_control, clean_text], ids=lambda func: func.__name__
+)
+def test_ansi(func, corpus, unit):
+    text = CORPORA[corpus]
+    _check(f"{func.__name__}[{corpus}]", lambda: func(text), unit)
+
+
+@pytest.mark.parametrize("category", sorted(REGISTRY))
+def test_detect(category, unit):
+    detector = PromptDetector(categories=[category], cache_size=0)
+    inputs = [*CORPORA.values(), CORPORA["plain_log"] + PROMPTS[category]]
+    assert detector.detect(inputs[-1]) is not None
+
+    def run():
+        for text in inputs:
+            detector.detect(text)
+
+    _check(f"detect[{category}]", run, unit)
+
+
+def test_every_profile_has_a_prompt():
+    assert sorted(PROMPTS) == sorted(REGISTRY)
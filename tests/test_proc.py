@@ -0,0 +1,161 @@
+"""Tests for auto_yes._proc module (Linux only)."""
+
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from auto_yes import _proc
+
+pytestmark = pytest.mark.skipif(
+    not sys.platform.startswith("linux") or not _proc.available(),
+    reason="needs Linux /proc",
+)
+
+
+def _spawn(command):
+    """Run *command* as the foreground job of a fresh PTY."""
+    import fcntl
+    import pty
+    import termios
+
+    master_fd, slave_fd = pty.openpty()
+
+    def _setup():
+        os.setsid()
+        fcntl.ioctl(0, termios.TIOCSCTTY, 0)
+
+    proc = subprocess.Popen(
+        command, stdin=slave_fd, stdout=slave_fd, stderr=slave_fd, preexec_fn=_setup
+    )
+    os.close(slave_fd)
+    return proc, master_fd
+
+
+def _settle(watcher, expected, timeout=3.0):
+    """Poll until the watcher reports *expected* (processes need a moment)."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if watcher.waiting_for_input() == expected:
+            return True
+        time.sleep(0.02)
+    return False
+
+
+class TestProcWatcher:
+    def _check(self, command, expected):
+        proc, master_fd = _spawn(command)
+        try:
+            watcher = _proc.ProcWatcher(master_fd, ttl=0)
+            assert _settle(watcher, expected)
+        finally:
+            proc.kill()
+            proc.wait()
+            os.close(master_fd)
+
+    def test_tty_read_is_waiting(self):
+        self._check(["bash", "-c", "read x"], True)
+
+    def test_child_of_shell_is_seen(self):
+        self._check(["bash", "-c", f"{sys.executable} -c 'input()'; true"], True)
+
+    def test_sleeping_child_is_busy(self):
+        self._check(["sleep", "5"], False)
+
+    def test_running_child_is_busy(self):
+        self._check([sys.executable, "-c", "while True: pass"], False)
+
+    def test_flooding_writer_is_busy(self):
+        # blocks writing to the full PTY buffer, in the same kernel sleep
+        # as a tty read
+        self._check(["sh", "-c", "yes"], False)
+
+    def test_event_loop_is_unknown(self):
+        script = "import select; select.select([0], [], [])"
+        proc, master_fd = _spawn([sys.executable, "-c", script])
+        try:
+            watcher = _proc.ProcWatcher(master_fd, ttl=0)
+            assert _settle(watcher, True)
+            time.sleep(0.2)
+            assert watcher.state() is None
+        finally:
+            proc.kill()
+            proc.wait()
+            os.close(master_fd)
+
+    def test_tty_read_is_input(self):
+        proc, master_fd = _spawn(["sh", "-c", "read x"])
+        try:
+            watcher = _proc.ProcWatcher(master_fd, ttl=0)
+            deadline = time.time() + 3
+            while watcher.state() != _proc.INPUT and time.time() < deadline:
+                time.sleep(0.02)
+            assert watcher.state() == _proc.INPUT
+        finally:
+            proc.kill()
+            proc.wait()
+            os.close(master_fd)
+
+    def test_hidden_wchan_is_unknown(self, monkeypatch):
+        watcher = _proc.ProcWatcher(-1)
+        for hidden in (b"", b"0"):
+            monkeypatch.setattr(_proc, "_read", lambda path, data=hidden: data)
+            assert watcher._member_state(1, "S") is None
+
+    def test_result_is_cached(self):
+        proc, master_fd = _spawn(["sleep", "5"])
+        try:
+            watcher = _proc.ProcWatcher(master_fd, ttl=60)
+            first = watcher.waiting_for_input()
+            proc.kill()
+            proc.wait()
+            assert watcher.waiting_for_input() is first
+        finally:
+            os.close(master_fd)
+
+    def test_unknown_terminal_is_waiting(self):
+        read_fd, write_fd = os.pipe()
+        try:
+            assert _proc.ProcWatcher(read_fd).waiting_for_input()
+        finally:
+            os.close(read_fd)
+            os.close(write_fd)
+
+
+class TestStat:
+    def test_own_stat(self):
+        state, pgrp = _proc._stat(os.getpid())
+        assert state == "R"
+        assert pgrp == os.getpgrp()
+
+    def test_missing_pid(self):
+        assert _proc._stat(2**22 + 1) is None
+
+    def test_wchan_suffix_stripped(self, monkeypatch):
+        monkeypatch.setattr(_proc, "_read", lambda path: b"poll_schedule_timeout.constprop.0")
+        assert _proc._wchan(1) == "poll_schedule_timeout"
+
+
+class TestProgramNames:
+    def test_own_names(self):
+        names = _proc.program_names(os.getpid())
+        assert len(names) >= 2
+        assert all(names)
+
+    def test_script_name_is_included(self, monkeypatch):
+        files = {
+            "/proc/1/comm": b"node\n",
+            "/proc/1/cmdline": b"node\0/usr/local/bin/claude\0--resume\0",
+        }
+        monkeypatch.setattr(_proc, "_read", files.get)
+        assert _proc.program_names(1) == ["node", "node", "claude"]
+
+    def test_options_are_skipped(self, monkeypatch):
+        files = {"/proc/1/cmdline": b"python3\0-m\0aider\0"}
+        monkeypatch.setattr(_proc, "_read", files.get)
+        assert _proc.program_names(1) == ["python3"]
+
+    def test_missing_pid(self):
+        assert _proc.program_names(2**22 + 1) == []
@@ -0,0 +1,223 @@
+"""Tests for auto_yes._regex module."""
+
+import re
+import time
+
+import pytest
+
+from auto_yes._regex import ascii_twin, audit, canonicalize, check_pattern, covers
+from auto_yes.detector import PromptDetector
+from auto_yes.patterns import REGISTRY, unpack_entry
+
+
+class TestAsciiTwin:
+    def test_ascii_source_is_encoded_as_is(self):
+        assert ascii_twin(r"\[y/n\]") == rb"\[y/n\]"
+
+    def test_non_ascii_literal_keeps_quantifier(self):
+        twin = re.compile(ascii_twin("\u276f?\\s*Yes"), re.IGNORECASE)
+        assert twin.search(b"  yes, allow") is not None
+
+    def test_non_ascii_in_class_stays_in_class(self):
+        twin = re.compile(ascii_twin("[\u25cf\u25cb]\\s*1"), re.IGNORECASE)
+        assert twin.search(b"( 1") is None
+
+    def test_unicode_escape_has_no_twin(self):
+        assert ascii_twin(r"\u276f\s*1\. Yes \u2192") is None
+
+    def test_ascii_folding_character_has_no_twin(self):
+        # KELVIN SIGN matches "k" under IGNORECASE
+        assert ascii_twin("\u212a\u276f") is None
+
+    def test_registry_twins_agree_on_ascii_lines(self):
+        lines = [
+            "Continue? [y/n]",
+            "> 1. Yes, I trust this folder",
+            "  Approve this change?",
+            "Would you like to install it?",
+            "Add main.py to the chat?",
+            " 1. Yes",
+            "Run (once) (y) (enter)",
+            "Press Enter to continue",
+            "Downloading files...",
+            "Type 'YES' to confirm:",
+        ]
+        for entry in REGISTRY.values():
+            for item in entry["patterns"]:
+                src = unpack_entry(item)[0]
+                twin = ascii_twin(src)
+                assert twin is not None, src
+                text_re = re.compile(src, re.IGNORECASE)
+                bytes_re = re.compile(twin, re.IGNORECASE)
+                for line in lines:
+                    expected = text_re.search(line) is not None
+                    assert (bytes_re.search(line.encode()) is not None) == expected, src
+
+
+class TestCanonicalize:
+    def test_letters_are_case_folded(self):
+        assert canonicalize(r"Continue\s*\?").source == r"continue\s*\?"
+
+    def test_case_variant_class_collapses(self):
+        assert canonicalize(r"[Aa]llow\b").source == r"allow\b"
+        assert canonicalize(r"[Yy](?:es)?").source == r"y(?:es)?"
+
+    def test_other_classes_are_untouched(self):
+        assert canonicalize(r"require[ds]?").source == r"require[ds]?"
+        assert canonicalize(r"[A-Z]+").source == r"[A-Z]+"
+
+    def test_escape_letters_keep_case(self):
+        assert canonicalize(r"\S\W").source == r"\S\W"
+
+    def test_needless_escape_is_dropped(self):
+        assert canonicalize(r"y\/n\-").source == "y/n-"
+
+    def test_quantifier_spelling(self):
+        assert canonicalize(r"\s{0,}x{1,}y{0,1}?").source == r"\s*x+y??"
+
+    def test_tokens_attach_quantifiers(self):
+        assert canonicalize(r"(?:the\s+)?ok\?").tokens == (r"(?:the\s+)?", "o", "k", r"\?")
+
+    def test_top_level_alternation(self):
+        assert canonicalize("yes|no").alternation
+        assert not canonicalize("(?:yes|no)").alternation
+
+    def test_unsupported_sources(self):
+        assert canonicalize(r"(a)\1") is None
+        assert canonicalize(r"(?i)yes") is None
+        assert canonicalize(r"[abc") is None
+
+
+class TestCovers:
+    def test_equal_sources(self):
+        assert covers(canonicalize(r"\[y/n\]"), canonicalize(r"\[Y/N\]"))
+
+    def test_contiguous_run_covers(self):
+        general = canonicalize(r">\s*1\.\s*Yes")
+        assert covers(general, canonicalize(r">\s*1\.\s*Yes,?\s+allow Codex"))
+        assert not covers(canonicalize(r">\s*1\.\s*Yes,?\s+allow Codex"), general)
+
+    def test_alternation_never_covers(self):
+        assert not covers(canonicalize("yes|no"), canonicalize("yes|nope"))
+        assert not covers(canonicalize("yes"), canonicalize("yes|nope"))
+
+    def test_gap_does_not_cover(self):
+        assert not covers(canonicalize("ab"), canonicalize("a.b"))
+
+
+def _levels(src):
+    return [finding.level for finding in audit(src)]
+
+
+class TestAudit:
+    def test_plain_patterns_are_clean(self):
+        for src in (r"\[y/n\]", r"(?:the\s+)?license\b", r"a+b+", r"(?:x|y){2}"):
+            assert audit(src) == [], src
+
+    def test_nested_quantifier_is_error(self):
+        for src in (r"(a+)+$", r"(a{2,})*", r"(x+){3}", r"((ab)*c)*", r"(.*a)+!"):
+            assert "error" in _levels(src), src
+
+    def test_inner_repeat_running_into_its_separator_is_error(self):
+        for src in (r"(?:\w+\s?)+\?", r"(\d+\.?)+\?", r"(?:x+y*)+"):
+            assert _levels(src) == ["error"], src
+
+    def test_delimited_nesting_is_warning(self):
+        for src in (r"(\d+\.)+\d+\?", r"(?:\w+,\s*)+\?", r"(\w+\s)*\?", r"(?:\s*x)*y"):
+            assert _levels(src) == ["warning"], src
+            assert check_pattern(src) == [f"nested quantifier: {src[: src.index(')') + 2]}"]
+
+    def test_optional_group_is_not_nested(self):
+        assert _levels(r"(?:Yes,?\s+)?allow") == []
+
+    def test_ambiguous_chain_is_warning(self):
+        for src in (r".*x.*y", r".*.*=", r"\s*:?\s*$", r"\w+\d+"):
+            assert _levels(src) == ["warning"], src
+
+    def test_separated_repeats_are_clean(self):
+        assert audit(r"\d+\.\s+\w+") == []
+
+    def test_repeated_alternation_is_warning(self):
+        for src in (r"(?:yes|no)+c", r"(?:[ab]|c)+\?", r"(\d{2}|-)+"):
+            assert _levels(src) == ["warning"], src
+
+    def test_ambiguous_alternation_is_error(self):
+        for src in (r"(a|ab)*c", r"(ab?|b)+", r"(a|)+", r"(?:(a|a)x?)+"):
+            assert _levels(src) == ["error"], src
+
+    def test_invalid_regex_is_error(self):
+        assert _levels(r"[unclosed") == ["error"]
+
+    def test_possessive_quantifier_bounds(self):
+        assert _levels(r"(a++)+") == ["error"]
+
+    def test_registry_is_clean(self):
+        for entry in REGISTRY.values():
+            for item in entry["patterns"]:
+                src = unpack_entry(item)[0]
+                assert audit(src) == [], src
+
+    def test_check_pattern(self):
+        assert check_pattern(r"ok\?") == []
+        assert check_pattern(r".*=.*") != []
+        with pytest.raises(ValueError, match="unsafe pattern"):
+            check_pattern(r"(a+)+")
+
+
+# lines that drive naive backtracking into worst cases
+_PATHOLOGICAL = [
+    "=" * 100_000,
+    "[" + "#" * 60_000 + "-" * 40_000 + "] 42%",
+    " " * 100_000 + "x",
+    "?" + " " * 100_000 + "x",
+    "? y/n" + " " * 100_000 + ":x",
+    "a" * 100_000 + "!",
+    "allow " * 20_000,
+    "\u2502 \u25cf 1. " + " " * 100_000,
+    "Do you want " * 10_000 + "to",
+]
+
+
+# patterns that backtrack exponentially and must be refused
+_EXPONENTIAL = [
+    r"(a+)+$",
+    r"(?:\w+\s?)+\?",
+    r"(a|a)+\?",
+    r"(a|aa)+\?",
+]
+
+
+class TestPathologicalPatterns:
+    @pytest.mark.parametrize("src", _EXPONENTIAL)
+    def test_refused(self, src):
+        with pytest.raises(ValueError, match="unsafe pattern"):
+            check_pattern(src)
+        with pytest.raises(ValueError, match="unsafe pattern"):
+            PromptDetector(categories=[], extra_patterns=[src])
+
+
+class TestPathologicalLines:
+    # generous for slow CI; without the line bound these take minutes
+    LIMIT = 1.0
+
+    def _time(self, det, line):
+        start = time.perf_counter()
+        det.detect(line)
+        det.detect_tail(line.encode())
+        return time.perf_counter() - start
+
+    def test_registry_is_bounded(self):
+        det = PromptDetector(categories=list(REGISTRY))
+        for line in _PATHOLOGICAL:
+            assert self._time(det, line) < self.LIMIT, line[:40]
+
+    def test_warned_user_pattern_is_bounded(self):
+        # cubic patterns need a tighter bound than the default
+        with pytest.warns(RuntimeWarning):
+            det = PromptDetector(
+                categories=[],
+                extra_patterns=[r"\s*:?\s*x\s*$", r".*=.*\?"],
+                max_line_chars=256,
+            )
+        for line in _PATHOLOGICAL:
+            assert self._time(det, line) < self.LIMIT, line[:40]
@@ -0,0 +1,140 @@
+"""Tests for auto_yes._registry module."""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from auto_yes import _registry
+
+
+@pytest.fixture(autouse=True)
+def runtime_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    return tmp_path / "auto-yes"
+
+
+class TestRegister:
+    def test_session_is_listed(self):
+        record = _registry.register("claude fix the tests", ["generic", "claude"])
+        try:
+            (info,) = _registry.sessions()
+            assert info.pid == os.getpid()
+            assert info.command == "claude fix the tests"
+            assert info.profiles == "generic, claude"
+            assert info.bytes_proxied == 0
+            assert info.responses == 0
+            assert info.last_match == ""
+        finally:
+            record.close()
+
+    def test_counters_are_updated_in_place(self):
+        record = _registry.register("codex", ["codex"])
+        try:
+            started = _registry.sessions()[0].last_activity
+            record.proxied(100)
+            record.proxied(28)
+            record.responded(r"\[y/N\]")
+            record.responded(r"Do you want to proceed\?")
+            (info,) = _registry.sessions()
+            assert info.bytes_proxied == 128
+            assert info.responses == 2
+            assert info.last_match == r"Do you want to proceed\?"
+            assert info.last_activity >= started
+        finally:
+            record.close()
+
+    def test_close_removes_the_record(self, runtime_dir):
+        record = _registry.register("aider", ["aider"])
+        record.close()
+        assert _registry.sessions() == []
+        assert os.listdir(runtime_dir) == []
+
+    def test_long_fields_are_truncated(self):
+        record = _registry.register("x" * 1000, ["generic"])
+        try:
+            record.responded("p" * 1000)
+            (info,) = _registry.sessions()
+            assert info.command == "x" * 255
+            assert info.last_match == "p" * 255
+        finally:
+            record.close()
+
+    def test_unwritable_directory_returns_none(self, tmp_path, monkeypatch):
+        blocker = tmp_path / "file"
+        blocker.write_text("")
+        monkeypatch.setenv("XDG_RUNTIME_DIR", str(blocker))
+        assert _registry.register("claude", ["claude"]) is None
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="needs Unix permissions")
+class TestPrivateDir:
+    def test_created_private(self, runtime_dir):
+        _registry.private_dir(str(runtime_dir))
+        assert os.stat(runtime_dir).st_mode & 0o777 == 0o700
+
+    def test_open_directory_is_refused(self, runtime_dir):
+        runtime_dir.mkdir(mode=0o755)
+        os.chmod(runtime_dir, 0o755)
+        with pytest.raises(OSError, match="mode 755"):
+            _registry.private_dir(str(runtime_dir))
+        assert _registry.register("claude", ["claude"]) is None
+        assert os.listdir(runtime_dir) == []
+
+    def test_symlink_is_refused(self, runtime_dir, tmp_path):
+        target = tmp_path / "elsewhere"
+        target.mkdir(mode=0o700)
+        runtime_dir.symlink_to(target)
+        with pytest.raises(OSError, match="not a directory"):
+            _registry.private_dir(str(runtime_dir))
+
+    def test_foreign_owner_is_refused(self, runtime_dir, monkeypatch):
+        runtime_dir.mkdir(mode=0o700)
+        monkeypatch.setattr(os, "getuid", lambda: os.stat(runtime_dir).st_uid + 1)
+        with pytest.raises(OSError, match="another user"):
+            _registry.private_dir(str(runtime_dir))
+
+    def test_open_directory_is_not_listed(self, runtime_dir):
+        record = _registry.register("claude", ["claude"])
+        try:
+            os.chmod(runtime_dir, 0o755)
+            assert _registry.sessions() == []
+        finally:
+            record.close()
+
+
+class TestSessions:
+    def test_missing_directory(self):
+        assert _registry.sessions() == []
+
+    def test_not_available_on_windows(self, runtime_dir, monkeypatch):
+        record = _registry.register("claude", ["claude"])
+        try:
+            monkeypatch.setattr(sys, "platform", "win32")
+            assert not _registry.available()
+            assert _registry.sessions() == []
+        finally:
+            record.close()
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="needs os.kill(pid, 0)")
+    def test_dead_session_is_removed(self, runtime_dir, monkeypatch):
+        proc = subprocess.Popen([sys.executable, "-c", "pass"])
+        proc.wait()
+        monkeypatch.setattr(os, "getpid", lambda: proc.pid)
+        _registry.register("gone", ["generic"])
+        monkeypatch.undo()
+        monkeypatch.setenv("XDG_RUNTIME_DIR", str(runtime_dir.parent))
+
+        assert _registry.sessions() == []
+        assert os.listdir(runtime_dir) == []
+
+    def test_foreign_files_are_skipped(self, runtime_dir):
+        record = _registry.register("claude", ["claude"])
+        try:
+            (runtime_dir / "junk.session").write_bytes(b"\0" * _registry._LAYOUT.size)
+            (runtime_dir / "short.session").write_bytes(b"AYS1")
+            (runtime_dir / "notes.txt").write_text("hello")
+            assert [info.command for info in _registry.sessions()] == ["claude"]
+        finally:
+            record.close()
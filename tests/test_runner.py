@@ -0,0 +1,783 @@
+"""Tests for auto_yes.runner module (buffer handling, no child process)."""
+
+import os
+import struct
+import sys
+import time
+
+import pytest
+
+from auto_yes import _proc
+from auto_yes import runner as runner_mod
+from auto_yes.runner import (
+    _BUFFER_LIMIT,
+    _QUEUE_WATCH,
+    _RETRY_LIMIT,
+    Runner,
+    _packet_mode,
+    _Pending,
+    _split_packet,
+    _unread_input,
+)
+
+
+class TestIngest:
+    def test_progress_frames_are_compacted(self):
+        runner = Runner()
+        buf = b""
+        for pct in range(100):
+            buf = runner._ingest(buf, f"\rDownloading {pct:3d}%".encode())
+        assert buf == b"Downloading  98%\rDownloading  99%"
+
+    def test_buffer_is_trimmed(self):
+        runner = Runner()
+        buf = runner._ingest(b"", b"x\n" * _BUFFER_LIMIT)
+        assert len(buf) <= _BUFFER_LIMIT
+
+    def test_bytearray_buffer(self):
+        runner = Runner()
+        buf = bytearray(b"1%")
+        buf[:] = runner._ingest(buf, b"\r2%\r3%")
+        assert buf == bytearray(b"2%\r3%")
+
+
+class TestAnimating:
+    def test_repeated_redraws_are_animating(self):
+        runner = Runner()
+        buf = b""
+        for frame in (b"\r|", b"\r/", b"\r-", b"\r\\"):
+            buf = runner._ingest(buf, frame)
+        assert runner._animating()
+
+    def test_single_redraw_is_not_animating(self):
+        runner = Runner()
+        runner._ingest(b"", b"10%\r20%\r")
+        assert not runner._animating()
+
+    def test_newline_resets(self):
+        runner = Runner()
+        buf = b""
+        for frame in (b"\r1", b"\r2", b"\r3", b"\n"):
+            buf = runner._ingest(buf, frame)
+        assert not runner._animating()
+
+    def test_stops_after_quiet_period(self):
+        runner = Runner()
+        buf = b""
+        for frame in (b"\r1", b"\r2", b"\r3", b"\r4"):
+            buf = runner._ingest(buf, frame)
+        past = time.time() - 1.0
+        runner._redraws.extend([past, past])
+        assert not runner._animating()
+
+
+class TestStats:
+    def test_includes_detector_stats(self):
+        runner = Runner()
+        runner.detector.detect_tail(b"Continue? [y/n]")
+        stats = runner.stats()
+        assert stats["responses"] == 0
+        assert stats["cache_misses"] == 1
+
+
+class TestPromptGating:
+    def _ready(self, runner):
+        # step past the cooldown floor
+        runner._last_response_time = 0.0
+
+    def test_new_prompt_is_found(self):
+        runner = Runner()
+        buf = runner._ingest(b"", b"Continue? [y/n] ")
+        result, _ = runner._new_prompt(buf)
+        assert result.pattern == r"\[y/n\]"
+
+    def test_answered_prompt_is_not_answered_again(self):
+        runner = Runner()
+        buf = runner._ingest(b"", b"Continue? [y/n] ")
+        _, fingerprint = runner._new_prompt(buf)
+        runner._answered_prompt(fingerprint)
+        self._ready(runner)
+        buf = runner._ingest(buf, b"\r\x1b[2KContinue? [y/n] ")
+        assert runner._new_prompt(buf) is None
+
+    def test_same_text_on_a_new_line_is_answered(self):
+        runner = Runner()
+        buf = runner._ingest(b"", b"Continue? [y/n] ")
+        _, fingerprint = runner._new_prompt(buf)
+        runner._answered_prompt(fingerprint)
+        self._ready(runner)
+        buf = runner._ingest(buf, b"y\r\nContinue? [y/n] ")
+        assert runner._new_prompt(buf) is not None
+
+    def test_different_prompt_is_answered_immediately(self):
+        runner = Runner()
+        buf = runner._ingest(b"", b"Proceed? [y/n] ")
+        _, fingerprint = runner._new_prompt(buf)
+        runner._answered_prompt(fingerprint)
+        runner._last_response_time -= runner.cooldown
+        buf = runner._ingest(buf, b"\r\x1b[2KOverwrite? [y/n] ")
+        assert runner._new_prompt(buf) is not None
+
+    def test_cooldown_is_a_floor(self):
+        runner = Runner(cooldown=10)
+        buf = runner._ingest(b"", b"Proceed? [y/n] ")
+        _, fingerprint = runner._new_prompt(buf)
+        runner._answered_prompt(fingerprint)
+        buf = runner._ingest(buf, b"\nOverwrite? [y/n] ")
+        assert runner._new_prompt(buf) is None
+
+
+class TestConfirm:
+    PROMPT = b"Continue? [y/n]"
+
+    class _Reader:
+        def __init__(self, state):
+            self.value = state
+
+        def state(self):
+            return self.value
+
+    def setup_method(self):
+        self.read_fd, self.write_fd = os.pipe()
+        os.set_blocking(self.read_fd, False)
+        self.runner = Runner()
+        # the child sits in a terminal read unless a test says otherwise
+        self.runner._reader = self._Reader(_proc.INPUT)
+
+    def teardown_method(self):
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+
+    def _pending(self, deadline=0.0, retries=0):
+        self.runner._pending = _Pending(self.PROMPT, b"y\n", deadline, retries)
+
+    def _confirm(self, buf):
+        self.runner._confirm_unix(buf, self.write_fd, self.write_fd, None)
+
+    def _sent(self):
+        try:
+            return os.read(self.read_fd, 64)
+        except BlockingIOError:
+            return b""
+
+    def test_waits_for_deadline(self):
+        self._pending(deadline=time.time() + 10)
+        self._confirm(b"")
+        assert self.runner._pending is not None
+        assert self._sent() == b""
+
+    def test_echo_confirms(self):
+        self._pending()
+        self._confirm(b"y\r\n")
+        assert self.runner._pending is None
+        assert self._sent() == b""
+
+    def test_confirmation_releases_the_fingerprint(self):
+        self.runner._answered.extend([(self.PROMPT, (4, 15)), (b"Other? [y/n]", (2, 0))])
+        self._pending()
+        self._confirm(b"y\r\n")
+        assert list(self.runner._answered) == [(b"Other? [y/n]", (2, 0))]
+
+    def test_unconfirmed_fingerprint_is_kept(self):
+        self.runner._answered.append((self.PROMPT, (4, 15)))
+        self.runner._reader = None
+        self._pending()
+        self._confirm(b"")
+        assert len(self.runner._answered) == 1
+
+    def test_confirmation_feeds_the_detector(self):
+        runner = Runner(categories=["generic", "claude", "codex"], narrow_after=1)
+        self.runner = runner
+        result = runner.detector.detect("> 1. Approve and run now")
+        self.runner._pending = _Pending(self.PROMPT, b"y\n", 0.0, 0, result)
+        self._confirm(b"y\r\n")
+        assert runner.stats()["narrowed"] == ["codex", "generic"]
+
+    def test_prompt_still_shown_is_retried(self):
+        self._pending()
+        self._confirm(b"\r\x1b[2KContinue? [y/n] ")
+        assert self._sent() == b"y\n"
+        pending = self.runner._pending
+        assert pending.retries == 1
+        assert pending.deadline > time.time() + 0.3
+        assert self.runner.stats()["retries"] == 1
+
+    def test_no_output_is_retried(self):
+        self._pending()
+        self._confirm(b"")
+        assert self._sent() == b"y\n"
+
+    def test_gives_up_after_limit(self):
+        self._pending(retries=_RETRY_LIMIT)
+        self._confirm(b"")
+        assert self.runner._pending is None
+        assert self._sent() == b""
+
+    def test_silence_without_evidence_is_not_retried(self):
+        for reader in (self._Reader(_proc.BUSY), self._Reader(None), None):
+            self.runner._reader = reader
+            self._pending()
+            self._confirm(b"")
+            assert self.runner._pending is None
+            assert self._sent() == b""
+        assert self.runner.stats()["retries"] == 0
+
+    @pytest.mark.skipif(not _proc.available(), reason="needs Linux /proc")
+    def test_quiet_child_after_a_hidden_answer(self, monkeypatch, capfd):
+        runner = Runner(categories=["generic"], headless=True)
+        script = "stty -echo; printf 'Password ok? [y/n] '; read a; sleep 1; echo got $a"
+        with open(os.devnull) as stdin:
+            monkeypatch.setattr(runner_mod.sys, "stdin", stdin)
+            assert runner.run_command(["sh", "-c", script]) == 0
+        assert "got y" in capfd.readouterr().out
+        assert runner.stats()["retries"] == 0
+        assert runner.metrics.bytes_out == 2
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="needs a POSIX pty")
+class TestRepeatedPrompt:
+    def test_same_question_at_the_same_row_is_answered_again(self, monkeypatch, capfd):
+        # a full-screen redraw puts the second question exactly where the first was
+        script = (
+            "printf '\\033[2J\\033[5;1HApply? [y/n] '; read a; sleep 0.5; "
+            "printf '\\033[2J\\033[5;1HApply? [y/n] '; read b; echo got $a$b"
+        )
+        runner = Runner(categories=["generic"], headless=True, idle_timeout=3, kill_grace=0.1)
+        with open(os.devnull) as stdin:
+            monkeypatch.setattr(runner_mod.sys, "stdin", stdin)
+            assert runner.run_command(["sh", "-c", script]) == 0
+        assert "got yy" in capfd.readouterr().out
+        assert runner.stats()["responses"] == 2
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="needs a POSIX pty")
+class TestUnreadInput:
+    def test_counts_queued_bytes(self):
+        import pty
+
+        master_fd, slave_fd = pty.openpty()
+        try:
+            name = os.ttyname(slave_fd)
+            assert _unread_input(name) == 0
+            os.write(master_fd, b"y\n")
+            time.sleep(0.05)
+            assert _unread_input(name) == 2
+        finally:
+            os.close(master_fd)
+            os.close(slave_fd)
+
+    def test_unknown_slave(self):
+        assert _unread_input(None) == 0
+
+
+class TestProcGate:
+    class _Watcher:
+        def __init__(self, waiting):
+            self.waiting = waiting
+
+        def waiting_for_input(self):
+            return self.waiting
+
+    def test_no_watcher_is_open(self):
+        assert Runner()._gate_open(None)
+
+    def test_busy_child_is_counted(self):
+        runner = Runner(proc_gate=True)
+        assert not runner._gate_open(self._Watcher(False))
+        assert runner._gate_open(self._Watcher(True))
+        assert runner.stats()["gated"] == 1
+
+
+class TestSplitPacket:
+    def test_data_packet(self):
+        assert _split_packet(b"\x00Continue? ") == (0, b"Continue? ")
+
+    def test_status_packet(self):
+        assert _split_packet(b"\x11") == (0x11, b"")
+
+
+class TestPacketEvent:
+    def setup_method(self):
+        self.read_fd, self.write_fd = os.pipe()
+        os.set_blocking(self.read_fd, False)
+        self.runner = Runner()
+
+    def teardown_method(self):
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+
+    def _event(self, status):
+        return self.runner._packet_event(status, self.write_fd, self.write_fd)
+
+    def _sent(self):
+        try:
+            return os.read(self.read_fd, 64)
+        except BlockingIOError:
+            return b""
+
+    def test_raw_mode_is_a_termios_change(self):
+        runner = self.runner
+        buf = b""
+        for frame in (b"\r|", b"\r/", b"\r-"):
+            buf = runner._ingest(buf, frame)
+        assert self._event(0x10)
+        assert not runner._animating()
+
+    def test_flush_alone_is_not_a_termios_change(self):
+        assert not self._event(0x01)
+
+    def _queued(self):
+        self.runner._queue(b"y\n")
+        self.runner._queued_seen = True
+
+    def test_flushed_answer_is_resent(self):
+        self._queued()
+        self._event(0x11)
+        assert self._sent() == b"y\n"
+        assert self.runner.stats()["retries"] == 1
+
+    def test_flush_after_answer_was_read(self):
+        self._event(0x01)
+        assert self._sent() == b""
+
+    def test_unsettled_answer_is_not_resent(self):
+        # the child may already have read it before flushing
+        self.runner._queue(b"y\n")
+        self._event(0x01)
+        assert self._sent() == b""
+
+    def test_resend_is_bounded(self):
+        self._queued()
+        for _ in range(_RETRY_LIMIT + 2):
+            self.runner._queued_seen = self.runner._queued is not None
+            self._event(0x01)
+        assert self._sent() == b"y\n" * _RETRY_LIMIT
+        assert self.runner._queued is None
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="needs a POSIX pty")
+class TestTrackQueued:
+    def setup_method(self):
+        import pty
+
+        self.master_fd, self.slave_fd = pty.openpty()
+        self.name = os.ttyname(self.slave_fd)
+        self.runner = Runner()
+
+    def teardown_method(self):
+        os.close(self.master_fd)
+        os.close(self.slave_fd)
+
+    def _answer(self):
+        os.write(self.master_fd, b"y\n")
+        self.runner._queue(b"y\n")
+
+    def test_zero_count_is_ignored_until_settled(self):
+        self._answer()
+        os.read(self.slave_fd, 16)
+        self.runner._track_queued(self.name)
+        assert self.runner._queued is not None
+
+    def test_unread_answer_is_seen(self):
+        self._answer()
+        time.sleep(0.02)
+        self.runner._track_queued(self.name)
+        assert self.runner._queued_seen
+
+    def test_read_answer_is_forgotten(self):
+        self._answer()
+        time.sleep(0.02)
+        os.read(self.slave_fd, 16)
+        self.runner._track_queued(self.name)
+        assert self.runner._queued is None
+
+    def test_unread_answer_is_dropped_after_the_watch(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(runner_mod, "_unread_input", lambda name: calls.append(name) or 2)
+        self._answer()
+        self.runner._queued_since -= 0.02
+        self.runner._track_queued(self.name)
+        assert self.runner._queued_seen
+        self.runner._queued_since -= _QUEUE_WATCH
+        self.runner._track_queued(self.name)
+        assert self.runner._queued is None
+        self.runner._track_queued(self.name)
+        assert calls == [self.name]
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="needs a POSIX pty")
+class TestPacketMode:
+    def test_raw_mode_and_flush_are_reported(self):
+        import pty
+        import tty
+
+        master_fd, slave_fd = pty.openpty()
+        try:
+            if not _packet_mode(master_fd):
+                pytest.skip("TIOCPKT not supported")
+            os.write(slave_fd, b"hi")
+            assert _split_packet(os.read(master_fd, 64)) == (0, b"hi")
+            tty.setraw(slave_fd)
+            status, data = _split_packet(os.read(master_fd, 64))
+            assert status & 0x01
+            assert status & 0x10
+            assert data == b""
+        finally:
+            os.close(master_fd)
+            os.close(slave_fd)
+
+
+class TestFollowForeground:
+    def setup_method(self):
+        self.runner = Runner(categories=["generic", "claude", "codex"])
+
+    def _foreground(self, monkeypatch, pgid, names):
+        monkeypatch.setattr(runner_mod.os, "tcgetpgrp", lambda fd: pgid)
+        monkeypatch.setattr(runner_mod._proc, "program_names", lambda pid: names)
+        self.runner._follow_foreground(0)
+
+    def test_known_cli_focuses_its_profile(self, monkeypatch):
+        self._foreground(monkeypatch, 100, ["node", "node", "codex"])
+        assert self.runner.detector.detect("Do you want to use this API key?") is None
+        assert self.runner.detector.detect("Continue? [y/n]") is not None
+
+    def test_unknown_program_uses_everything(self, monkeypatch):
+        self._foreground(monkeypatch, 100, ["codex"])
+        self._foreground(monkeypatch, 200, ["bash"])
+        assert self.runner.detector.detect("Do you want to use this API key?") is not None
+
+    def test_same_group_is_not_looked_up_again(self, monkeypatch):
+        self._foreground(monkeypatch, 100, ["codex"])
+        self._foreground(monkeypatch, 100, ["bash"])
+        assert self.runner.detector.detect("Do you want to use this API key?") is None
+
+
+class TestDetectSnapshot:
+    PROMPT = b"Proceed? [y/n] "
+
+    def setup_method(self):
+        self.read_fd, self.write_fd = os.pipe()
+        os.set_blocking(self.read_fd, False)
+
+    def teardown_method(self):
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+
+    def _answer(self, runner, found, buf):
+        return runner._worker_answers(found, buf, self.write_fd, self.write_fd)
+
+    def test_prompt_is_not_claimed_by_the_worker(self):
+        runner = Runner()
+        found = runner._detect_snapshot(self.PROMPT, (0, 0))
+        assert found[1] == (b"Proceed? [y/n]", (0, 0))
+        assert runner._detect_snapshot(self.PROMPT, (0, 0)) is not None
+        assert len(runner._answered) == 0
+        assert runner._last_response_time == 0.0
+
+    def test_output_is_not_claimed(self):
+        runner = Runner()
+        assert runner._detect_snapshot(b"compiling...", (0, 0)) is None
+        assert len(runner._answered) == 0
+
+    def test_answer_is_claimed_when_written(self):
+        runner = Runner()
+        first = runner._detect_snapshot(self.PROMPT, (0, 0))
+        second = runner._detect_snapshot(self.PROMPT, (0, 0))
+        assert self._answer(runner, [first, second], self.PROMPT) == b""
+        assert os.read(self.read_fd, 64) == b"y\n"
+        assert runner.stats()["responses"] == 1
+        assert list(runner._answered) == [first[1]]
+        assert runner._last_response_time > 0
+
+    def test_stale_result_is_not_claimed(self):
+        runner = Runner()
+        found = runner._detect_snapshot(self.PROMPT, (0, 0))
+        buf = self.PROMPT + b"y\r\nBuilding...\r\n"
+        assert self._answer(runner, [found], buf) == buf
+        with pytest.raises(BlockingIOError):
+            os.read(self.read_fd, 64)
+        assert len(runner._answered) == 0
+        assert runner._last_response_time == 0.0
+        assert len(runner.breaker._answers) == 0
+        assert runner.stats()["responses"] == 0
+
+
+class TestRegistered:
+    def test_session_record_follows_traffic(self, tmp_path, monkeypatch):
+        from auto_yes import _registry
+
+        monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+        runner = Runner(categories=["generic"])
+        with runner._registered(["apt", "install", "nginx"]):
+            buf = runner._ingest(b"", b"Do you want to continue? [Y/n] ")
+            result = runner.detector.detect_tail(buf)
+            runner._answered_prompt((b"", (0, 0)), result)
+            (info,) = _registry.sessions()
+            assert info.command == "apt install nginx"
+            assert info.profiles == "generic"
+            assert info.bytes_proxied == 31
+            assert info.responses == 1
+            assert info.last_match == result.pattern
+        assert _registry.sessions() == []
+
+    def test_not_registered_on_windows(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+        monkeypatch.setattr(sys, "platform", "win32")
+        runner = Runner(categories=["generic"])
+        with runner._registered(["apt", "install", "nginx"]):
+            assert runner._record is None
+        assert not os.path.exists(tmp_path / "auto-yes")
+
+
+class TestMetrics:
+    def test_detection_counters(self):
+        runner = Runner(cooldown=10)
+        buf = runner._ingest(b"", b"Proceed? [y/n] ")
+        result, fingerprint = runner._new_prompt(buf)
+        runner._answered_prompt(fingerprint, result)
+        assert runner._new_prompt(buf) is None
+        metrics = runner.metrics
+        assert metrics.bytes_in == 15
+        assert (metrics.detections, metrics.matches, metrics.suppressed) == (2, 2, 1)
+        assert metrics.responses == 1
+        assert "auto_yes_pattern_responses_total{pattern=" in metrics.render()
+
+    def test_suppressed_counts_held_back_prompts(self):
+        runner = Runner(categories=["generic"], cooldown=10)
+        buf = runner._ingest(b"", b"Proceed? [y/n] ")
+        result, fingerprint = runner._new_prompt(buf)
+        runner._answered_prompt(fingerprint, result)
+        # plain output during the cooldown is not a held-back prompt
+        output = runner._ingest(b"", b"working...\r\n")
+        for _ in range(5):
+            assert runner._new_prompt(output) is None
+        assert runner.metrics.suppressed == 0
+        # the answered prompt drawn again counts once, however often it is checked
+        for _ in range(5):
+            assert runner._new_prompt(buf) is None
+        assert runner.metrics.suppressed == 1
+        # a new prompt inside the cooldown
+        buf = runner._ingest(output, b"Remove file? [y/n] ")
+        for _ in range(5):
+            assert runner._new_prompt(buf) is None
+        assert runner.metrics.suppressed == 2
+        assert runner.metrics.matches == 11
+
+
+class TestOutputBuffer:
+    def setup_method(self):
+        self.read_fd, self.write_fd = os.pipe()
+
+    def teardown_method(self):
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+
+    def _written(self):
+        os.set_blocking(self.read_fd, False)
+        try:
+            return os.read(self.read_fd, 1 << 20)
+        except BlockingIOError:
+            return b""
+
+    def test_small_writes_are_batched(self):
+        out = runner_mod._OutputBuffer(self.write_fd, size=1024, interval=60)
+        for _ in range(10):
+            out.write(b"line\n")
+        assert self._written() == b""
+        out.flush()
+        assert self._written() == b"line\n" * 10
+        assert out.writes == 1
+
+    def test_full_buffer_is_written_at_once(self):
+        out = runner_mod._OutputBuffer(self.write_fd, size=16, interval=60)
+        out.write(b"x" * 10)
+        out.write(b"y" * 10)
+        assert self._written() == b"x" * 10 + b"y" * 10
+
+    def test_old_data_is_due(self):
+        out = runner_mod._OutputBuffer(self.write_fd, size=1024, interval=0.01)
+        assert out.timeout(0.05) == 0.05
+        out.write(b"progress")
+        assert out.timeout(0.05) <= 0.01
+        time.sleep(0.02)
+        out.flush_due()
+        assert self._written() == b"progress"
+
+    def test_one_writev_per_wakeup(self):
+        metrics = runner_mod._metrics.Metrics()
+        out = runner_mod._OutputBuffer(self.write_fd, interval=0, metrics=metrics)
+        runner = Runner(categories=["generic"], verbose=True)
+        runner._out = out
+        out.write(b"Continue? ")
+        out.write(b"[y/n] ")
+        runner._notice(self.write_fd, "responded 'y'")
+        assert self._written() == b""
+        out.flush_due()
+        assert self._written() == (
+            b"Continue? [y/n] \r\n\x1b[33m[auto-yes] responded 'y'\x1b[0m\r\n"
+        )
+        assert out.writes == metrics.writes == 1
+
+    def test_short_writes_and_iov_limit(self, monkeypatch):
+        calls = []
+
+        def short_writev(fd, chunks):
+            calls.append(len(chunks))
+            return os.write(fd, b"".join(chunks)[:3])
+
+        monkeypatch.setattr(runner_mod, "_IOV_MAX", 2)
+        monkeypatch.setattr(runner_mod.os, "writev", short_writev)
+        out = runner_mod._OutputBuffer(self.write_fd, size=1024, interval=60)
+        for word in (b"alpha ", b"beta ", b"gamma"):
+            out.write(word)
+        out.flush()
+        assert self._written() == b"alpha beta gamma"
+        assert max(calls) == 2
+        assert out.writes == len(calls) == 6
+
+    def test_line_starts_on_a_new_line(self):
+        out = runner_mod._OutputBuffer(self.write_fd)
+        out.write(b"Continue? [y/n] ")
+        out.line("[auto-yes] responded 'y'")
+        out.line("[auto-yes] again")
+        out.flush()
+        assert self._written() == (
+            b"Continue? [y/n] \n[auto-yes] responded 'y'\n[auto-yes] again\n"
+        )
+
+
+class TestHeadless:
+    def test_window_size_from_environment(self, monkeypatch):
+        monkeypatch.setenv("LINES", "50")
+        monkeypatch.setenv("COLUMNS", "132")
+        rows, cols = runner_mod.struct.unpack("HHHH", runner_mod._headless_winsize())[:2]
+        assert (rows, cols) == (50, 132)
+
+    def test_default_window_size(self, monkeypatch):
+        monkeypatch.delenv("LINES", raising=False)
+        monkeypatch.setenv("COLUMNS", "wide")
+        rows, cols = runner_mod.struct.unpack("HHHH", runner_mod._headless_winsize())[:2]
+        assert (rows, cols) == (24, 80)
+
+    @pytest.mark.skipif(not hasattr(os, "waitid"), reason="needs waitid")
+    def test_exit_status_when_output_ends_first(self, monkeypatch, capfd):
+        # the first read already sees the whole output and EOF
+        fork_pty = runner_mod._fork_pty
+
+        def exited_fork_pty(*args):
+            forked = fork_pty(*args)
+            os.waitid(os.P_PID, forked[0], os.WEXITED | os.WNOWAIT)
+            return forked
+
+        monkeypatch.setattr(runner_mod, "_fork_pty", exited_fork_pty)
+        runner = Runner(categories=["generic"], headless=True)
+        with open(os.devnull) as stdin:
+            monkeypatch.setattr(runner_mod.sys, "stdin", stdin)
+            assert runner.run_command(["sh", "-c", "echo bye; exit 3"]) == 3
+        assert "bye" in capfd.readouterr().out
+
+
+class TestChildUsage:
+    def test_usage_after_exit(self, monkeypatch, capfd):
+        runner = Runner(categories=["generic"], verbose=True, headless=True)
+        assert runner.stats()["child_usage"] is None
+        with open(os.devnull) as stdin:
+            monkeypatch.setattr(runner_mod.sys, "stdin", stdin)
+            assert runner.run_command(["sh", "-c", "exit 5"]) == 5
+        stats = runner.stats()
+        assert set(stats["child_usage"]) == {
+            "user",
+            "sys",
+            "max_rss",
+            "nvcsw",
+            "nivcsw",
+            "inblock",
+            "oublock",
+        }
+        assert stats["child_usage"]["max_rss"] > 0
+        assert stats["proxy_usage"]["max_rss"] > 0
+        out = capfd.readouterr().out
+        assert "[auto-yes] exited 5; child: " in out
+        assert "; auto-yes: " in out
+
+
+class TestWatchdog:
+    def _run(self, monkeypatch, script, **kwargs):
+        runner = Runner(categories=["generic"], headless=True, kill_grace=0.1, **kwargs)
+        with open(os.devnull) as stdin:
+            monkeypatch.setattr(runner_mod.sys, "stdin", stdin)
+            code = runner.run_command(["sh", "-c", script])
+        return runner, code
+
+    def test_idle_session_is_stopped(self, monkeypatch, capfd):
+        script = "trap '' INT TERM; echo 'Pick one (a/b/c):'; sleep 30"
+        start = time.time()
+        runner, code = self._run(monkeypatch, script, idle_timeout=0.3)
+        assert time.time() - start < 5
+        assert code == runner_mod.TIMEOUT_EXIT
+        assert "idle timeout" in runner.stats()["timed_out"]
+        out = capfd.readouterr().out
+        assert "[auto-yes] watchdog: last screen:\n  | Pick one (a/b/c):\n" in out
+        for name in ("SIGINT", "SIGTERM", "SIGKILL"):
+            assert f"sent {name}" in out
+
+    def test_busy_session_hits_max_runtime(self, monkeypatch, capfd):
+        script = "while true; do echo tick; sleep 0.05; done"
+        runner, code = self._run(monkeypatch, script, idle_timeout=5, max_runtime=0.4)
+        assert code == runner_mod.TIMEOUT_EXIT
+        assert "max runtime" in runner.timed_out
+        assert "sent SIGINT" in capfd.readouterr().out
+
+    def test_quick_command_is_left_alone(self, monkeypatch, capfd):
+        runner, code = self._run(monkeypatch, "echo done", idle_timeout=5, max_runtime=5)
+        assert code == 0
+        assert runner.timed_out is None
+        assert "watchdog" not in capfd.readouterr().out
+
+
+class TestTrace:
+    def test_off_by_default(self, monkeypatch):
+        monkeypatch.delenv("AUTO_YES_TRACE", raising=False)
+        runner = Runner(categories=["generic"])
+        assert runner.trace is None
+        assert runner.stats()["trace"] is None
+
+    def test_phases_of_a_session(self, monkeypatch, capfd):
+        monkeypatch.setenv("AUTO_YES_TRACE", "1")
+        runner = Runner(categories=["generic"], headless=True, cooldown=0)
+        script = "printf 'Continue? [y/n] '; read answer; echo got $answer"
+        with open(os.devnull) as stdin:
+            monkeypatch.setattr(runner_mod.sys, "stdin", stdin)
+            assert runner.run_command(["sh", "-c", script]) == 0
+        assert "got y" in capfd.readouterr().out
+        breakdown = runner.stats()["trace"]
+        calls = {row["phase"]: row["calls"] for row in breakdown["phases"]}
+        for phase in ("wait", "read", "forward", "detect", "respond"):
+            assert calls[phase] > 0, phase
+        accounted = sum(row["total"] for row in breakdown["phases"])
+        assert 0 < accounted <= breakdown["elapsed"]
+
+
+class TestBeginSession:
+    def test_state_is_reset(self):
+        runner = Runner()
+        runner.timed_out = "idle"
+        runner._signals_sent = 2
+        read_fd, write_fd = os.pipe()
+        try:
+            runner._begin_session(read_fd, struct.pack("HHHH", 40, 100, 0, 0))
+        finally:
+            os.close(read_fd)
+            os.close(write_fd)
+        assert runner.timed_out is None
+        assert runner._signals_sent == 0
+        assert runner._cursor.rows == 40
+        assert (runner._reader is not None) == _proc.available()
+
+    def test_typing_cancels_pending_answers(self):
+        runner = Runner()
+        runner._pending = _Pending(b"Continue? ", b"y\n", 0.0, 0)
+        runner._queue(b"y\n")
+        runner._typed()
+        assert runner._pending is None
+        assert runner._queued is None
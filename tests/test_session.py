@@ -0,0 +1,156 @@
+"""Tests for auto_yes.session module (Unix only)."""
+
+import sys
+
+import pytest
+
+import auto_yes
+from auto_yes import _proc
+from auto_yes.session import Session, pump
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="needs a Unix PTY")
+
+PROMPT = "printf 'Continue? [y/n] '; read a; echo got $a"
+
+
+def _sh(script, **kwargs):
+    kwargs.setdefault("categories", ["generic"])
+    return auto_yes.spawn(["sh", "-c", script], **kwargs)
+
+
+class TestSpawn:
+    def test_lazy_reexport(self):
+        assert auto_yes.Session is Session
+        with pytest.raises(AttributeError):
+            auto_yes.nothing_here  # noqa: B018
+
+    def test_prompt_is_answered(self):
+        with _sh(PROMPT) as session:
+            assert session.wait_for(r"got (\w)", timeout=5).group(1) == "y"
+            (event,) = session.events()
+            assert event.pattern == r"\[y/n\]"
+            assert event.response == "y"
+            assert event.prompt == "Continue? [y/n]"
+            assert session.wait(timeout=5) == 0
+
+    def test_custom_response(self):
+        with _sh(PROMPT, response="n") as session:
+            assert session.wait_for(r"got (\w)", timeout=5).group(1) == "n"
+
+    def test_output_is_streamed_in_chunks(self):
+        with _sh("echo one; sleep 0.1; echo two") as session:
+            output = b"".join(session.iter_output(timeout=5))
+        assert output == b"one\r\ntwo\r\n"
+
+    def test_send_and_exit_status(self):
+        with _sh("printf 'name: '; read n; echo hello $n; exit 4") as session:
+            session.wait_for("name: ", timeout=5)
+            session.sendline("bob")
+            assert session.wait_for(r"hello \w+", timeout=5).group(0) == "hello bob"
+            assert session.wait(timeout=5) == 4
+        assert list(session.events()) == []
+
+    def test_wait_for_consumes_matches(self):
+        with _sh("echo a1; echo a2") as session:
+            assert session.wait_for(r"a\d", timeout=5).group(0) == "a1"
+            assert session.wait_for(r"a\d", timeout=5).group(0) == "a2"
+
+    def test_wait_for_timeout_and_eof(self):
+        with _sh("sleep 5") as session:
+            with pytest.raises(TimeoutError):
+                session.wait_for("never", timeout=0.1)
+        with _sh("echo done") as session, pytest.raises(EOFError):
+            session.wait_for("never", timeout=5)
+
+    def test_cwd_env_and_size(self, tmp_path):
+        env = {"GREETING": "hi", "PATH": "/usr/bin:/bin"}
+        script = "pwd; echo $GREETING; stty size"
+        with _sh(script, cwd=tmp_path, env=env, rows=30, cols=100) as session:
+            output = b"".join(session.iter_output(timeout=5)).decode()
+        assert output.split("\r\n")[:3] == [str(tmp_path), "hi", "30 100"]
+
+    def test_close_stops_the_command(self):
+        session = _sh("sleep 30")
+        assert session.close(timeout=1) == 128 + 1
+        assert session.closed
+        assert session.close() == 128 + 1
+
+    def test_parent_terminal_is_untouched(self, capfd):
+        with _sh(PROMPT, verbose=True) as session:
+            session.wait(timeout=5)
+        assert capfd.readouterr().out == ""
+
+
+class TestPump:
+    def test_many_sessions_on_one_thread(self):
+        sessions = [_sh(PROMPT) for _ in range(50)]
+        try:
+            for _ in range(200):
+                pump(sessions, timeout=0.05)
+                if all(session.eof for session in sessions):
+                    break
+            for session in sessions:
+                assert b"got y" in b"".join(session.iter_output(timeout=0))
+                assert len(list(session.events())) == 1
+        finally:
+            for session in sessions:
+                session.close()
+
+
+class TestBreaker:
+    LOOP = "while true; do printf 'Continue? [y/n] '; read a; done"
+
+    def test_repeated_prompt_is_paused(self):
+        with _sh(self.LOOP, max_repeats=3, storm_window=60) as session:
+            events = list(session.events(timeout=1))
+            assert len(events) == 3
+            assert session.stats()["breaker"] == {
+                "trips": 1,
+                "paused": 1,
+                "session_paused": False,
+            }
+
+    def test_distinct_prompts_are_not_limited(self):
+        script = 'for i in $(seq 40); do printf "remove file f$i? [y/n] "; read a; done; echo done'
+        with _sh(script, cooldown=0) as session:
+            session.wait_for("done", timeout=10)
+            assert len(list(session.events())) == 40
+            assert session.stats()["breaker"]["trips"] == 0
+
+    def test_same_last_line_is_not_limited(self):
+        # an agent CLI asks different questions behind the same "[y/n]" line
+        script = (
+            'for i in $(seq 20); do echo "delete f$i?"; printf "[y/n] "; read a; done; echo done'
+        )
+        with _sh(script, cooldown=0) as session:
+            session.wait_for("done", timeout=10)
+            assert len(list(session.events())) == 20
+            assert session.stats()["breaker"]["trips"] == 0
+
+    def test_kill_terminates_the_command(self):
+        with _sh(self.LOOP, max_repeats=3, on_storm="kill") as session:
+            assert session.wait(timeout=5) == 128 + 15
+            assert len(list(session.events())) == 3
+
+
+class TestRetry:
+    @pytest.mark.skipif(not _proc.available(), reason="needs /proc")
+    def test_swallowed_answer_is_resent(self):
+        # no echo, no flush: only the blocked tty read shows the answer was lost
+        script = "stty -echo; printf 'Continue? [y/n] '; read -t 1 junk; read a; echo got $a"
+        with auto_yes.spawn(["bash", "-c", script], categories=["generic"]) as session:
+            session.wait_for("got y", timeout=5)
+            assert session.stats()["retries"] == 1
+
+
+class TestWatchdog:
+    def test_idle_timeout_stops_the_command(self):
+        with _sh("echo started; read a", idle_timeout=0.3, kill_grace=1) as session:
+            assert session.wait(timeout=5) == 128 + 2
+            assert "idle timeout" in session.stats()["timed_out"]
+
+    def test_max_runtime_stops_the_command(self):
+        script = "while true; do echo tick; sleep 0.05; done"
+        with _sh(script, max_runtime=0.5, kill_grace=1) as session:
+            assert session.wait(timeout=5) == 128 + 2
+            assert "max runtime" in session.stats()["timed_out"]
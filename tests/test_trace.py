@@ -0,0 +1,76 @@
+"""Tests for auto_yes._trace module."""
+
+import json
+import pstats
+
+from auto_yes import _trace
+
+
+class TestPhaseTimer:
+    def test_add_counts_and_chains(self):
+        timer = _trace.PhaseTimer()
+        now = timer.add(_trace.READ, 0.0)
+        assert now > 0
+        timer.add(_trace.READ, now)
+        assert timer.counts[_trace.READ] == 2
+        assert timer.counts[_trace.WAIT] == 0
+        assert timer.peaks[_trace.READ] >= now
+        assert timer.totals[_trace.READ] >= now
+
+    def test_percentiles_from_a_full_ring(self, monkeypatch):
+        monkeypatch.setattr(_trace.time, "perf_counter", lambda: 1000.0)
+        timer = _trace.PhaseTimer(samples=100)
+        for duration in range(1, 501):
+            timer.add(_trace.DETECT, 1000.0 - duration)
+        phases = {row["phase"]: row for row in timer.breakdown()["phases"]}
+        # only the last 100 durations (401 .. 500) are kept
+        assert phases["detect"] == {
+            "phase": "detect",
+            "calls": 500,
+            "total": 125250.0,
+            "p50": 450.0,
+            "p99": 499.0,
+            "max": 500.0,
+        }
+        assert phases["respond"] == {
+            "phase": "respond",
+            "calls": 0,
+            "total": 0.0,
+            "p50": 0.0,
+            "p99": 0.0,
+            "max": 0.0,
+        }
+
+    def test_elapsed_between_start_and_stop(self, monkeypatch):
+        clock = iter([10.0, 12.5, 20.0, 21.0])
+        monkeypatch.setattr(_trace.time, "perf_counter", lambda: next(clock))
+        timer = _trace.PhaseTimer()
+        timer.start()
+        timer.stop()
+        timer.start()
+        timer.stop()
+        assert timer.elapsed() == 3.5
+
+    def test_breakdown_is_json_and_reported(self):
+        timer = _trace.PhaseTimer()
+        timer.start()
+        timer.add(_trace.FORWARD, timer.add(_trace.WAIT, 0.0))
+        timer.stop()
+        breakdown = json.loads(json.dumps(timer.breakdown()))
+        lines = _trace.report(breakdown)
+        assert lines[0].split() == ["phase", "calls", "total", "share", "p50", "p99", "max"]
+        assert [line.split()[0] for line in lines[1:]] == [*_trace.PHASES, "other", "loop"]
+
+
+def test_enabled(monkeypatch):
+    monkeypatch.delenv(_trace.ENV_VAR, raising=False)
+    assert not _trace.enabled()
+    monkeypatch.setenv(_trace.ENV_VAR, "1")
+    assert _trace.enabled()
+
+
+def test_profiled_writes_stats(tmp_path):
+    path = tmp_path / "session.prof"
+    with _trace.profiled(str(path)):
+        sorted(range(1000), key=str)
+    assert pstats.Stats(str(path)).total_calls > 0
@@ -0,0 +1,46 @@
+"""Tests for auto_yes._usage module."""
+
+import sys
+from collections import namedtuple
+
+import pytest
+
+from auto_yes import _usage
+
+Rusage = namedtuple(
+    "Rusage",
+    ["ru_utime", "ru_stime", "ru_maxrss", "ru_nvcsw", "ru_nivcsw", "ru_inblock", "ru_oublock"],
+)
+
+SAMPLE = Rusage(1.5, 0.25, 2048, 30, 12, 8, 16)
+
+
+class TestFromRusage:
+    def test_fields(self, monkeypatch):
+        monkeypatch.setattr(sys, "platform", "linux")
+        assert _usage.from_rusage(SAMPLE) == {
+            "user": 1.5,
+            "sys": 0.25,
+            "max_rss": 2048 * 1024,
+            "nvcsw": 30,
+            "nivcsw": 12,
+            "inblock": 8,
+            "oublock": 16,
+        }
+
+    def test_macos_reports_bytes(self, monkeypatch):
+        monkeypatch.setattr(sys, "platform", "darwin")
+        assert _usage.from_rusage(SAMPLE)["max_rss"] == 2048
+
+    def test_describe(self, monkeypatch):
+        monkeypatch.setattr(sys, "platform", "linux")
+        assert _usage.describe(_usage.from_rusage(SAMPLE)) == (
+            "1.50 s user, 0.25 s sys, 2.1 MB max RSS, 42 context switches, 8/16 blocks in/out"
+        )
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="no getrusage")
+def test_proxy_usage():
+    usage = _usage.proxy()
+    assert usage["max_rss"] > 0
+    assert usage["user"] >= 0
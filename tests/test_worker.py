@@ -0,0 +1,75 @@
+"""Tests for auto_yes._worker module."""
+
+import os
+import select
+import threading
+
+import pytest
+
+from auto_yes._worker import DetectWorker
+
+
+def _wait(worker, timeout=2.0):
+    ready, _, _ = select.select([worker.fileno()], [], [], timeout)
+    assert ready
+    return worker.results()
+
+
+class TestDetectWorker:
+    def test_result_is_signalled(self):
+        worker = DetectWorker(lambda buf: buf.upper())
+        try:
+            worker.submit(b"continue?")
+            assert _wait(worker) == [b"CONTINUE?"]
+        finally:
+            worker.close()
+
+    def test_none_is_not_reported(self):
+        seen = threading.Event()
+
+        def detect(buf):
+            seen.set()
+
+        worker = DetectWorker(detect)
+        try:
+            worker.submit(b"output")
+            assert seen.wait(2.0)
+            ready, _, _ = select.select([worker.fileno()], [], [], 0.05)
+            assert not ready
+            assert worker.results() == []
+        finally:
+            worker.close()
+
+    def test_stale_snapshots_are_coalesced(self):
+        release = threading.Event()
+        started = threading.Event()
+        seen = []
+
+        def detect(buf):
+            seen.append(buf)
+            started.set()
+            release.wait(2.0)
+            return buf
+
+        worker = DetectWorker(detect)
+        try:
+            worker.submit(b"first")
+            assert started.wait(2.0)
+            for i in range(5):
+                worker.submit(b"stale %d" % i)
+            worker.submit(b"latest")
+            release.set()
+            results = []
+            while b"latest" not in results:
+                results.extend(_wait(worker))
+            assert seen == [b"first", b"latest"]
+            assert worker.coalesced == 5
+        finally:
+            worker.close()
+
+    def test_close_releases_pipe(self):
+        worker = DetectWorker(lambda buf: None)
+        fd = worker.fileno()
+        worker.close()
+        with pytest.raises(OSError):
+            os.fstat(fd)